@@ -1,6 +1,7 @@
 # config/settings.py
 from pathlib import Path
 from datetime import timedelta
+from importlib.util import find_spec
 from decouple import config, Csv
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -25,6 +26,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     "corsheaders.middleware.CorsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    "english.compression.CompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
@@ -69,6 +71,33 @@ DATABASES = {
     }
 }
 
+# Local default is per-process memory; point CACHE_BACKEND at
+# django.core.cache.backends.filebased.FileBasedCache (LOCATION = a directory)
+# or a shared server so per-user cache versions are seen by every worker.
+CACHES = {
+    "default": {
+        "BACKEND": config("CACHE_BACKEND", default="django.core.cache.backends.locmem.LocMemCache"),
+        "LOCATION": config("CACHE_LOCATION", default="english-api"),
+    }
+}
+
+# Catalog read-through cache (english.catalog_cache): entries per worker, and
+# whether to also share them through CACHES["default"].
+CATALOG_CACHE_SIZE = config("CATALOG_CACHE_SIZE", cast=int, default=2048)
+CATALOG_CACHE_SHARED = config("CATALOG_CACHE_SHARED", cast=bool, default=False)
+
+# quiz/random/attempts/ only grades signed sessions (english.quiz_sessions).
+# Turn this on to also accept the old unsigned {lesson_id, item_index} answers
+# while clients migrate; those can't be checked for forgery or replay.
+RANDOM_QUIZ_LEGACY_ATTEMPTS = config("RANDOM_QUIZ_LEGACY_ATTEMPTS", cast=bool, default=False)
+
+# english.compression: smaller bodies aren't worth compressing. gzip is always
+# available; install `brotli` and/or `zstandard` to also offer br / zstd.
+COMPRESS_MIN_SIZE = config("COMPRESS_MIN_SIZE", cast=int, default=512)
+
+# Offline content packs (english.content_packs), one file per category version.
+CONTENT_PACK_DIR = config("CONTENT_PACK_DIR", default=str(BASE_DIR / "content_packs"))
+
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -91,6 +120,10 @@ STATIC_URL = "/static/"
 STATIC_ROOT = BASE_DIR / "staticfiles"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
+# english.renderers: orjson-backed JSON when orjson is installed; MessagePack
+# (application/msgpack) only when msgpack is.
+_MSGPACK = find_spec("msgpack") is not None
+
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
         "rest_framework_simplejwt.authentication.JWTAuthentication",
@@ -98,6 +131,17 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
     ],
+    "DEFAULT_RENDERER_CLASSES": [
+        "english.renderers.FastJSONRenderer",
+        *(["english.renderers.MessagePackRenderer"] if _MSGPACK else []),
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "english.renderers.FastJSONParser",
+        *(["english.renderers.MessagePackParser"] if _MSGPACK else []),
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
 }
 
 SIMPLE_JWT = {
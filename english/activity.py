@@ -0,0 +1,86 @@
+# english/activity.py
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from django.conf import settings
+from django.utils import timezone
+
+from .leaderboard import award_xp
+from .models import DailyActivity, Profile
+from .response_cache import invalidate_user_responses
+
+STREAK_CHUNK = 120  # days fetched per range scan while walking a streak
+
+
+def parse_timezone(name: Any) -> Optional[ZoneInfo]:
+    try:
+        return ZoneInfo(str(name))
+    except (ZoneInfoNotFoundError, ValueError):
+        return None
+
+
+def user_timezone(user) -> ZoneInfo:
+    name = Profile.objects.filter(user_id=user.pk).values_list("timezone", flat=True).first()
+    return (name and parse_timezone(name)) or ZoneInfo(settings.TIME_ZONE)
+
+
+def local_day(tz: ZoneInfo, when: Optional[datetime] = None) -> date:
+    return (when or timezone.now()).astimezone(tz).date()
+
+
+def record_activity(user, attempts: int = 0, xp: int = 0, questions: int = 0, correct: int = 0, completed: int = 0) -> None:
+    """
+    Count a quiz/progress write towards today's row (in the user's timezone),
+    the user's UserStats totals and the XP leaderboards, and expire their
+    cached me/ responses. Call inside the write's transaction, after its rows
+    are saved.
+    """
+    from .stats import update_user_stats
+
+    day = local_day(user_timezone(user))
+    DailyActivity.objects.bump(user, day, attempts=attempts, xp=xp)
+    update_user_stats(user, day, xp=xp, questions=questions, correct=correct, completed=completed)
+    award_xp(user, xp)
+    invalidate_user_responses(user)
+
+
+def current_streak(user, tz: ZoneInfo) -> int:
+    """Consecutive active days ending today."""
+    return streak_ending(user, local_day(tz))
+
+
+def streak_ending(user, day: date) -> int:
+    """Consecutive active days ending on `day`, read newest-first from the (user, day) index."""
+    expected = day
+    streak = 0
+    while True:
+        days = list(
+            DailyActivity.objects.filter(user=user, day__lte=expected)
+            .order_by("-day")
+            .values_list("day", flat=True)[:STREAK_CHUNK]
+        )
+        for d in days:
+            if d != expected:
+                return streak
+            streak += 1
+            expected -= timedelta(days=1)
+        if len(days) < STREAK_CHUNK:
+            return streak
+
+
+def recent_activity(user, tz: ZoneInfo, days: int) -> List[Dict[str, Any]]:
+    """The last `days` local days, oldest first, with zeros for inactive days."""
+    today = local_day(tz)
+    start = today - timedelta(days=days - 1)
+    rows = {
+        d: (attempts, xp)
+        for d, attempts, xp in DailyActivity.objects.filter(user=user, day__gte=start, day__lte=today)
+        .values_list("day", "attempts", "xp")
+    }
+    out = []
+    for n in range(days):
+        d = start + timedelta(days=n)
+        attempts, xp = rows.get(d, (0, 0))
+        out.append({"day": d.isoformat(), "attempts": attempts, "xp": xp})
+    return out
@@ -1,3 +1,26 @@
 from django.contrib import admin
 
-# Register your models here.
+from .models import Category, Lesson
+
+
+@admin.register(Category)
+class CategoryAdmin(admin.ModelAdmin):
+    list_display = ("title", "slug", "updated_at")
+    search_fields = ("title", "slug")
+    exclude = ("completion_percentage",)
+
+
+@admin.register(Lesson)
+class LessonAdmin(admin.ModelAdmin):
+    list_display = ("__str__", "difficulty", "word_count", "updated_at")
+    list_filter = ("category",)
+    search_fields = ("title",)
+    # Lesson.__str__ shows the category slug: join it instead of one query per row.
+    list_select_related = ("category",)
+
+    def get_queryset(self, request):
+        # The changelist never shows content or the pre-rendered payload.
+        qs = super().get_queryset(request)
+        if request.resolver_match and request.resolver_match.url_name.endswith("_changelist"):
+            qs = qs.defer("content", "rendered_detail", "rendered_slots")
+        return qs
@@ -0,0 +1,211 @@
+# english/catalog_cache.py
+#
+# Read-through cache for catalog data (categories and lessons), which only
+# changes when content is edited. Entries live in a bounded per-process LRU
+# (settings.CATALOG_CACHE_SIZE) and, with settings.CATALOG_CACHE_SHARED, also
+# in the Django cache so workers fill it for each other.
+#
+# Every key includes a generation counter kept in the Django cache. Saving or
+# deleting a Category or Lesson bumps it once the transaction commits
+# (english.signals), which retires every entry at once; writes that bypass
+# signals (QuerySet.update, bulk_create) must call bump_catalog_generation().
+# As with the quiz sampling pools, local entries also expire after
+# ENTRY_MAX_AGE, for per-process cache backends that can't see other
+# workers' bumps.
+#
+# Only user-independent data is cached: the catalog validators, category
+# lesson lists, lesson detail rows and the lesson fields quiz grading reads.
+# Per-user completion is still computed per request.
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Max
+
+from .grading import PLAN_FIELDS
+from .models import Category, Lesson
+
+GENERATION_KEY = "english:catalog-generation"
+SHARED_KEY = "english:catalog:{generation}:{kind}:{key}"
+ENTRY_MAX_AGE = 300
+SHARED_TTL = 60 * 60
+
+_lru: "OrderedDict[tuple, tuple]" = OrderedDict()
+_lock = threading.Lock()
+_stats = {"hits": 0, "shared_hits": 0, "misses": 0}
+
+
+def _max_size() -> int:
+    return getattr(settings, "CATALOG_CACHE_SIZE", 2048)
+
+
+def _shared() -> bool:
+    return getattr(settings, "CATALOG_CACHE_SHARED", False)
+
+
+def catalog_generation() -> int:
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Seeded from the clock, like the per-user response versions.
+        generation = time.time_ns() // 1000
+        if not cache.add(GENERATION_KEY, generation, None):
+            generation = cache.get(GENERATION_KEY, generation)
+    return generation
+
+
+def bump_catalog_generation() -> None:
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns() // 1000, None)
+    clear_local_catalog_cache()
+
+
+def clear_local_catalog_cache() -> None:
+    with _lock:
+        _lru.clear()
+
+
+def catalog_cache_info() -> Dict[str, Any]:
+    """Hit/miss counts and hit ratio for this process."""
+    with _lock:
+        info = dict(_stats, size=len(_lru))
+    lookups = info["hits"] + info["shared_hits"] + info["misses"]
+    info["hit_ratio"] = (info["hits"] + info["shared_hits"]) / lookups if lookups else 0.0
+    return info
+
+
+def _local_get(lkey):
+    with _lock:
+        entry = _lru.get(lkey)
+        if entry is None:
+            return None
+        if time.monotonic() - entry[0] >= ENTRY_MAX_AGE:
+            del _lru[lkey]
+            return None
+        _lru.move_to_end(lkey)
+        _stats["hits"] += 1
+        return entry
+
+
+def _local_set(lkey, value) -> None:
+    size = _max_size()
+    if size <= 0:
+        return
+    with _lock:
+        _lru[lkey] = (time.monotonic(), value)
+        _lru.move_to_end(lkey)
+        while len(_lru) > size:
+            _lru.popitem(last=False)
+
+
+def _count(outcome: str, n: int = 1) -> None:
+    with _lock:
+        _stats[outcome] += n
+
+
+def catalog_get_many(kind: str, keys: Iterable[Hashable],
+                     loader: Callable[[list], Dict[Hashable, Any]]) -> Dict[Hashable, Any]:
+    """
+    {key: value} for the keys that exist. loader(missing_keys) reads the rest
+    from the database and omits keys it can't find; those aren't cached.
+    """
+    generation = catalog_generation()
+    found: Dict[Hashable, Any] = {}
+    missing = []
+    for key in keys:
+        entry = _local_get((generation, kind, key))
+        if entry is not None:
+            found[key] = entry[1]
+        else:
+            missing.append(key)
+    if not missing:
+        return found
+
+    if _shared():
+        shared_keys = {SHARED_KEY.format(generation=generation, kind=kind, key=key): key for key in missing}
+        hits = cache.get_many(list(shared_keys))
+        for skey, value in hits.items():
+            key = shared_keys[skey]
+            found[key] = value
+            _local_set((generation, kind, key), value)
+        _count("shared_hits", len(hits))
+        missing = [key for key in missing if key not in found]
+        if not missing:
+            return found
+
+    _count("misses", len(missing))
+    loaded = loader(missing)
+    for key, value in loaded.items():
+        _local_set((generation, kind, key), value)
+    if _shared() and loaded:
+        cache.set_many({
+            SHARED_KEY.format(generation=generation, kind=kind, key=key): value for key, value in loaded.items()
+        }, SHARED_TTL)
+    found.update(loaded)
+    return found
+
+
+def catalog_get(kind: str, key: Hashable, loader: Callable[[Hashable], Optional[Any]]) -> Optional[Any]:
+    """One value, or None when loader(key) returns None (not cached)."""
+    def load(keys):
+        value = loader(keys[0])
+        return {} if value is None else {keys[0]: value}
+    return catalog_get_many(kind, [key], load).get(key)
+
+
+# ----- Catalog reads -----
+
+def catalog_versions() -> Dict[str, Any]:
+    """Counts and last-change stamps of the whole catalog (categories ETag)."""
+    return catalog_get("versions", "all", lambda _: Category.objects.aggregate(
+        n=Count("id", distinct=True), changed=Max("updated_at"),
+        lesson_n=Count("lessons"), lessons_changed=Max("lessons__updated_at"),
+    ))
+
+
+def category_versions(slug: str) -> Optional[Dict[str, Any]]:
+    return catalog_get("category", slug, lambda slug: (
+        Category.objects.filter(slug=slug)
+        .values("id", "content_hash", "updated_at")
+        .annotate(lesson_n=Count("lessons"), lessons_changed=Max("lessons__updated_at"))
+        .first()
+    ))
+
+
+def category_lessons(slug: str) -> Optional[Dict[str, Any]]:
+    """The category's id, lesson versions and serialized lesson list."""
+    def load(slug):
+        from .serializers import LESSON_LIST_FIELDS, LessonListSerializer
+
+        v = category_versions(slug)
+        if v is None:
+            return None
+        lessons = Lesson.objects.filter(category_id=v["id"]).only(*LESSON_LIST_FIELDS).order_by("id")
+        return {**v, "lessons": list(LessonListSerializer(lessons, many=True).data)}
+    return catalog_get("category-lessons", slug, load)
+
+
+def lesson_detail_rows(ids: Iterable[int]) -> Dict[int, Dict[str, Any]]:
+    """{id: version columns and pre-rendered payload}; missing ids are left out."""
+    def load(ids):
+        fields = ("id", "content_hash", "updated_at", "rendered_detail", "rendered_slots")
+        rows = {}
+        for row in Lesson.objects.filter(pk__in=ids).values(*fields):
+            if row["rendered_detail"] is not None:
+                row["rendered_detail"] = bytes(row["rendered_detail"])  # memoryview on some backends
+            rows[row.pop("id")] = row
+        return rows
+    return catalog_get_many("lesson", set(ids), load)
+
+
+def lesson_detail_row(pk: int) -> Optional[Dict[str, Any]]:
+    return lesson_detail_rows([pk]).get(pk)
+
+
+def quiz_lessons(ids: Iterable[int]) -> Dict[int, Lesson]:
+    """{id: Lesson} with the fields get_quiz_plan() reads; missing ids are left out."""
+    return catalog_get_many("quiz-lesson", set(ids), lambda ids: Lesson.objects.only(*PLAN_FIELDS).in_bulk(ids))
@@ -0,0 +1,181 @@
+# english/compression.py
+#
+# Response compression negotiated from Accept-Encoding: zstd and brotli when
+# their packages (zstandard, brotli) are installed, gzip always. Bodies under
+# settings.COMPRESS_MIN_SIZE and non-text content types are sent as is;
+# streaming responses are compressed chunk by chunk.
+#
+# Catalog payloads that are the same for every user are compressed once, at
+# the highest level, and kept in the catalog cache per encoding
+# (precompressed_response); the middleware leaves responses that already
+# carry a Content-Encoding alone.
+import gzip
+import re
+import zlib
+from typing import Callable, Dict, Optional, Tuple
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+from django.utils.deprecation import MiddlewareMixin
+
+from .catalog_cache import catalog_get
+
+try:
+    import brotli
+except ImportError:  # optional
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:  # optional
+    zstandard = None
+
+# Server preference, best first; ties in the client's q-values go to the earlier one.
+ENCODINGS = tuple(e for e, mod in (("zstd", zstandard), ("br", brotli), ("gzip", gzip)) if mod is not None)
+# (per-response level, precompressed level)
+LEVELS = {"zstd": (3, 19), "br": (5, 11), "gzip": (6, 9)}
+COMPRESSIBLE_TYPES = re.compile(r"^(text/|application/(json|javascript|xml|msgpack|x-msgpack)\b)")
+
+_token = re.compile(r"\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?\s*$")
+
+
+def _min_size() -> int:
+    return getattr(settings, "COMPRESS_MIN_SIZE", 512)
+
+
+def _weights(accept_encoding: str) -> Dict[str, float]:
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        m = _token.match(part)
+        if not m:
+            continue
+        try:
+            weights[m.group(1).lower()] = float(m.group(2)) if m.group(2) else 1.0
+        except ValueError:
+            continue
+    return weights
+
+
+def accepts_encoding(accept_encoding: str, encoding: str) -> bool:
+    weights = _weights(accept_encoding)
+    return weights.get(encoding, weights.get("*", 0.0)) > 0
+
+
+def negotiate(accept_encoding: str) -> Optional[str]:
+    """The encoding to use for this Accept-Encoding header, or None for identity."""
+    weights = _weights(accept_encoding)
+    best, best_q = None, 0.0
+    for encoding in ENCODINGS:
+        q = weights.get(encoding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(encoding: str, data: bytes, precompressed: bool = False) -> bytes:
+    level = LEVELS[encoding][1 if precompressed else 0]
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == "br":
+        return brotli.compress(data, quality=level)
+    return zstandard.ZstdCompressor(level=level).compress(data)
+
+
+class _StreamCompressor:
+    def __init__(self, encoding: str):
+        level = LEVELS[encoding][0]
+        if encoding == "gzip":
+            obj = zlib.compressobj(level, zlib.DEFLATED, 31)  # 31: gzip container
+            self.compress, self.flush = obj.compress, obj.flush
+        elif encoding == "br":
+            obj = brotli.Compressor(quality=level)
+            self.compress, self.flush = obj.process, obj.finish
+        else:
+            obj = zstandard.ZstdCompressor(level=level).compressobj()
+            self.compress, self.flush = obj.compress, obj.flush
+
+
+def compress_stream(encoding: str, chunks):
+    stream = _StreamCompressor(encoding)
+    for chunk in chunks:
+        out = stream.compress(chunk)
+        if out:
+            yield out
+    yield stream.flush()
+
+
+async def compress_stream_async(encoding: str, chunks):
+    stream = _StreamCompressor(encoding)
+    async for chunk in chunks:
+        out = stream.compress(chunk)
+        if out:
+            yield out
+    yield stream.flush()
+
+
+def _weaken_etag(response) -> None:
+    # The encoded body is not byte-identical to the one the ETag was made for.
+    etag = response.get("ETag")
+    if etag and etag.startswith('"'):
+        response["ETag"] = "W/" + etag
+
+
+class CompressionMiddleware(MiddlewareMixin):
+    def process_response(self, request, response):
+        if response.has_header("Content-Encoding"):
+            return response
+        if not COMPRESSIBLE_TYPES.match(response.get("Content-Type", "")):
+            return response
+        patch_vary_headers(response, ("Accept-Encoding",))
+        encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            if response.is_async:
+                response.streaming_content = compress_stream_async(encoding, response.streaming_content)
+            else:
+                response.streaming_content = compress_stream(encoding, response.streaming_content)
+            del response["Content-Length"]
+        else:
+            if len(response.content) < _min_size():
+                return response
+            body = compress(encoding, response.content)
+            if len(body) >= len(response.content):
+                return response
+            response.content = body
+            response["Content-Length"] = str(len(body))
+        _weaken_etag(response)
+        response["Content-Encoding"] = encoding
+        return response
+
+
+def precompressed_response(request, kind: str, key: str, render: Callable[[], Optional[bytes]],
+                           content_type: str = "application/json") -> Optional[HttpResponse]:
+    """
+    A response for a body that's the same for every user. render() runs, and
+    its output is compressed, once per catalog generation and encoding; None
+    when render() returns None (nothing is cached then).
+    """
+    encoding = negotiate(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+
+    def load(_) -> Optional[Tuple[Optional[str], bytes]]:
+        body = render()
+        if body is None:
+            return None
+        if encoding and len(body) >= _min_size():
+            packed = compress(encoding, body, precompressed=True)
+            if len(packed) < len(body):
+                return encoding, packed
+        return None, body
+
+    found = catalog_get(kind, f"{key}:{encoding or 'identity'}", load)
+    if found is None:
+        return None
+    used, body = found
+    response = HttpResponse(body, content_type=content_type)
+    if used:
+        response["Content-Encoding"] = used
+    patch_vary_headers(response, ("Accept-Encoding",))
+    return response
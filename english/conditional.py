@@ -0,0 +1,52 @@
+# english/conditional.py
+#
+# Conditional GET for the catalog endpoints. Each view declares a validators
+# function that reads only version columns (content_hash / updated_at, plus
+# the user's progress version for per-user fields); when the client's
+# If-None-Match / If-Modified-Since still matches, the view answers 304
+# without loading or serializing anything. Last-Modified is only sent where
+# it changes with every edit of the body (single rows, not aggregates).
+import functools
+import hashlib
+from datetime import datetime
+from typing import Optional, Tuple
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .models import UserStats
+
+
+def weak_etag(*parts) -> str:
+    # Weak: bodies are equivalent, not byte-identical (questions shuffle tokens).
+    return 'W/"%s"' % hashlib.blake2b(repr(parts).encode(), digest_size=16).hexdigest()
+
+
+def progress_version(user) -> Optional[datetime]:
+    """Changes on every quiz/progress write of the user (UserStats.last_active)."""
+    return UserStats.objects.filter(pk=user.pk).values_list("last_active", flat=True).first()
+
+
+def conditional_get(validators):
+    """
+    validators(request, *args, **kwargs) -> (etag, last_modified) or None for
+    "no such object" (the view then runs and produces its usual 404).
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            found: Optional[Tuple[str, Optional[datetime]]] = validators(request, *args, **kwargs)
+            if found is None:
+                return method(self, request, *args, **kwargs)
+            etag, last_modified = found
+            timestamp = int(last_modified.timestamp()) if last_modified else None
+            response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+            if response is None:
+                response = method(self, request, *args, **kwargs)
+                if response.status_code == 200:
+                    response["ETag"] = etag
+                    if timestamp is not None:
+                        response["Last-Modified"] = http_date(timestamp)
+            return response
+        return wrapper
+    return decorator
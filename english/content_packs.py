@@ -0,0 +1,127 @@
+# english/content_packs.py
+#
+# Offline content packs: one gzipped JSON file per category and content
+# version, holding the category, every lesson's detail payload (what
+# lessons/<pk>/ returns) and a manifest of lesson versions (content hash plus
+# render version). The version is a digest of that manifest, so a pack is
+# built once per version (by `manage.py build_content_packs` or on first
+# request) and then served from settings.CONTENT_PACK_DIR as is. Clients holding an older pack send their
+# manifest back and get only the changed and removed lessons.
+#
+# Packs carry the rendered lessons, not raw Lesson.content: content holds the
+# quiz answers, which the API never sends to clients.
+import gzip
+import os
+import random
+import tempfile
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+from django.conf import settings
+
+from .catalog_cache import catalog_get, lesson_detail_rows
+from .lesson_render import rendered_version, splice_lesson_detail
+from .models import Category, Lesson, content_digest
+from .renderers import FastJSONRenderer
+
+PACK_FORMAT = 1
+
+
+def pack_dir() -> Path:
+    return Path(getattr(settings, "CONTENT_PACK_DIR", settings.BASE_DIR / "content_packs"))
+
+
+def pack_manifest(slug: str) -> Optional[Dict[str, Any]]:
+    """{"version", "category", "lessons": {lesson id (str): rendered version}} or None."""
+    def load(slug):
+        cat = Category.objects.filter(slug=slug).values("id", "slug", "title", "description", "emoji",
+                                                        "content_hash").first()
+        if cat is None:
+            return None
+        lessons = dict(Lesson.objects.filter(category_id=cat["id"]).order_by("id").values_list("id", "content_hash"))
+        category_hash = cat.pop("content_hash")
+        return {
+            "version": content_digest(PACK_FORMAT, category_hash, sorted(lessons.items())),
+            "category": cat,
+            "lessons": {str(pk): rendered_version(h) for pk, h in lessons.items()},
+        }
+    return catalog_get("pack-manifest", slug, load)
+
+
+def _lesson_payloads(ids: Iterable[int], seed: str) -> List[bytes]:
+    from .serializers import LESSON_DETAIL_FIELDS, LessonDetailSerializer
+
+    ids = list(ids)
+    rows = lesson_detail_rows(ids)
+    stale = [pk for pk in ids if pk in rows and rows[pk]["rendered_detail"] is None]
+    fallback = Lesson.objects.only(*LESSON_DETAIL_FIELDS).in_bulk(stale) if stale else {}
+    renderer = FastJSONRenderer()
+    rng = random.Random(seed)  # same version, same bytes
+    out = []
+    for pk in ids:
+        row = rows.get(pk)
+        if row is None:
+            continue  # deleted since the manifest was read; the next version drops it
+        if row["rendered_detail"] is None:
+            if pk in fallback:
+                out.append(renderer.render(LessonDetailSerializer(fallback[pk], context={"shuffle": False}).data))
+        else:
+            out.append(splice_lesson_detail(pk, row["rendered_detail"], row["rendered_slots"], rng))
+    return out
+
+
+def pack_path(manifest: Dict[str, Any]) -> Path:
+    return pack_dir() / f"{manifest['category']['slug']}.{manifest['version']}.json.gz"
+
+
+def build_pack(manifest: Dict[str, Any]) -> Path:
+    """The pack file for this manifest, writing it first if it doesn't exist yet."""
+    path = pack_path(manifest)
+    if path.exists():
+        return path
+    path.parent.mkdir(parents=True, exist_ok=True)
+    renderer = FastJSONRenderer()
+    head = renderer.render({
+        "format": PACK_FORMAT,
+        "version": manifest["version"],
+        "category": manifest["category"],
+        "manifest": manifest["lessons"],
+    })
+    lessons = _lesson_payloads((int(pk) for pk in manifest["lessons"]), manifest["version"])
+    # Write next to the target and rename, so concurrent builders and
+    # readers only ever see a complete file.
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as gz:
+            gz.write(head[:-1] + b',"lessons":[')
+            gz.write(b",".join(lessons))
+            gz.write(b"]}")
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return path
+
+
+def prune_packs(keep: Iterable[Path]) -> int:
+    """Delete pack files other than keep; returns how many."""
+    keep = {Path(p).name for p in keep}
+    removed = 0
+    for path in pack_dir().glob("*.json.gz"):
+        if path.name not in keep:
+            path.unlink(missing_ok=True)
+            removed += 1
+    return removed
+
+
+def pack_delta(manifest: Dict[str, Any], client: Dict[str, str]) -> bytes:
+    """JSON for the lessons that differ from the client's {id: hash} manifest."""
+    changed = [int(pk) for pk, h in manifest["lessons"].items() if client.get(pk) != h]
+    removed = sorted(int(pk) for pk in client if pk not in manifest["lessons"])
+    lessons = _lesson_payloads(changed, manifest["version"])
+    head = FastJSONRenderer().render({
+        "version": manifest["version"],
+        "manifest": manifest["lessons"],
+        "removed": removed,
+    })
+    return head[:-1] + b',"changed":[' + b",".join(lessons) + b"]}"
@@ -0,0 +1,398 @@
+# english/grading.py
+import hashlib
+import json
+import marshal
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from .textnorm import ROMANIAN
+
+
+def strip_diacritics(s: str) -> str:
+    return ROMANIAN.strip_diacritics(s)
+
+
+def norm_text(s: str) -> str:
+    return ROMANIAN(s or "")
+
+
+def _normalize_type(t: str) -> str:
+    t = (t or "").lower()
+    if t in ("choose", "dialogue_reply", "mcq"):
+        return "mcq"
+    if t in ("tf", "true_false"):
+        return "tf"
+    if t in ("fill_blank", "fill"):
+        return "fill"
+    if t in ("translate_ro_en", "translate_en_ro", "word_order", "build"):
+        return "build"
+    return t
+
+
+def _extract_quiz_items(lesson) -> List[Dict[str, Any]]:
+    content = lesson.content or {}
+    quiz = content.get("quiz") or {}
+    return quiz.get("items") or []
+
+
+def _expected_texts(item: Dict[str, Any]) -> List[str]:
+    vals: List[str] = []
+    for k in ("answer_en", "answer_ro", "answer", "expected", "solution"):
+        v = item.get(k)
+        if isinstance(v, str) and v:
+            vals.append(v)
+    for k in ("answers", "accept", "accept_en", "answer_variants"):
+        v = item.get(k)
+        if isinstance(v, list):
+            vals.extend([x for x in v if isinstance(x, str) and x])
+    out, seen = [], set()
+    for s in vals:
+        ns = norm_text(s)
+        if ns and ns not in seen:
+            seen.add(ns)
+            out.append(ns)
+    return out
+
+
+def _tokens_to_text(selected: Dict[str, Any]) -> str:
+    toks = selected.get("tokens")
+    if isinstance(toks, list) and toks:
+        return " ".join(str(t) for t in toks)
+    return selected.get("text") or ""
+
+
+def _grade_answer(item: Dict[str, Any], selected: Any) -> bool:
+    t = _normalize_type(item.get("type"))
+
+    if t == "mcq":
+        correct_idx = (
+            item.get("correct_index")
+            if item.get("correct_index") is not None
+            else None
+        )
+        if correct_idx is None:
+            options = item.get("options") or []
+            correct_text = item.get("correct")
+            if correct_text is not None and correct_text in options:
+                correct_idx = options.index(correct_text)
+        try:
+            return int(selected.get("index")) == int(correct_idx)
+        except Exception:
+            return False
+
+    if t == "tf":
+        correct = item.get("correct_bool")
+        if correct is None:
+            correct = item.get("answer_bool")
+        if correct is None:
+            correct = item.get("correct")
+        return bool(selected.get("value")) is bool(correct)
+
+    if t == "fill":
+        ans = item.get("answer")
+        answers = item.get("answers") or ([] if ans is None else [ans])
+        accept = item.get("accept") or []
+        expected_norms = [norm_text(a) for a in (answers + accept) if a]
+        cand = norm_text(selected.get("text") or "")
+        return cand in expected_norms
+
+    if t == "build":
+        cand_raw = _tokens_to_text(selected)
+        cand_norm = norm_text(cand_raw)
+        if not cand_norm:
+            return False
+        expected_norms = _expected_texts(item)
+        return cand_norm in expected_norms
+
+    return False
+
+
+# ----- Typo tolerance -----
+#
+# Tolerant matching is opt-in: "typo_tolerance" on a quiz item, or on
+# content["quiz"] for the whole lesson (the item setting wins). Values are a
+# max edit count, or true/"auto" for a length-based allowance. It applies to
+# fill and build answers only, after an exact match has failed.
+
+AUTO_TOLERANCE = -1
+
+
+def _parse_tolerance(v: Any) -> Optional[int]:
+    if v is None:
+        return None
+    if v is True or v == "auto":
+        return AUTO_TOLERANCE
+    if v is False:
+        return 0
+    try:
+        return max(0, int(v))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _auto_max_edits(length: int) -> int:
+    # Short answers ("in"/"on", "is"/"as") are exactly where one edit changes
+    # the meaning, so they stay exact.
+    if length < 4:
+        return 0
+    if length < 10:
+        return 1
+    return 2
+
+
+def _myers_peq(pattern: str) -> Dict[str, int]:
+    peq: Dict[str, int] = {}
+    for i, ch in enumerate(pattern):
+        peq[ch] = peq.get(ch, 0) | (1 << i)
+    return peq
+
+
+def bounded_edit_distance(peq: Dict[str, int], m: int, text: str, max_dist: int) -> Optional[int]:
+    """
+    Levenshtein distance between a pattern (given as its Myers match masks
+    and length m) and text, or None once it is certain to exceed max_dist.
+    Bit-parallel (Myers 1999, Hyyrö 2001): one pass over text with a handful
+    of integer operations per character, whatever the pattern length.
+    """
+    n = len(text)
+    if m == 0:
+        return n if n <= max_dist else None
+    full = (1 << m) - 1
+    high = 1 << (m - 1)
+    pv, mv, score = full, 0, m
+    for j, ch in enumerate(text):
+        eq = peq.get(ch, 0)
+        xv = eq | mv
+        xh = (((eq & pv) + pv) ^ pv) | eq
+        ph = mv | (~(xh | pv) & full)
+        mh = pv & xh
+        if ph & high:
+            score += 1
+        elif mh & high:
+            score -= 1
+        # Each remaining text character can lower the score by at most one.
+        if score - (n - j - 1) > max_dist:
+            return None
+        ph = ((ph << 1) | 1) & full
+        mh = (mh << 1) & full
+        pv = mh | (~(xv | ph) & full)
+        mv = ph & xv
+    return score if score <= max_dist else None
+
+
+def _common_prefix_len(a: str, b: str) -> int:
+    # Binary search on slice equality: O(log n) comparisons done in C.
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[:mid] == b[:mid]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _common_suffix_len(a: str, b: str) -> int:
+    lo, hi = 0, min(len(a), len(b))
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if a[-mid:] == b[-mid:]:
+            lo = mid
+        else:
+            hi = mid - 1
+    return lo
+
+
+def _within_edits(pattern: str, peq: Dict[str, int], text: str, k: int) -> bool:
+    # A shared prefix or suffix never changes the edit distance, and typos are
+    # local, so trim both and run the bit-parallel pass on what differs.
+    p = _common_prefix_len(pattern, text)
+    if p:
+        pattern, text = pattern[p:], text[p:]
+    q = _common_suffix_len(pattern, text)
+    if q:
+        pattern, text = pattern[:-q], text[:-q]
+    if p or q:
+        peq = _myers_peq(pattern)
+    return bounded_edit_distance(peq, len(pattern), text, k) is not None
+
+
+# ----- Compiled grading plans -----
+
+def _lesson_qtype(t: str) -> Optional[str]:
+    # Mirrors the item-type mapping LessonDetailSerializer has always used;
+    # None means the item is not shown (its question id is still consumed).
+    t = (t or "").lower()
+    if t == "choose":
+        return "mcq"
+    if t == "fill_blank":
+        return "fill_blank"
+    if t in ("translate_ro_en", "translate_en_ro", "word_order"):
+        return "build"
+    if t in ("dialogue_reply", "mcq"):
+        return "mcq"
+    if t in ("tf", "true_false"):
+        return "tf"
+    return None
+
+
+class CompiledItem:
+    """One quiz item with its expected answers normalized ahead of time."""
+
+    __slots__ = (
+        "qtype", "correct_index", "correct_bool", "accepted", "fuzzy",
+        "prompt", "lesson_qtype", "options", "tokens",
+    )
+
+    def __init__(self, item: Dict[str, Any], tolerance: Optional[int] = None):
+        if not isinstance(item, dict):
+            item = {}
+        self.qtype = _normalize_type(item.get("type"))
+        self.correct_index: Optional[int] = None
+        self.correct_bool = False
+        self.accepted: frozenset = frozenset()
+
+        if self.qtype == "mcq":
+            correct_idx = item.get("correct_index")
+            if correct_idx is None:
+                options = item.get("options") or []
+                correct_text = item.get("correct")
+                if correct_text is not None and correct_text in options:
+                    correct_idx = options.index(correct_text)
+            try:
+                self.correct_index = int(correct_idx)
+            except Exception:
+                self.correct_index = None
+        elif self.qtype == "tf":
+            correct = item.get("correct_bool")
+            if correct is None:
+                correct = item.get("answer_bool")
+            if correct is None:
+                correct = item.get("correct")
+            self.correct_bool = bool(correct)
+        elif self.qtype == "fill":
+            ans = item.get("answer")
+            answers = item.get("answers") or ([] if ans is None else [ans])
+            accept = item.get("accept") or []
+            self.accepted = frozenset(norm_text(a) for a in (answers + accept) if a)
+        elif self.qtype == "build":
+            self.accepted = frozenset(_expected_texts(item))
+
+        # (variant, match masks, max edits) per accepted variant, for typo tolerance.
+        self.fuzzy: Tuple[Tuple[str, Dict[str, int], int], ...] = ()
+        item_tolerance = _parse_tolerance(item.get("typo_tolerance"))
+        if item_tolerance is not None:
+            tolerance = item_tolerance
+        if tolerance and self.qtype in ("fill", "build"):
+            fuzzy = []
+            for variant in sorted(self.accepted):
+                k = _auto_max_edits(len(variant)) if tolerance == AUTO_TOLERANCE else tolerance
+                if variant and k:
+                    fuzzy.append((variant, _myers_peq(variant), k))
+            self.fuzzy = tuple(fuzzy)
+
+        # Presentation data for LessonDetailSerializer.get_questions.
+        self.prompt = item.get("prompt_en") or item.get("prompt_ro") or ""
+        self.lesson_qtype = _lesson_qtype(item.get("type"))
+        self.options = list(item.get("options") or [])
+        tokens = item.get("tokens")
+        if self.lesson_qtype == "build" and not tokens:
+            expected = item.get("answer_en") or item.get("answer_ro") or item.get("answer") or ""
+            tokens = expected.split()
+        self.tokens = tuple(tokens or ())
+
+    def answer_key(self) -> Dict[str, Any]:
+        """Plain-data grading spec, stored on QuizItem for signed quiz sessions."""
+        return {
+            "t": self.qtype,
+            "i": self.correct_index,
+            "b": self.correct_bool,
+            "a": sorted(self.accepted),
+            "f": bool(self.fuzzy),
+        }
+
+    def grade(self, selected: Any) -> bool:
+        return self.check(selected)[0]
+
+    def check(self, selected: Any) -> Tuple[bool, bool]:
+        """(is_correct, near_miss); near_miss means accepted only within typo tolerance."""
+        t = self.qtype
+        if t == "mcq":
+            if self.correct_index is None:
+                return False, False
+            try:
+                return int(selected.get("index")) == self.correct_index, False
+            except Exception:
+                return False, False
+        if t == "tf":
+            return bool(selected.get("value")) is self.correct_bool, False
+        if t == "fill":
+            cand = norm_text(selected.get("text") or "")
+            if cand in self.accepted:
+                return True, False
+        elif t == "build":
+            cand = norm_text(_tokens_to_text(selected))
+            if not cand:
+                return False, False
+            if cand in self.accepted:
+                return True, False
+        else:
+            return False, False
+
+        if cand and self.fuzzy:
+            n = len(cand)
+            for variant, peq, k in self.fuzzy:
+                if abs(n - len(variant)) <= k and _within_edits(variant, peq, cand, k):
+                    return True, True
+        return False, False
+
+
+def compile_quiz_items(items: List[Any], tolerance: Optional[int] = None) -> Tuple[CompiledItem, ...]:
+    return tuple(CompiledItem(it, tolerance) for it in items)
+
+
+def quiz_content_hash(items: List[Any]) -> str:
+    # marshal format 2 has no back-references, so equal content always
+    # serializes to equal bytes; it is several times cheaper than json.dumps.
+    try:
+        raw = marshal.dumps(items, 2)
+    except ValueError:
+        raw = json.dumps(items, separators=(",", ":"), default=str).encode("ascii")
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+# Per-worker plan cache. Keyed by (lesson id, quiz content hash, lesson
+# tolerance) so a reseeded lesson compiles a fresh plan; bounded so a large
+# catalog can't grow it forever.
+PLAN_CACHE_SIZE = 512
+_plan_cache: "OrderedDict[Tuple[int, str, Optional[int]], Tuple[CompiledItem, ...]]" = OrderedDict()
+_plan_lock = threading.Lock()
+
+# The Lesson columns get_quiz_plan() reads; load lessons with .only(*PLAN_FIELDS).
+PLAN_FIELDS = ("id", "content")
+
+
+def get_quiz_plan(lesson) -> Tuple[CompiledItem, ...]:
+    items = _extract_quiz_items(lesson)
+    if not items:
+        return ()
+    quiz = (lesson.content or {}).get("quiz") or {}
+    tolerance = _parse_tolerance(quiz.get("typo_tolerance"))
+    key = (lesson.pk, quiz_content_hash(items), tolerance)
+    with _plan_lock:
+        plan = _plan_cache.get(key)
+        if plan is not None:
+            _plan_cache.move_to_end(key)
+            return plan
+    plan = compile_quiz_items(items, tolerance)
+    with _plan_lock:
+        _plan_cache[key] = plan
+        while len(_plan_cache) > PLAN_CACHE_SIZE:
+            _plan_cache.popitem(last=False)
+    return plan
+
+
+def clear_quiz_plans() -> None:
+    with _plan_lock:
+        _plan_cache.clear()
@@ -0,0 +1,87 @@
+# english/leaderboard.py
+#
+# XP leaderboards kept as ranked score rows (LeaderboardScore), bumped with
+# one upsert whenever XP is awarded, plus one for their LeaderboardBand counts. Windows are keyed by their start date in
+# settings.TIME_ZONE, so a new week or month starts empty without touching
+# the old rows; prune them with `manage.py rebuild_leaderboards --prune`.
+#
+# Order is score descending, then user id; every read below is a range scan
+# of the (board, period, score, user) index, except rank_of(), which counts
+# the users with a higher score from LeaderboardBand.
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import LeaderboardBand, LeaderboardScore
+
+GLOBAL_PERIOD = date(2000, 1, 1)
+BOARDS = ("global", "weekly", "monthly")
+MAX_TOP = 100
+MAX_NEIGHBOURS = 10
+
+
+def board_period(board: str, when: Optional[datetime] = None) -> date:
+    if board == "global":
+        return GLOBAL_PERIOD
+    today = (when or timezone.now()).astimezone(ZoneInfo(settings.TIME_ZONE)).date()
+    if board == "weekly":
+        return today - timedelta(days=today.weekday())
+    if board == "monthly":
+        return today.replace(day=1)
+    raise ValueError(f"unknown board {board!r}")
+
+
+def award_xp(user, xp: int, when: Optional[datetime] = None) -> None:
+    if xp:
+        LeaderboardScore.objects.add(user.pk, {(board, board_period(board, when)): xp for board in BOARDS})
+
+
+def _entries(rows, first_rank: int) -> List[Dict[str, Any]]:
+    return [
+        {"rank": first_rank + n, "user_id": user_id, "username": username, "score": score}
+        for n, (user_id, username, score) in enumerate(rows)
+    ]
+
+
+def _board(board: str, period: date):
+    return LeaderboardScore.objects.filter(board=board, period=period)
+
+
+def top(board: str, period: date, limit: int) -> List[Dict[str, Any]]:
+    rows = (_board(board, period).order_by("-score", "user_id")
+            .values_list("user_id", "user__username", "score")[:limit])
+    return _entries(rows, 1)
+
+
+def rank_of(board: str, period: date, user_id: int) -> Optional[Dict[str, Any]]:
+    score = _board(board, period).filter(user_id=user_id).values_list("score", flat=True).first()
+    if score is None:
+        return None
+    higher = LeaderboardBand.objects.users_above(board, period, score)
+    # Users with the same score are still counted on the index (index-only),
+    # so ties add to the cost, but rank doesn't.
+    tied = _board(board, period).filter(score=score, user_id__lt=user_id).count()
+    return {"rank": higher + tied + 1, "score": score}
+
+
+def neighbours(board: str, period: date, user, me: Dict[str, Any], n: int) -> List[Dict[str, Any]]:
+    """Up to n entries either side of the user, in board order, including the user."""
+    user_id, score, rank = user.pk, me["score"], me["rank"]
+    qs = _board(board, period)
+    fields = ("user_id", "user__username", "score")
+    # Nearest first on each side; ties on score are split off so every
+    # query is a plain index range.
+    above = list(qs.filter(score=score, user_id__lt=user_id).order_by("-user_id").values_list(*fields)[:n])
+    if len(above) < n:
+        above += qs.filter(score__gt=score).order_by("score", "-user_id").values_list(*fields)[:n - len(above)]
+    below = list(qs.filter(score=score, user_id__gt=user_id).order_by("user_id").values_list(*fields)[:n])
+    if len(below) < n:
+        below += qs.filter(score__lt=score).order_by("-score", "user_id").values_list(*fields)[:n - len(below)]
+    return (
+        _entries(reversed(above), rank - len(above))
+        + _entries([(user_id, user.username, score)], rank)
+        + _entries(below, rank + 1)
+    )
@@ -0,0 +1,62 @@
+# english/lesson_render.py
+#
+# Lesson detail payloads are rendered to JSON bytes when the lesson is saved,
+# so LessonDetailView only has to splice in the per-request parts: the lesson
+# id (unknown before the first insert) and a fresh shuffle of each build
+# question's tokens. Token arrays are left as SLOT markers in the stored bytes;
+# rendered_slots holds each array's items as pre-encoded JSON fragments.
+import json
+import random
+from typing import List, Sequence, Tuple
+
+SLOT = "\x00tokens\x00"
+# Per-request shuffles are drawn from this many fixed orders per lesson, so
+# each variant's bytes (and their compressed forms) can be cached.
+SHUFFLE_VARIANTS = 8
+# Bump when render_lesson_detail's output changes for the same content, then
+# run `manage.py render_lessons`; it's part of the lesson ETags and pack
+# manifests, so clients holding the old payloads revalidate.
+RENDER_VERSION = 1
+_SLOT_BYTES = json.dumps(SLOT).encode()
+
+
+def _dumps(data) -> str:
+    # Same output as DRF's JSONRenderer: compact, UTF-8, with the two
+    # characters that are valid JSON but not JavaScript escaped.
+    ret = json.dumps(data, ensure_ascii=False, separators=(",", ":"))
+    return ret.replace("\u2028", "\\u2028").replace("\u2029", "\\u2029")
+
+
+def rendered_version(content_hash: str) -> str:
+    """Version of a lesson's rendered payload: moves with its content and with RENDER_VERSION."""
+    return f"{content_hash}.{RENDER_VERSION}"
+
+
+def render_lesson_detail(lesson) -> Tuple[bytes, List[List[str]]]:
+    from .serializers import LessonDetailSerializer
+
+    data = dict(LessonDetailSerializer(lesson, context={"shuffle": False}).data)
+    data.pop("id")
+    slots = []
+    for q in data["questions"]:
+        if q["qtype"] == "build":
+            slots.append([_dumps(t) for t in q["payload"]["tokens"]])
+            q["payload"] = {"tokens": SLOT}
+    return _dumps(data).encode(), slots
+
+
+def shuffle_variant(pk: int, slots: Sequence[Sequence[str]], rng=random) -> Tuple[int, random.Random]:
+    """A random variant number and the rng that reproduces its token order."""
+    variant = rng.randrange(SHUFFLE_VARIANTS) if slots else 0
+    return variant, random.Random(f"{pk}:{variant}")
+
+
+def splice_lesson_detail(pk: int, rendered: bytes, slots: Sequence[Sequence[str]], rng=random) -> bytes:
+    parts = bytes(rendered).split(_SLOT_BYTES)
+    out = [b'{"id":%d,' % pk, parts[0][1:]]
+    for frags, tail in zip(slots, parts[1:]):
+        frags = list(frags)
+        rng.shuffle(frags)
+        out.append(("[" + ",".join(frags) + "]").encode())
+        out.append(tail)
+    return b"".join(out)
@@ -0,0 +1,63 @@
+from collections import defaultdict
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from english.activity import local_day, parse_timezone
+from english.models import DailyActivity, LessonProgress, Profile, QuizAttempt, XpEvent, XpMonthlyRollup
+
+
+class Command(BaseCommand):
+    help = "Rebuild DailyActivity rows from QuizAttempt, XpEvent and LessonProgress history (idempotent)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only these user ids (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Users per transaction")
+
+    def handle(self, *args, **opts):
+        users = get_user_model().objects.order_by("pk")
+        if opts["user"]:
+            users = users.filter(pk__in=opts["user"])
+        user_ids = list(users.values_list("pk", flat=True))
+        batch = max(1, opts["batch_size"])
+
+        rows = 0
+        for start in range(0, len(user_ids), batch):
+            rows += self._rebuild(user_ids[start:start + batch])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rows} daily activity rows for {len(user_ids)} users"))
+
+    def _rebuild(self, user_ids):
+        default_tz = ZoneInfo(settings.TIME_ZONE)
+        tzs = {
+            user_id: parse_timezone(name) or default_tz
+            for user_id, name in Profile.objects.filter(user_id__in=user_ids).exclude(timezone="")
+            .values_list("user_id", "timezone")
+        }
+        counters = defaultdict(lambda: [0, 0])  # (user_id, day) -> [attempts, xp]
+
+        def day(user_id, when):
+            return user_id, local_day(tzs.get(user_id, default_tz), when)
+
+        for user_id, when in QuizAttempt.objects.filter(user_id__in=user_ids).values_list("user_id", "created_at").iterator():
+            counters[day(user_id, when)][0] += 1
+        for user_id, when, amount in XpEvent.objects.filter(user_id__in=user_ids).values_list("user_id", "created_at", "amount").iterator():
+            counters[day(user_id, when)][1] += amount
+        # Events in compacted months are gone; keep the xp already recorded for those days.
+        compacted = set(XpMonthlyRollup.objects.filter(user_id__in=user_ids).values_list("user_id", "month"))
+        if compacted:
+            for user_id, d, xp in DailyActivity.objects.filter(user_id__in=user_ids).values_list("user_id", "day", "xp"):
+                if (user_id, d.replace(day=1)) in compacted:
+                    counters[(user_id, d)][1] = xp
+        for user_id, when in LessonProgress.objects.filter(user_id__in=user_ids).values_list("user_id", "updated_at").iterator():
+            counters[day(user_id, when)]  # active day, no counters
+
+        with transaction.atomic():
+            DailyActivity.objects.filter(user_id__in=user_ids).delete()
+            DailyActivity.objects.bulk_create([
+                DailyActivity(user_id=user_id, day=d, attempts=attempts, xp=xp)
+                for (user_id, d), (attempts, xp) in counters.items()
+            ], batch_size=1000)
+        return len(counters)
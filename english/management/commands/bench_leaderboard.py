@@ -0,0 +1,69 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from english.leaderboard import award_xp, board_period, neighbours, rank_of, top
+from english.models import LeaderboardBand, LeaderboardScore
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark leaderboard reads and XP awards against N synthetic users (rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=1_000_000)
+        parser.add_argument("--samples", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        try:
+            with transaction.atomic():
+                self._run(opts["users"], opts["samples"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, n, samples):
+        User = get_user_model()
+        rng = random.Random(0)
+        period = board_period("weekly")
+
+        start = time.perf_counter()
+        user_ids = []
+        for lo in range(0, n, 10_000):
+            names = [f"bench-lb-{i}" for i in range(lo, min(n, lo + 10_000))]
+            User.objects.bulk_create([User(username=name, password="!") for name in names], batch_size=10_000)
+            # bulk_create doesn't return primary keys on every backend; read them back.
+            ids = list(User.objects.filter(username__in=names).values_list("pk", flat=True))
+            LeaderboardScore.objects.bulk_create([
+                LeaderboardScore(board="weekly", period=period, user_id=user_id, score=rng.randrange(100_000))
+                for user_id in ids
+            ], batch_size=10_000)
+            user_ids += ids
+        LeaderboardBand.objects.rebuild("weekly", period)
+        self.stdout.write(f"setup            {time.perf_counter() - start:9.1f} s for {n} users")
+
+        picked = User.objects.in_bulk(rng.sample(user_ids, min(samples, len(user_ids))))
+        users = list(picked.values())
+        # The last-ranked users: the most users ahead, the worst case for rank counts.
+        last = (LeaderboardScore.objects.filter(board="weekly", period=period)
+                .order_by("score", "-user_id").values_list("user_id", flat=True)[:samples])
+        bottom = list(User.objects.in_bulk(list(last)).values())
+        cases = (
+            ("top 10", users, lambda u: top("weekly", period, 10)),
+            ("my rank", users, lambda u: rank_of("weekly", period, u.pk)),
+            ("bottom rank", bottom, lambda u: rank_of("weekly", period, u.pk)),
+            ("rank+neighbours", users, lambda u: neighbours("weekly", period, u, rank_of("weekly", period, u.pk), 2)),
+            ("award xp", users, lambda u: award_xp(u, 10)),
+        )
+        for label, group, fn in cases:
+            start = time.perf_counter()
+            for u in group:
+                fn(u)
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:16s} {elapsed / len(group) * 1e3:9.3f} ms/op")
@@ -0,0 +1,32 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from english.lesson_render import render_lesson_detail, splice_lesson_detail
+from english.management.commands.seed_lesson1 import L1
+from english.models import Lesson
+from english.serializers import LessonDetailSerializer
+
+
+class Command(BaseCommand):
+    help = "Benchmark lesson detail rendering: serializer + JSONRenderer vs pre-rendered splice"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        lesson = Lesson(id=1, category_id=1, title=L1["title"], difficulty="A1", content=L1)
+        rendered, slots = render_lesson_detail(lesson)
+        renderer = JSONRenderer()
+        n = opts["requests"]
+
+        for label, fn in (
+            ("serializer", lambda: renderer.render(LessonDetailSerializer(lesson).data)),
+            ("pre-rendered", lambda: splice_lesson_detail(lesson.id, rendered, slots)),
+        ):
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:14s} {elapsed / n * 1e6:9.1f} us/request")
@@ -0,0 +1,93 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from english.grading import _extract_quiz_items, _grade_answer, clear_quiz_plans, get_quiz_plan
+from english.management.commands.seed_lesson1 import L1
+from english.management.commands.seed_lesson2 import L2
+from english.management.commands.seed_lesson3 import L3
+from english.models import Lesson
+
+
+def _answer_for(item):
+    # A plausible (mostly correct) client answer for a seed quiz item.
+    if item.get("options"):
+        options = item["options"]
+        correct = item.get("correct")
+        idx = options.index(correct) if correct in options else item.get("correct_index", 0)
+        return {"index": idx}
+    if "correct_bool" in item or "answer_bool" in item:
+        return {"value": True}
+    text = item.get("answer_en") or item.get("answer_ro") or item.get("answer") or ""
+    if item.get("tokens"):
+        return {"tokens": list(item["tokens"])}
+    return {"text": text}
+
+
+def _typo(selected):
+    # Drop one character from free-text answers to simulate a near miss.
+    if "tokens" in selected:
+        toks = list(selected["tokens"])
+        longest = max(range(len(toks)), key=lambda i: len(str(toks[i])))
+        toks[longest] = str(toks[longest])[:-1] or toks[longest]
+        return {"tokens": toks}
+    if "text" in selected and len(selected["text"]) > 3:
+        return {"text": selected["text"][:2] + selected["text"][3:]}
+    return selected
+
+
+class Command(BaseCommand):
+    help = "Benchmark quiz grading (submissions/sec) on a 50-item quiz: per-request grading vs compiled plans"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--items", type=int, default=50)
+        parser.add_argument("--requests", type=int, default=2000)
+
+    def handle(self, *args, **opts):
+        corpus = []
+        for lesson in (L1, L2, L3):
+            corpus.extend(lesson["quiz"]["items"])
+        items = [corpus[i % len(corpus)] for i in range(opts["items"])]
+        lesson = Lesson(id=1, title="bench", content={"quiz": {"items": items}})
+        answers = [{"question_id": i, "selected": _answer_for(it)} for i, it in enumerate(items, start=1)]
+        n = opts["requests"]
+
+        def before():
+            raw = _extract_quiz_items(lesson)
+            by_id = {a["question_id"]: a for a in answers}
+            return sum(
+                1 for idx, it in enumerate(raw, start=1)
+                if _grade_answer(it, (by_id.get(idx) or {}).get("selected") or {})
+            )
+
+        def graded(lesson, answers):
+            def run():
+                plan = get_quiz_plan(lesson)
+                by_id = {a["question_id"]: a for a in answers}
+                return sum(
+                    1 for idx, it in enumerate(plan, start=1)
+                    if it.grade((by_id.get(idx) or {}).get("selected") or {})
+                )
+            return run
+
+        after = graded(lesson, answers)
+        tolerant = Lesson(id=2, title="bench", content={"quiz": {"items": items, "typo_tolerance": "auto"}})
+        typos = [{"question_id": a["question_id"], "selected": _typo(a["selected"])} for a in answers]
+        wrong = [{"question_id": a["question_id"], "selected": {"text": "completely different answer"}} for a in answers]
+
+        clear_quiz_plans()
+        assert before() == after()
+
+        for label, fn in (
+            ("before (per-request)", before),
+            ("after (compiled plan)", after),
+            ("exact, typo answers", graded(lesson, typos)),
+            ("tolerant, exact answers", graded(tolerant, answers)),
+            ("tolerant, typo answers", graded(tolerant, typos)),
+            ("tolerant, wrong answers", graded(tolerant, wrong)),
+        ):
+            start = time.perf_counter()
+            for _ in range(n):
+                fn()
+            elapsed = time.perf_counter() - start
+            self.stdout.write(f"{label:24s} {n / elapsed:10.0f} req/s  {elapsed / n * 1e6:8.1f} us/req")
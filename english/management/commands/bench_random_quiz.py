@@ -0,0 +1,68 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from english.models import Category, Lesson, QuizItem
+from english.quiz_index import QTYPES, _sample_in_db, clear_sampling_pools, get_sampling_pool, sample_quiz_items
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark /quiz/random/ sampling latency against the QuizItem index (synthetic rows, rolled back)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sizes", default="1000,10000,100000")
+        parser.add_argument("--samples", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        sizes = sorted(int(x) for x in opts["sizes"].split(","))
+        try:
+            with transaction.atomic():
+                self._run(sizes, opts["samples"])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def _run(self, sizes, samples):
+        cat = Category.objects.create(slug="bench-random-quiz", title="Bench")
+        lessons = [
+            Lesson.objects.create(category=cat, title=f"Bench {i}", content={})
+            for i in range(100)
+        ]
+        have = 0
+        for n in sizes:
+            batch = []
+            for i in range(have, n):
+                lesson = lessons[i % len(lessons)]
+                batch.append(QuizItem(
+                    lesson=lesson, category=cat, item_index=i // len(lessons) + 1,
+                    qtype=QTYPES[i % len(QTYPES)], prompt=f"Question {i}",
+                    payload={"options": ["a", "b", "c"]},
+                ))
+            QuizItem.objects.bulk_create(batch, batch_size=5000)
+            have = n
+
+            clear_sampling_pools()
+            start = time.perf_counter()
+            pool = get_sampling_pool(cat.id)
+            self.stdout.write(f"{n:>8d} items  pool load       {(time.perf_counter() - start) * 1e3:9.3f} ms")
+
+            rng = random.Random(0)
+            recent = set(pool.sample(10 * 3, [], rng, set()))  # three earlier sessions
+            cases = (
+                ("select", lambda: pool.sample(10, ["mcq"], rng, set())),
+                ("select+recent", lambda: pool.sample(10, ["mcq"], rng, recent)),
+                ("pool+fetch", lambda: sample_quiz_items(10, category_id=cat.id, qtypes=["mcq"], rng=rng)),
+                ("db index", lambda: _sample_in_db(10, cat.id, ["mcq"], rng, set())),
+            )
+            for label, fn in cases:
+                start = time.perf_counter()
+                for _ in range(samples):
+                    fn()
+                elapsed = time.perf_counter() - start
+                self.stdout.write(f"{n:>8d} items  {label:14s} {elapsed / samples * 1e3:9.3f} ms/sample")
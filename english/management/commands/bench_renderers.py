@@ -0,0 +1,62 @@
+import time
+
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from english.management.commands.seed_lesson1 import L1
+from english.management.commands.seed_lesson2 import L2
+from english.management.commands.seed_lesson3 import L3
+from english.models import Lesson
+from english.quiz_index import index_entries
+from english.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from english.serializers import LessonDetailSerializer
+
+
+def _payloads():
+    lessons = [Lesson(id=n, category_id=1, title=c["title"], difficulty="A1", content=c)
+               for n, c in enumerate((L1, L2, L3), start=1)]
+    entries = [(lesson.id, e) for lesson in lessons for e in index_entries(lesson.content)]
+    items = [
+        {"id": qid, "lesson_id": lesson_id, "item_index": e["item_index"], "prompt": e["prompt"],
+         "qtype": e["qtype"], "payload": e["payload"]}
+        for qid, (lesson_id, e) in enumerate(entries, start=1)
+    ]
+    return {
+        "lesson detail": dict(LessonDetailSerializer(lessons[0]).data),
+        "random quiz": {"items": items[:20], "session": "x" * 400},
+        "categories": [
+            {"id": n, "slug": f"category-{n}", "title": f"Category {n}", "description": "Everyday words " * 4,
+             "emoji": "🏠", "completion_percentage": n % 101}
+            for n in range(50)
+        ],
+        "leaderboard": {
+            "board": "global", "period": "2000-01-01",
+            "top": [{"rank": n, "user_id": n, "username": f"user{n}", "score": 10_000 - n} for n in range(1, 101)],
+            "me": {"rank": 500, "score": 3000}, "around": [],
+        },
+    }
+
+
+class Command(BaseCommand):
+    help = "Benchmark response encoding per endpoint payload: DRF JSONRenderer vs FastJSONRenderer (vs MessagePack)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=5000)
+
+    def handle(self, *args, **opts):
+        n = opts["requests"]
+        renderers = [("stdlib json", JSONRenderer()), ("fast json", FastJSONRenderer())]
+        if msgpack is not None:
+            renderers.append(("msgpack", MessagePackRenderer()))
+        if orjson is None:
+            self.stdout.write("orjson is not installed: fast json falls back to stdlib")
+
+        self.stdout.write(f"{'payload':14s}" + "".join(f"{label:>22s}" for label, _ in renderers))
+        for name, data in _payloads().items():
+            cols = []
+            for _, renderer in renderers:
+                start = time.perf_counter()
+                for _ in range(n):
+                    body = renderer.render(data, "application/json")
+                cols.append(f"{(time.perf_counter() - start) / n * 1e6:10.1f} us {len(body):6d} B")
+            self.stdout.write(f"{name:14s}" + "".join(cols))
@@ -0,0 +1,96 @@
+import re
+import time
+import unicodedata
+
+from django.core.management.base import BaseCommand, CommandError
+
+from english.management.commands.seed_lesson1 import L1
+from english.management.commands.seed_lesson2 import L2
+from english.management.commands.seed_lesson3 import L3
+from english.textnorm import get_normalizer
+
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")
+
+
+def legacy_norm_text(s):
+    # The original views_quiz implementation, kept as the reference.
+    if not isinstance(s, str):
+        s = str(s or "")
+    nfd = unicodedata.normalize("NFD", s or "")
+    s = "".join(ch for ch in nfd if not unicodedata.combining(ch))
+    s = (
+        s
+        .replace("ș", "s").replace("Ş", "S").replace("Ș", "S")
+        .replace("ț", "t").replace("Ţ", "T").replace("Ț", "T")
+        .replace("ă", "a").replace("Ă", "A")
+        .replace("â", "a").replace("Â", "A")
+        .replace("î", "i").replace("Î", "I")
+    )
+    s = s.lower().strip()
+    s = _PUNCT_RE.sub(" ", s)
+    s = _WS_RE.sub(" ", s)
+    return s
+
+
+def _answer_corpus():
+    out = []
+    for lesson in (L1, L2, L3):
+        for it in lesson["quiz"]["items"]:
+            for k in ("answer_en", "answer_ro", "answer", "correct", "prompt_en", "prompt_ro"):
+                v = it.get(k)
+                if isinstance(v, str) and v:
+                    out.append(v)
+            for k in ("accept", "options"):
+                out.extend(x for x in (it.get(k) or []) if isinstance(x, str))
+    # Typical learner input: shouted, unpunctuated, extra spaces.
+    variants = []
+    for s in out:
+        variants.extend((s.upper(), s.rstrip(".!?"), "  " + s.replace(" ", "  ") + " "))
+    return out + variants
+
+
+class Command(BaseCommand):
+    help = "Micro-benchmark answer normalization on the seed-lesson answer corpora"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--profile", default="ro")
+        parser.add_argument("--rounds", type=int, default=200)
+
+    def handle(self, *args, **opts):
+        norm = get_normalizer(opts["profile"])
+        corpus = _answer_corpus()
+        ascii_part = [s for s in corpus if s.isascii()]
+        unicode_part = [s for s in corpus if not s.isascii()]
+
+        for s in corpus:
+            if norm(s) != legacy_norm_text(s):
+                raise CommandError(f"normalizer mismatch for {s!r}")
+
+        rounds = opts["rounds"]
+        self.stdout.write(
+            f"corpus: {len(corpus)} strings ({len(ascii_part)} ascii, {len(unicode_part)} non-ascii), "
+            f"{rounds} rounds"
+        )
+
+        def uncached(s):
+            return norm._normalize(s)
+
+        cases = (
+            ("legacy", legacy_norm_text),
+            ("translate", uncached),
+            ("translate+memo", norm),
+        )
+        for part_label, part in (("all", corpus), ("ascii", ascii_part), ("non-ascii", unicode_part)):
+            if not part:
+                continue
+            for label, fn in cases:
+                norm.cache_clear()
+                start = time.perf_counter()
+                for _ in range(rounds):
+                    for s in part:
+                        fn(s)
+                elapsed = time.perf_counter() - start
+                per_call = elapsed / (rounds * len(part)) * 1e9
+                self.stdout.write(f"{part_label:10s} {label:16s} {per_call:8.0f} ns/call")
+        self.stdout.write(f"memo: {norm.cache_info()}")
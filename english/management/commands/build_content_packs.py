@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from english.content_packs import build_pack, pack_manifest, pack_path, prune_packs
+from english.models import Category
+
+
+class Command(BaseCommand):
+    help = "Build the offline content pack of each category's current version (existing packs are kept)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--category", action="append", help="Only these category slugs (repeatable)")
+        parser.add_argument("--prune", action="store_true", help="Delete packs of older versions (all categories only)")
+
+    def handle(self, *args, **opts):
+        slugs = opts["category"] or list(Category.objects.order_by("slug").values_list("slug", flat=True))
+        if opts["prune"] and opts["category"]:
+            raise CommandError("--prune needs every category's current pack; drop --category")
+        current = []
+        for slug in slugs:
+            manifest = pack_manifest(slug)
+            if manifest is None:
+                raise CommandError(f"no category {slug!r}")
+            existed = pack_path(manifest).exists()
+            current.append(build_pack(manifest))
+            state = "exists" if existed else "built"
+            self.stdout.write(f"{slug}: {manifest['version']} ({len(manifest['lessons'])} lessons) {state}")
+        if opts["prune"]:
+            self.stdout.write(self.style.SUCCESS(f"pruned {prune_packs(current)} old packs"))
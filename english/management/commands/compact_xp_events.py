@@ -0,0 +1,35 @@
+import time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from english.xp import COMPACT_CHUNK, compact_chunk
+
+
+class Command(BaseCommand):
+    help = "Fold XpEvent rows older than the last N months into XpMonthlyRollup rows, in short chunked transactions"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--keep-months", type=int, default=1, help="Whole months of events kept before the current one")
+        parser.add_argument("--chunk-size", type=int, default=COMPACT_CHUNK)
+        parser.add_argument("--sleep", type=float, default=0.0, help="Seconds to pause between chunks")
+
+    def handle(self, *args, **opts):
+        now = timezone.now().astimezone(ZoneInfo(settings.TIME_ZONE))
+        month = now.year * 12 + now.month - 1 - max(0, opts["keep_months"])
+        before = now.replace(year=month // 12, month=month % 12 + 1, day=1, hour=0, minute=0, second=0, microsecond=0)
+
+        events = chunks = 0
+        while True:
+            folded, _ = compact_chunk(before, max(1, opts["chunk_size"]))
+            if not folded:
+                break
+            events += folded
+            chunks += 1
+            if opts["sleep"]:
+                time.sleep(opts["sleep"])
+        self.stdout.write(self.style.SUCCESS(
+            f"Folded {events} XP events created before {before:%Y-%m-%d} in {chunks} chunks"
+        ))
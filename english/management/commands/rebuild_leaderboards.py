@@ -0,0 +1,71 @@
+from datetime import datetime, time
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Sum
+
+from english.leaderboard import BOARDS, board_period
+from english.models import LeaderboardBand, LeaderboardScore, XpEvent, XpMonthlyRollup
+from english.xp import lifetime_xp_by_user
+
+
+class Command(BaseCommand):
+    help = "Rebuild leaderboard rows from the XP ledger; --prune drops finished weekly/monthly windows"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--board", choices=BOARDS, action="append", help="Only these boards (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Users per transaction for the global board")
+        parser.add_argument("--prune", action="store_true", help="Only delete rows of past windows")
+
+    def handle(self, *args, **opts):
+        boards = opts["board"] or list(BOARDS)
+        if opts["prune"]:
+            for board in boards:
+                if board != "global":
+                    deleted, _ = LeaderboardScore.objects.filter(board=board, period__lt=board_period(board)).delete()
+                    LeaderboardBand.objects.filter(board=board, period__lt=board_period(board)).delete()
+                    self.stdout.write(f"{board}: pruned {deleted} rows")
+            return
+
+        for board in boards:
+            rows = self._rebuild_global(opts["batch_size"]) if board == "global" else self._rebuild_window(board)
+            self.stdout.write(self.style.SUCCESS(f"{board}: {rows} rows"))
+
+    def _rebuild_global(self, batch):
+        user_ids = sorted(
+            set(XpEvent.objects.values_list("user_id", flat=True).distinct())
+            | set(XpMonthlyRollup.objects.values_list("user_id", flat=True).distinct())
+        )
+        period = board_period("global")
+        rows = 0
+        with transaction.atomic():
+            LeaderboardScore.objects.filter(board="global").exclude(user_id__in=user_ids).delete()
+        for start in range(0, len(user_ids), max(1, batch)):
+            chunk = user_ids[start:start + batch]
+            totals = lifetime_xp_by_user(chunk)
+            with transaction.atomic():
+                LeaderboardScore.objects.filter(board="global", user_id__in=chunk).delete()
+                LeaderboardScore.objects.bulk_create([
+                    LeaderboardScore(board="global", period=period, user_id=user_id, score=xp)
+                    for user_id, xp in totals.items() if xp
+                ], batch_size=1000)
+            rows += len(totals)
+        LeaderboardBand.objects.rebuild("global", period)
+        return rows
+
+    def _rebuild_window(self, board):
+        # Current windows are within the event tail as long as compact_xp_events
+        # keeps at least the previous month (its default).
+        period = board_period(board)
+        start = datetime.combine(period, time.min, tzinfo=ZoneInfo(settings.TIME_ZONE))
+        scores = (XpEvent.objects.filter(created_at__gte=start).values("user_id")
+                  .annotate(total=Sum("amount")).values_list("user_id", "total"))
+        with transaction.atomic():
+            LeaderboardScore.objects.filter(board=board, period=period).delete()
+            objs = [LeaderboardScore(board=board, period=period, user_id=user_id, score=total)
+                    for user_id, total in scores if total]
+            LeaderboardScore.objects.bulk_create(objs, batch_size=1000)
+            LeaderboardBand.objects.rebuild(board, period)
+        return len(objs)
@@ -0,0 +1,26 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from english.stats import recompute_user_stats
+
+
+class Command(BaseCommand):
+    help = "Rebuild UserStats rows from XpEvent, QuizAttempt, LessonProgress and DailyActivity"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--user", type=int, action="append", help="Only these user ids (repeatable)")
+        parser.add_argument("--batch-size", type=int, default=500, help="Users per transaction")
+
+    def handle(self, *args, **opts):
+        users = get_user_model().objects.order_by("pk")
+        if opts["user"]:
+            users = users.filter(pk__in=opts["user"])
+        user_ids = list(users.values_list("pk", flat=True))
+        batch = max(1, opts["batch_size"])
+
+        rows = 0
+        for start in range(0, len(user_ids), batch):
+            with transaction.atomic():
+                rows += recompute_user_stats(user_ids[start:start + batch])
+        self.stdout.write(self.style.SUCCESS(f"Recomputed stats for {rows} users"))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from english.catalog_cache import bump_catalog_generation
+from english.lesson_render import render_lesson_detail
+from english.models import Lesson
+
+
+class Command(BaseCommand):
+    help = "Re-render the stored lesson detail payloads (after upgrading, or bulk updates that bypass save())"
+
+    def handle(self, *args, **opts):
+        n = changed = 0
+        for lesson in Lesson.objects.all().iterator():
+            rendered, slots = render_lesson_detail(lesson)
+            n += 1
+            stored = lesson.rendered_detail
+            if stored is not None and bytes(stored) == rendered and lesson.rendered_slots == slots:
+                continue
+            # updated_at is the lesson's Last-Modified; update() doesn't touch it.
+            Lesson.objects.filter(pk=lesson.pk).update(
+                rendered_detail=rendered, rendered_slots=slots, updated_at=timezone.now(),
+            )
+            changed += 1
+        bump_catalog_generation()  # update() skips the signals that normally do this
+        self.stdout.write(self.style.SUCCESS(f"Rendered {n} lessons, {changed} changed"))
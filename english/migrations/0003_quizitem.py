@@ -0,0 +1,85 @@
+# Generated by Django 5.0.6 on 2026-10-18 13:59
+
+import django.db.models.deletion
+import english.models
+from django.db import migrations, models
+
+
+# Frozen copies of the item-type mapping and english.quiz_index.index_entries
+# as of this migration; later changes to the live code must not alter it.
+
+def _normalize_type(t):
+    t = (t or '').lower()
+    if t in ('choose', 'dialogue_reply', 'mcq'):
+        return 'mcq'
+    if t in ('tf', 'true_false'):
+        return 'tf'
+    if t in ('fill_blank', 'fill'):
+        return 'fill'
+    if t in ('translate_ro_en', 'translate_en_ro', 'word_order', 'build'):
+        return 'build'
+    return t
+
+
+def _index_entries(content):
+    items = ((content or {}).get('quiz') or {}).get('items') or []
+    out = []
+    for idx, it in enumerate(items, start=1):
+        if not isinstance(it, dict):
+            continue
+        t = _normalize_type(it.get('type'))
+        if t == 'mcq':
+            payload = {'options': it.get('options') or []}
+        elif t == 'tf':
+            payload = {}
+        elif t == 'build':
+            expected = it.get('answer_en') or it.get('answer_ro') or it.get('answer') or it.get('expected') or ''
+            payload = {'tokens': it.get('tokens') or expected.split()}
+        else:
+            t = 'fill'
+            payload = {'blanks': 1}
+        out.append({
+            'item_index': idx,
+            'qtype': t,
+            'prompt': it.get('prompt_en') or it.get('prompt_ro') or '',
+            'payload': payload,
+        })
+    return out
+
+
+def backfill_quiz_items(apps, schema_editor):
+    Lesson = apps.get_model('english', 'Lesson')
+    QuizItem = apps.get_model('english', 'QuizItem')
+    for lesson in Lesson.objects.all().iterator():
+        QuizItem.objects.bulk_create([
+            QuizItem(lesson_id=lesson.pk, category_id=lesson.category_id, **entry)
+            for entry in _index_entries(lesson.content)
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0002_quizattempt_xpevent_lessonprogress'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuizItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('item_index', models.PositiveIntegerField()),
+                ('qtype', models.CharField(max_length=10)),
+                ('prompt', models.TextField(blank=True)),
+                ('payload', models.JSONField(blank=True, default=dict)),
+                ('rand', models.FloatField(default=english.models.random_sort_key)),
+                ('category', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='english.category')),
+                ('lesson', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='quiz_items', to='english.lesson')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['rand'], name='english_qui_rand_ee07dc_idx'), models.Index(fields=['qtype', 'rand'], name='english_qui_qtype_a6bed9_idx'), models.Index(fields=['category', 'rand'], name='english_qui_categor_2a1da4_idx'), models.Index(fields=['category', 'qtype', 'rand'], name='english_qui_categor_24f2c7_idx')],
+                'unique_together': {('lesson', 'item_index')},
+            },
+        ),
+        migrations.RunPython(backfill_quiz_items, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,137 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:05
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+
+# Frozen copy of the answer keys english.grading.CompiledItem.answer_key()
+# produced as of this migration, with the answer-text normalization it used;
+# later changes to the live code must not alter it.
+
+_WS_RE = re.compile(r'\s+')
+_PUNCT_RE = re.compile(r'[^\w\s]')
+_FOLDS = {
+    'ș': 's', 'Ş': 'S', 'Ș': 'S',
+    'ț': 't', 'Ţ': 'T', 'Ț': 'T',
+    'ă': 'a', 'Ă': 'A',
+    'â': 'a', 'Â': 'A',
+    'î': 'i', 'Î': 'I',
+}
+
+
+def _norm_text(s):
+    if not isinstance(s, str):
+        s = str(s or '')
+    s = ''.join(ch for ch in unicodedata.normalize('NFD', s) if not unicodedata.combining(ch))
+    s = ''.join(_FOLDS.get(ch, ch) for ch in s)
+    s = s.lower().strip()
+    s = _PUNCT_RE.sub(' ', s)
+    return _WS_RE.sub(' ', s)
+
+
+def _normalize_type(t):
+    t = (t or '').lower()
+    if t in ('choose', 'dialogue_reply', 'mcq'):
+        return 'mcq'
+    if t in ('tf', 'true_false'):
+        return 'tf'
+    if t in ('fill_blank', 'fill'):
+        return 'fill'
+    if t in ('translate_ro_en', 'translate_en_ro', 'word_order', 'build'):
+        return 'build'
+    return t
+
+
+def _parse_tolerance(v):
+    if v is None:
+        return None
+    if v is True or v == 'auto':
+        return -1
+    if v is False:
+        return 0
+    try:
+        return max(0, int(v))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _expected_texts(item):
+    vals = []
+    for k in ('answer_en', 'answer_ro', 'answer', 'expected', 'solution'):
+        v = item.get(k)
+        if isinstance(v, str) and v:
+            vals.append(v)
+    for k in ('answers', 'accept', 'accept_en', 'answer_variants'):
+        v = item.get(k)
+        if isinstance(v, list):
+            vals.extend([x for x in v if isinstance(x, str) and x])
+    return {ns for ns in map(_norm_text, vals) if ns}
+
+
+def _answer_key(item, tolerance):
+    qtype = _normalize_type(item.get('type'))
+    correct_index, correct_bool, accepted = None, False, set()
+    if qtype == 'mcq':
+        correct_idx = item.get('correct_index')
+        if correct_idx is None:
+            options = item.get('options') or []
+            correct_text = item.get('correct')
+            if correct_text is not None and correct_text in options:
+                correct_idx = options.index(correct_text)
+        try:
+            correct_index = int(correct_idx)
+        except Exception:
+            correct_index = None
+    elif qtype == 'tf':
+        correct = item.get('correct_bool')
+        if correct is None:
+            correct = item.get('answer_bool')
+        if correct is None:
+            correct = item.get('correct')
+        correct_bool = bool(correct)
+    elif qtype == 'fill':
+        ans = item.get('answer')
+        answers = item.get('answers') or ([] if ans is None else [ans])
+        accepted = {_norm_text(a) for a in (answers + (item.get('accept') or [])) if a}
+    elif qtype == 'build':
+        accepted = _expected_texts(item)
+
+    item_tolerance = _parse_tolerance(item.get('typo_tolerance'))
+    if item_tolerance is not None:
+        tolerance = item_tolerance
+    fuzzy = bool(tolerance) and qtype in ('fill', 'build') and any(
+        v and (len(v) >= 4 if tolerance == -1 else True) for v in accepted
+    )
+    return {'t': qtype, 'i': correct_index, 'b': correct_bool, 'a': sorted(accepted), 'f': fuzzy}
+
+
+def backfill_answer_keys(apps, schema_editor):
+    Lesson = apps.get_model('english', 'Lesson')
+    QuizItem = apps.get_model('english', 'QuizItem')
+    for lesson in Lesson.objects.all().iterator():
+        quiz = (lesson.content or {}).get('quiz') or {}
+        tolerance = _parse_tolerance(quiz.get('typo_tolerance'))
+        for idx, it in enumerate(quiz.get('items') or [], start=1):
+            if not isinstance(it, dict):
+                continue
+            QuizItem.objects.filter(lesson_id=lesson.pk, item_index=idx).update(
+                answer_key=_answer_key(it, tolerance),
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0003_quizitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='quizitem',
+            name='answer_key',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_answer_keys, migrations.RunPython.noop),
+    ]
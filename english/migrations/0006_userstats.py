@@ -0,0 +1,30 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('english', '0005_profile_dailyactivity'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='english_stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('xp', models.IntegerField(default=0)),
+                ('total_questions', models.PositiveIntegerField(default=0)),
+                ('correct_answers', models.PositiveIntegerField(default=0)),
+                ('completed_lessons', models.IntegerField(default=0)),
+                ('level', models.PositiveIntegerField(default=1)),
+                ('streak', models.PositiveIntegerField(default=0)),
+                ('last_active_day', models.DateField(blank=True, null=True)),
+                ('last_active', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:25
+
+import hashlib
+import json
+
+from django.db import migrations, models
+
+
+# Frozen copy of english.models.content_digest as of this migration.
+def content_digest(*parts):
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'), ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+def backfill_content_hashes(apps, schema_editor):
+    Category = apps.get_model('english', 'Category')
+    Lesson = apps.get_model('english', 'Lesson')
+    for cat in Category.objects.all().iterator():
+        Category.objects.filter(pk=cat.pk).update(
+            content_hash=content_digest(cat.slug, cat.title, cat.description, cat.emoji),
+        )
+    for lesson in Lesson.objects.all().iterator():
+        Lesson.objects.filter(pk=lesson.pk).update(
+            content_hash=content_digest(lesson.category_id, lesson.title, lesson.difficulty, lesson.word_count, lesson.content),
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0008_leaderboardscore'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='category',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='category',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=32),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(backfill_content_hashes, migrations.RunPython.noop),
+    ]
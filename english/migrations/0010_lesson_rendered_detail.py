@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0009_content_versioning'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='lesson',
+            name='rendered_detail',
+            field=models.BinaryField(null=True),
+        ),
+        migrations.AddField(
+            model_name='lesson',
+            name='rendered_slots',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+    ]
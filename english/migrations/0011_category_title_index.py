@@ -0,0 +1,17 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0010_lesson_rendered_detail'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='category',
+            index=models.Index(fields=['title', 'id'], name='english_cat_title_9cf8c3_idx'),
+        ),
+    ]
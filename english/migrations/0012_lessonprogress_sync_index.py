@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-18 14:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0011_category_title_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='lessonprogress',
+            index=models.Index(fields=['user', 'updated_at', 'id'], name='english_les_user_id_0c2b2a_idx'),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.0.6 on 2026-10-18 15:09
+
+from django.db import migrations, models
+
+BAND_BITS = 4
+BAND_LEVELS = 16
+
+
+# Frozen copy of english.models.band_counts as of this migration.
+def band_counts(score_counts):
+    counts = {}
+    level_counts = dict(score_counts)
+    for level in range(BAND_LEVELS):
+        for band, n in level_counts.items():
+            counts[(level, band)] = n
+        above = {}
+        for band, n in level_counts.items():
+            above[band >> BAND_BITS] = above.get(band >> BAND_BITS, 0) + n
+        level_counts = above
+    return counts
+
+
+def backfill_bands(apps, schema_editor):
+    LeaderboardScore = apps.get_model('english', 'LeaderboardScore')
+    LeaderboardBand = apps.get_model('english', 'LeaderboardBand')
+    windows = LeaderboardScore.objects.values_list('board', 'period').distinct()
+    for board, period in list(windows):
+        scores = (LeaderboardScore.objects.filter(board=board, period=period)
+                  .values('score').annotate(n=models.Count('id')).values_list('score', 'n'))
+        LeaderboardBand.objects.bulk_create([
+            LeaderboardBand(board=board, period=period, level=level, band=band, users=n)
+            for (level, band), n in band_counts(dict(scores)).items()
+        ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('english', '0012_lessonprogress_sync_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('board', models.CharField(max_length=10)),
+                ('period', models.DateField()),
+                ('level', models.PositiveSmallIntegerField()),
+                ('band', models.BigIntegerField()),
+                ('users', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'unique_together': {('board', 'period', 'level', 'band')},
+            },
+        ),
+        migrations.RunPython(backfill_bands, migrations.RunPython.noop),
+    ]
@@ -1,17 +1,87 @@
-from django.db import models
+import hashlib
+import json
+import random
+
+from django.db import connections, models, transaction
+from django.utils import timezone
 from django.conf import settings
 
 
+def content_digest(*parts) -> str:
+    raw = json.dumps(parts, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.blake2b(raw.encode(), digest_size=16).hexdigest()
+
+
+UPSERT_VENDORS = ("mysql", "sqlite", "postgresql")
+
+
+def _upsert(queryset, columns, rows, keys, updates) -> None:
+    """
+    INSERT rows (sequences of db-prepared values, in `columns` order) in one
+    statement; where one collides with an existing row on the unique `keys`,
+    apply `updates` to it instead: {column: "add" | "max" | "set"}, i.e.
+    old + new, the larger of the two, or new. Only for UPSERT_VENDORS;
+    callers fall back to the ORM elsewhere.
+    """
+    conn = connections[queryset.db]
+    qn = conn.ops.quote_name
+    table = qn(queryset.model._meta.db_table)
+    params = [value for row in rows for value in row]
+    placeholders = "(" + ", ".join(["%s"] * len(columns)) + ")"
+    sql = (
+        f"INSERT INTO {table} ({', '.join(qn(c) for c in columns)}) "
+        f"VALUES {', '.join([placeholders] * len(rows))}"
+    )
+
+    # Templates for the stored value and the value this statement tried to insert.
+    if conn.vendor == "mysql":
+        old, greatest = "{c}", "GREATEST"
+        if not conn.mysql_is_mariadb and conn.mysql_version >= (8, 0, 19):
+            sql += " AS new"  # VALUES() is deprecated from 8.0.20
+            new = "new.{c}"
+        else:
+            new = "VALUES({c})"
+        sql += " ON DUPLICATE KEY UPDATE "
+    else:
+        old, new = table + ".{c}", "excluded.{c}"
+        greatest = "MAX" if conn.vendor == "sqlite" else "GREATEST"
+        sql += f" ON CONFLICT ({', '.join(qn(c) for c in keys)}) DO UPDATE SET "
+    exprs = {"add": f"{old} + {new}", "max": f"{greatest}({old}, {new})", "set": new}
+    sql += ", ".join(f"{qn(c)} = " + exprs[op].format(c=qn(c)) for c, op in updates.items())
+    with conn.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+def _with_versioning(update_fields):
+    if update_fields is None:
+        return None
+    return {*update_fields, "content_hash", "updated_at"}
+
+
 class Category(models.Model):
     slug = models.SlugField(unique=True)
     title = models.CharField(max_length=120)
     description = models.TextField(blank=True)
     emoji = models.CharField(max_length=8, blank=True)
     completion_percentage = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)  # content_digest() of the fields above
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["title", "id"]),  # keyset pages of the categories list
+        ]
 
     def __str__(self):
         return self.title
 
+    def compute_content_hash(self) -> str:
+        return content_digest(self.slug, self.title, self.description, self.emoji)
+
+    def save(self, *args, update_fields=None, **kwargs):
+        self.content_hash = self.compute_content_hash()
+        super().save(*args, update_fields=_with_versioning(update_fields), **kwargs)
+
 
 class Lesson(models.Model):
     category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="lessons")
@@ -20,10 +90,59 @@ class Lesson(models.Model):
     word_count = models.PositiveIntegerField(null=True, blank=True)
     content = models.JSONField(default=dict, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    content_hash = models.CharField(max_length=32, blank=True, editable=False)  # content_digest() of the fields above
+    # Lesson detail JSON without "id", pre-rendered on save (english.lesson_render)
+    rendered_detail = models.BinaryField(null=True, editable=False)
+    rendered_slots = models.JSONField(default=list, blank=True, editable=False)  # build tokens shuffled per request
 
     def __str__(self):
         return f"{self.title} ({self.category.slug})"
 
+    def compute_content_hash(self) -> str:
+        return content_digest(self.category_id, self.title, self.difficulty, self.word_count, self.content)
+
+    def save(self, *args, update_fields=None, **kwargs):
+        from .lesson_render import render_lesson_detail
+
+        previous_hash = self.__dict__.get("content_hash")  # as loaded; absent when deferred
+        self.content_hash = self.compute_content_hash()
+        # Read by the post_save quiz-index sync, which has nothing to do then.
+        self._content_unchanged = not self._state.adding and previous_hash == self.content_hash
+        self.rendered_detail, self.rendered_slots = render_lesson_detail(self)
+        if update_fields is not None:
+            update_fields = {*update_fields, "rendered_detail", "rendered_slots"}
+        super().save(*args, update_fields=_with_versioning(update_fields), **kwargs)
+
+
+class LessonProgressQuerySet(models.QuerySet):
+    def upsert(self, user, percents, keep_max=True):
+        """
+        Write the user's progress on one or more lessons in a single statement.
+        percents: {lesson_id: int}. With keep_max the stored percent only ever
+        goes up, which is what quiz submissions want; otherwise it is replaced.
+        """
+        if not percents:
+            return
+        conn = connections[self.db]
+        if conn.vendor not in UPSERT_VENDORS:
+            return self._upsert_fallback(user, percents, keep_max)
+
+        now = self.model._meta.get_field("updated_at").get_db_prep_value(timezone.now(), conn)
+        rows = [(user.pk, lesson_id, pct, now) for lesson_id, pct in sorted(percents.items())]  # stable lock order
+        _upsert(self, ("user_id", "lesson_id", "percent", "updated_at"), rows, keys=("user_id", "lesson_id"),
+                updates={"percent": "max" if keep_max else "set", "updated_at": "set"})
+
+    def _upsert_fallback(self, user, percents, keep_max):
+        with transaction.atomic(using=self.db):
+            for lesson_id, pct in sorted(percents.items()):
+                lp, created = self.select_for_update().get_or_create(
+                    user=user, lesson_id=lesson_id, defaults={"percent": pct},
+                )
+                if not created:
+                    lp.percent = max(lp.percent or 0, pct) if keep_max else pct
+                    lp.save(update_fields=["percent", "updated_at"])
+
 
 class LessonProgress(models.Model):
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -31,8 +150,13 @@ class LessonProgress(models.Model):
     percent = models.PositiveIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+    objects = LessonProgressQuerySet.as_manager()
+
     class Meta:
         unique_together = ('user', 'lesson')
+        indexes = [
+            models.Index(fields=["user", "updated_at", "id"]),  # sync/ cursor ranges
+        ]
 
 
 class QuizAttempt(models.Model):
@@ -48,3 +172,378 @@ class XpEvent(models.Model):
     amount = models.IntegerField()
     reason = models.CharField(max_length=120, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+
+
+def random_sort_key():
+    return random.random()
+
+
+class QuizItem(models.Model):
+    """
+    Flattened index of every lesson's quiz items, rebuilt whenever a lesson is
+    saved. Lets the random quiz sample questions without reading Lesson.content.
+    """
+    lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE, related_name="quiz_items")
+    category = models.ForeignKey(Category, on_delete=models.CASCADE, related_name="+")
+    item_index = models.PositiveIntegerField()  # 1-based position in content["quiz"]["items"]
+    qtype = models.CharField(max_length=10)  # mcq | tf | build | fill
+    prompt = models.TextField(blank=True)
+    payload = models.JSONField(default=dict, blank=True)  # options / unshuffled tokens
+    answer_key = models.JSONField(default=dict, blank=True)  # CompiledItem.answer_key(); never sent to clients
+    rand = models.FloatField(default=random_sort_key)  # random sort key for sampling
+
+    class Meta:
+        unique_together = ('lesson', 'item_index')
+        indexes = [
+            models.Index(fields=["rand"]),
+            models.Index(fields=["qtype", "rand"]),
+            models.Index(fields=["category", "rand"]),
+            models.Index(fields=["category", "qtype", "rand"]),
+        ]
+
+
+class Profile(models.Model):
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="english_profile",
+    )
+    timezone = models.CharField(max_length=64, blank=True)  # IANA name; blank = settings.TIME_ZONE
+
+
+class DailyActivityQuerySet(models.QuerySet):
+    def bump(self, user, day, attempts=0, xp=0):
+        """
+        Add to the user's counters for one (local) day in a single statement,
+        creating the row if needed. A row with zero counters still marks the
+        day as active.
+        """
+        conn = connections[self.db]
+        if conn.vendor not in UPSERT_VENDORS:
+            return self._bump_fallback(user, day, attempts, xp)
+
+        day = self.model._meta.get_field("day").get_db_prep_value(day, conn)
+        _upsert(self, ("user_id", "day", "attempts", "xp"), [(user.pk, day, attempts, xp)], keys=("user_id", "day"),
+                updates={"attempts": "add", "xp": "add"})
+
+    def _bump_fallback(self, user, day, attempts, xp):
+        with transaction.atomic(using=self.db):
+            _, created = self.get_or_create(user=user, day=day, defaults={"attempts": attempts, "xp": xp})
+            if not created and (attempts or xp):
+                self.filter(user=user, day=day).update(
+                    attempts=models.F("attempts") + attempts, xp=models.F("xp") + xp,
+                )
+
+
+class DailyActivity(models.Model):
+    """
+    One row per user per active day, in the user's timezone (Profile). Kept up
+    to date by the quiz and progress write paths; rebuild with
+    `manage.py backfill_daily_activity`.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    day = models.DateField()
+    attempts = models.PositiveIntegerField(default=0)
+    xp = models.IntegerField(default=0)
+
+    objects = DailyActivityQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user', 'day')  # also serves the per-user day range scans
+
+
+class UserStats(models.Model):
+    """
+    Per-user totals behind me/summary/, kept in step by the quiz and progress
+    write paths (english.stats); repair with `manage.py recompute_user_stats`.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="english_stats",
+    )
+    xp = models.IntegerField(default=0)
+    total_questions = models.PositiveIntegerField(default=0)
+    correct_answers = models.PositiveIntegerField(default=0)
+    completed_lessons = models.IntegerField(default=0)
+    level = models.PositiveIntegerField(default=1)
+    streak = models.PositiveIntegerField(default=0)  # consecutive days ending on last_active_day
+    last_active_day = models.DateField(null=True, blank=True)  # in the user's timezone
+    last_active = models.DateTimeField(null=True, blank=True)
+
+
+class XpRollupQuerySet(models.QuerySet):
+    def add(self, amounts):
+        """
+        Add to monthly rollup rows in one statement, creating them as needed.
+        amounts: {(user_id, month): (amount, events)}, month = first day of the month.
+        """
+        if not amounts:
+            return
+        conn = connections[self.db]
+        if conn.vendor not in UPSERT_VENDORS:
+            return self._add_fallback(amounts)
+
+        month_field = self.model._meta.get_field("month")
+        rows = [
+            (user_id, month_field.get_db_prep_value(month, conn), amount, events)
+            for (user_id, month), (amount, events) in sorted(amounts.items())  # stable lock order across writers
+        ]
+        _upsert(self, ("user_id", "month", "amount", "events"), rows, keys=("user_id", "month"),
+                updates={"amount": "add", "events": "add"})
+
+    def _add_fallback(self, amounts):
+        with transaction.atomic(using=self.db):
+            for (user_id, month), (amount, events) in sorted(amounts.items()):
+                _, created = self.get_or_create(
+                    user_id=user_id, month=month, defaults={"amount": amount, "events": events},
+                )
+                if not created:
+                    self.filter(user_id=user_id, month=month).update(
+                        amount=models.F("amount") + amount, events=models.F("events") + events,
+                    )
+
+
+class XpMonthlyRollup(models.Model):
+    """
+    XpEvent rows folded per user and month by `manage.py compact_xp_events`.
+    A user's lifetime XP is the sum of these plus their remaining XpEvents.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    month = models.DateField()  # first day of the month (settings.TIME_ZONE)
+    amount = models.BigIntegerField(default=0)
+    events = models.PositiveIntegerField(default=0)  # XpEvent rows folded in
+
+    objects = XpRollupQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('user', 'month')
+
+
+# LeaderboardBand levels: the band of a score at level L is
+# score >> (BAND_BITS * L), so level 0 is the exact score and each band holds
+# 2 ** BAND_BITS bands of the level below. BAND_LEVELS covers the range of
+# a BigIntegerField, so the top level has at most 2 ** BAND_BITS bands.
+BAND_BITS = 4
+BAND_LEVELS = 16
+
+
+def band_moves(old, new):
+    """{(level, band): +1 / -1} for a user whose score goes from old to new (None: no row)."""
+    moves = {}
+    for level in range(BAND_LEVELS):
+        shift = BAND_BITS * level
+        was = None if old is None else old >> shift
+        now = None if new is None else new >> shift
+        if was == now:
+            break  # the same band here is the same band on every level above
+        if was is not None:
+            moves[(level, was)] = -1
+        if now is not None:
+            moves[(level, now)] = 1
+    return moves
+
+
+def bands_above(score):
+    """
+    [(level, low, high)]: the bands with low < band < high (high None: no
+    upper bound) hold every higher score than `score` exactly once. A higher
+    score is in a higher band on exactly one level, the lowest one where both
+    share the parent band, so these are the later siblings of the score's
+    band on each level: at most 2 ** BAND_BITS - 1 bands per level.
+    """
+    ranges = []
+    for level in range(BAND_LEVELS):
+        band = score >> (BAND_BITS * level)
+        if level == BAND_LEVELS - 1:
+            ranges.append((level, band, None))  # the top level has a single parent
+        elif band % (1 << BAND_BITS) != (1 << BAND_BITS) - 1:  # not the last sibling
+            ranges.append((level, band, ((band >> BAND_BITS) + 1) << BAND_BITS))
+    return ranges
+
+
+def band_counts(score_counts):
+    """{(level, band): users} from {score: users}."""
+    counts = {}
+    level_counts = dict(score_counts)
+    for level in range(BAND_LEVELS):
+        for band, n in level_counts.items():
+            counts[(level, band)] = n
+        above = {}
+        for band, n in level_counts.items():
+            above[band >> BAND_BITS] = above.get(band >> BAND_BITS, 0) + n
+        level_counts = above
+    return counts
+
+
+class LeaderboardQuerySet(models.QuerySet):
+    def add(self, user_id, amounts):
+        """
+        Add XP to one user's score on several boards and move the user to
+        its new LeaderboardBand rows. amounts: {(board, period): xp}.
+        """
+        if not amounts:
+            return
+        keys = sorted(amounts)
+        with transaction.atomic(using=self.db, savepoint=False):
+            before = self._scores(user_id, keys, lock=True)
+            self._add_scores(user_id, amounts)
+            # A row missing above may have been created by a concurrent award
+            # since; the upsert waited for it, and now holds its lock.
+            after = self._scores(user_id, [key for key in keys if key not in before])
+            moves = {}
+            for key in keys:
+                xp = amounts[key]
+                if key in before:
+                    old, new = before[key], before[key] + xp
+                else:
+                    new = after[key]
+                    old = None if new == xp else new - xp
+                for (level, band), n in band_moves(old, new).items():
+                    moves[(*key, level, band)] = n
+            LeaderboardBand.objects.using(self.db).add(moves)
+
+    def remove_user(self, user_id):
+        """Take a user off every board's bands; call before deleting their rows."""
+        with transaction.atomic(using=self.db, savepoint=False):
+            moves = {}
+            rows = self.select_for_update().filter(user_id=user_id).values_list("board", "period", "score")
+            for board, period, score in rows:
+                for (level, band), n in band_moves(score, None).items():
+                    moves[(board, period, level, band)] = n
+            LeaderboardBand.objects.using(self.db).add(moves)
+
+    def _scores(self, user_id, keys, lock=False):
+        if not keys:
+            return {}
+        match = models.Q()
+        for board, period in keys:
+            match |= models.Q(board=board, period=period)
+        qs = self.filter(match, user_id=user_id)
+        if lock:
+            qs = qs.select_for_update()
+        return {(board, period): score for board, period, score in qs.values_list("board", "period", "score")}
+
+    def _add_scores(self, user_id, amounts):
+        conn = connections[self.db]
+        if conn.vendor not in UPSERT_VENDORS:
+            return self._add_fallback(user_id, amounts)
+
+        period_field = self.model._meta.get_field("period")
+        now = self.model._meta.get_field("updated_at").get_db_prep_value(timezone.now(), conn)
+        rows = [
+            (board, period_field.get_db_prep_value(period, conn), user_id, xp, now)
+            for (board, period), xp in sorted(amounts.items())
+        ]
+        _upsert(self, ("board", "period", "user_id", "score", "updated_at"), rows, keys=("board", "period", "user_id"),
+                updates={"score": "add", "updated_at": "set"})
+
+    def _add_fallback(self, user_id, amounts):
+        with transaction.atomic(using=self.db):
+            for (board, period), xp in sorted(amounts.items()):
+                _, created = self.get_or_create(
+                    board=board, period=period, user_id=user_id, defaults={"score": xp},
+                )
+                if not created:
+                    self.filter(board=board, period=period, user_id=user_id).update(score=models.F("score") + xp)
+
+
+class LeaderboardScore(models.Model):
+    """
+    A user's XP on one leaderboard window: board "global" (period is a fixed
+    date), "weekly" (period = Monday) or "monthly" (period = 1st). A new
+    window simply starts with no rows. Maintained by english.leaderboard.
+    """
+    board = models.CharField(max_length=10)
+    period = models.DateField()
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
+    score = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    objects = LeaderboardQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('board', 'period', 'user')
+        indexes = [
+            # top-N, tie counts and neighbours: ORDER BY score DESC, user_id
+            models.Index(fields=["board", "period", "score", "user"]),
+        ]
+
+
+class LeaderboardBandQuerySet(models.QuerySet):
+    def add(self, deltas):
+        """
+        Add to band counts in one statement, creating rows as needed.
+        deltas: {(board, period, level, band): users}.
+        """
+        if not deltas:
+            return
+        conn = connections[self.db]
+        if conn.vendor not in UPSERT_VENDORS:
+            return self._add_fallback(deltas)
+
+        period_field = self.model._meta.get_field("period")
+        rows = [
+            (board, period_field.get_db_prep_value(period, conn), level, band, n)
+            for (board, period, level, band), n in sorted(deltas.items())  # stable lock order across writers
+        ]
+        _upsert(self, ("board", "period", "level", "band", "users"), rows, keys=("board", "period", "level", "band"),
+                updates={"users": "add"})
+
+    def _add_fallback(self, deltas):
+        with transaction.atomic(using=self.db):
+            for (board, period, level, band), n in sorted(deltas.items()):
+                _, created = self.get_or_create(
+                    board=board, period=period, level=level, band=band, defaults={"users": n},
+                )
+                if not created:
+                    self.filter(board=board, period=period, level=level, band=band).update(
+                        users=models.F("users") + n,
+                    )
+
+    def users_above(self, board, period, score):
+        """How many users of the window have a higher score, from bands_above()."""
+        conn = connections[self.db]
+        qn = conn.ops.quote_name
+        period = self.model._meta.get_field("period").get_db_prep_value(period, conn)
+        terms, params = [], []
+        for level, low, high in bands_above(score):
+            term = f"{qn('board')} = %s AND {qn('period')} = %s AND {qn('level')} = %s AND {qn('band')} > %s"
+            params += [board, period, level, low]
+            if high is not None:
+                term += f" AND {qn('band')} < %s"
+                params.append(high)
+            terms.append(f"({term})")
+        # Each term is a full range of the unique index, so every backend
+        # reads just those index ranges.
+        sql = (f"SELECT COALESCE(SUM({qn('users')}), 0) FROM {qn(self.model._meta.db_table)} "
+               f"WHERE {' OR '.join(terms)}")
+        with conn.cursor() as cursor:
+            cursor.execute(sql, params)
+            return int(cursor.fetchone()[0])
+
+    def rebuild(self, board, period):
+        """Recount one window's bands from its LeaderboardScore rows."""
+        with transaction.atomic(using=self.db):
+            scores = (LeaderboardScore.objects.using(self.db).filter(board=board, period=period)
+                      .values("score").annotate(n=models.Count("id")).values_list("score", "n"))
+            counts = band_counts(dict(scores))
+            self.filter(board=board, period=period).delete()
+            self.bulk_create([
+                LeaderboardBand(board=board, period=period, level=level, band=band, users=n)
+                for (level, band), n in counts.items()
+            ], batch_size=1000)
+
+
+class LeaderboardBand(models.Model):
+    """
+    How many users of a leaderboard window have a score in one band (see
+    BAND_BITS), so english.leaderboard.rank_of() can count the users ahead
+    from a bounded number of rows. Kept in step by LeaderboardScore.objects.add().
+    """
+    board = models.CharField(max_length=10)
+    period = models.DateField()
+    level = models.PositiveSmallIntegerField()
+    band = models.BigIntegerField()
+    users = models.BigIntegerField(default=0)
+
+    objects = LeaderboardBandQuerySet.as_manager()
+
+    class Meta:
+        unique_together = ('board', 'period', 'level', 'band')
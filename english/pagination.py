@@ -0,0 +1,60 @@
+# english/pagination.py
+#
+# Opt-in keyset pagination for the catalog listings. A request with `limit`
+# or `cursor` gets {"results": [...], "next": cursor or null}; without either
+# the view keeps returning the plain array. Cursors are opaque (base64 of the
+# last row's sort key) and each page is a range read on the ordering
+# columns, so a deep page costs the same as the first one.
+import base64
+import binascii
+import json
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 200
+
+
+class CursorError(ValueError):
+    pass
+
+
+def wants_page(request) -> bool:
+    return "limit" in request.query_params or "cursor" in request.query_params
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    raw = json.dumps(list(key), separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, types: Tuple[type, ...]) -> list:
+    """The sort key in a cursor; types are those of its parts, in order."""
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise CursorError("invalid cursor")
+    if (not isinstance(key, list) or len(key) != len(types)
+            or not all(type(v) is t for v, t in zip(key, types))):
+        raise CursorError("invalid cursor")
+    return key
+
+
+def page_params(request, types: Tuple[type, ...]) -> Tuple[int, Optional[list]]:
+    """(limit, sort key to start after or None); raises CursorError."""
+    try:
+        limit = min(max(int(request.query_params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+    except ValueError:
+        raise CursorError("limit must be an integer")
+    cursor = request.query_params.get("cursor")
+    return limit, decode_cursor(cursor, types) if cursor else None
+
+
+def page(rows: List[Any], limit: int, key: Callable[[Any], Sequence[Any]],
+         serialize: Callable[[List[Any]], list]) -> Dict[str, Any]:
+    """rows holds up to limit + 1 items; the extra one only signals a next page."""
+    more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        "results": serialize(rows),
+        "next": encode_cursor(key(rows[-1])) if more else None,
+    }
@@ -0,0 +1,291 @@
+# english/quiz_index.py
+import random
+import threading
+import time
+from array import array
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .grading import CompiledItem, _normalize_type, _parse_tolerance
+from .models import QuizItem
+
+QTYPES = ("mcq", "tf", "build", "fill")
+
+
+def index_entries(content: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """QuizItem field values for every quiz item in a lesson's content."""
+    quiz = (content or {}).get("quiz") or {}
+    items = quiz.get("items") or []
+    tolerance = _parse_tolerance(quiz.get("typo_tolerance"))
+    out = []
+    for idx, it in enumerate(items, start=1):
+        if not isinstance(it, dict):
+            continue
+        t = _normalize_type(it.get("type"))
+        if t == "mcq":
+            payload = {"options": it.get("options") or []}
+        elif t == "tf":
+            payload = {}
+        elif t == "build":
+            expected = (
+                it.get("answer_en")
+                or it.get("answer_ro")
+                or it.get("answer")
+                or it.get("expected")
+                or ""
+            )
+            payload = {"tokens": it.get("tokens") or expected.split()}
+        else:
+            t = "fill"
+            payload = {"blanks": 1}
+        out.append({
+            "item_index": idx,
+            "qtype": t,
+            "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
+            "payload": payload,
+            "answer_key": CompiledItem(it, tolerance).answer_key(),
+        })
+    return out
+
+
+INDEX_FIELDS = ("qtype", "prompt", "payload", "answer_key")
+
+
+def sync_lesson_quiz_items(lesson) -> None:
+    """
+    Bring the lesson's QuizItem rows in line with its content. Rows are
+    matched on item_index and updated in place, so items keep their ids
+    (which sampling pools, sessions and recent-session exclusions hold on to);
+    only indexes that no longer exist are deleted.
+    """
+    if getattr(lesson, "_content_unchanged", False):
+        return
+    entries = {entry["item_index"]: entry for entry in index_entries(lesson.content)}
+    with transaction.atomic():
+        existing = {
+            row["item_index"]: row
+            for row in QuizItem.objects.filter(lesson_id=lesson.pk).values("id", "item_index", "category_id",
+                                                                           *INDEX_FIELDS)
+        }
+        removed = [row["id"] for idx, row in existing.items() if idx not in entries]
+        changed, added = [], []
+        for idx, entry in entries.items():
+            row = existing.get(idx)
+            if row is None:
+                added.append(QuizItem(lesson_id=lesson.pk, category_id=lesson.category_id, **entry))
+            elif row["category_id"] != lesson.category_id or any(row[f] != entry[f] for f in INDEX_FIELDS):
+                changed.append(QuizItem(id=row["id"], category_id=lesson.category_id,
+                                        **{f: entry[f] for f in INDEX_FIELDS}))
+        if removed:
+            QuizItem.objects.filter(id__in=removed).delete()
+        if changed:
+            QuizItem.objects.bulk_update(changed, ["category", *INDEX_FIELDS])
+        if added:
+            QuizItem.objects.bulk_create(added)
+        if removed or changed or added:
+            transaction.on_commit(bump_quiz_index_version)
+
+
+# ----- Sampling -----
+#
+# Each worker keeps a pool of QuizItem ids per category (None = all), bucketed
+# by qtype, so picking questions is pure in-process work. Pools are tagged with
+# a version counter kept in the Django cache and bumped whenever the index
+# changes; a pool whose version is stale (or older than POOL_MAX_AGE, for
+# per-process cache backends that can't see other workers' bumps) is reloaded.
+# Scopes larger than POOL_MAX_ITEMS are sampled in the database instead.
+
+VERSION_CACHE_KEY = "english:quiz-index-version"
+RECENT_CACHE_KEY = "english:quiz-recent:{user_id}"
+RECENT_SESSIONS = 3
+RECENT_TTL = 60 * 60 * 24
+POOL_MAX_AGE = 300
+POOL_MAX_ITEMS = 500_000
+
+ITEM_FIELDS = ("id", "lesson_id", "item_index", "qtype", "prompt", "payload", "answer_key")
+
+
+def bump_quiz_index_version() -> None:
+    try:
+        cache.incr(VERSION_CACHE_KEY)
+    except ValueError:
+        cache.set(VERSION_CACHE_KEY, 1, None)
+
+
+def quiz_index_version() -> int:
+    return cache.get(VERSION_CACHE_KEY, 0)
+
+
+class SamplingPool:
+    __slots__ = ("version", "loaded_at", "buckets", "oversized")
+
+    def __init__(self, category_id: Optional[int], version: int):
+        self.version = version
+        self.loaded_at = time.monotonic()
+        self.buckets: Dict[str, array] = {}
+        self.oversized = False
+
+        qs = QuizItem.objects.order_by("id")
+        if category_id is not None:
+            qs = qs.filter(category_id=category_id)
+        rows = qs.values_list("qtype", "id")[:POOL_MAX_ITEMS + 1]
+        for n, (qtype, item_id) in enumerate(rows.iterator()):
+            if n == POOL_MAX_ITEMS:
+                self.oversized = True
+                self.buckets = {}
+                break
+            bucket = self.buckets.get(qtype)
+            if bucket is None:
+                bucket = self.buckets[qtype] = array("q")
+            bucket.append(item_id)
+
+    def is_fresh(self, version: int) -> bool:
+        return self.version == version and time.monotonic() - self.loaded_at < POOL_MAX_AGE
+
+    def sample(self, k: int, qtypes: Sequence[str], rng, exclude: Set[int]) -> List[int]:
+        buckets = [self.buckets[t] for t in (qtypes or sorted(self.buckets)) if t in self.buckets]
+        total = sum(len(b) for b in buckets)
+        k = min(k, total)
+        if k <= 0:
+            return []
+
+        def at(i: int) -> int:
+            for b in buckets:
+                if i < len(b):
+                    return b[i]
+                i -= len(b)
+            raise IndexError(i)
+
+        if not exclude:
+            return [at(i) for i in rng.sample(range(total), k)]
+
+        # Rejection sampling handles the usual case of a small exclusion set in O(k).
+        picked: List[int] = []
+        seen: Set[int] = set()
+        for _ in range(4 * k):
+            if len(picked) == k:
+                return picked
+            i = rng.randrange(total)
+            if i in seen:
+                continue
+            seen.add(i)
+            item_id = at(i)
+            if item_id not in exclude:
+                picked.append(item_id)
+
+        # Recent sessions cover much of the pool: reservoir-sample what's left,
+        # then top up with recently seen items rather than return a short quiz.
+        taken = set(picked)
+        ids = [item_id for b in buckets for item_id in b]
+        fresh = (i for i in ids if i not in taken and i not in exclude)
+        picked.extend(_reservoir(fresh, k - len(picked), rng))
+        if len(picked) < k:
+            taken = set(picked)
+            picked.extend(_reservoir((i for i in ids if i not in taken), k - len(picked), rng))
+        return picked
+
+
+def _reservoir(iterable, k: int, rng) -> List[int]:
+    """Algorithm R: uniform sample of k items from a stream of unknown length."""
+    out: List[int] = []
+    if k <= 0:
+        return out
+    for n, x in enumerate(iterable):
+        if n < k:
+            out.append(x)
+        else:
+            j = rng.randrange(n + 1)
+            if j < k:
+                out[j] = x
+    return out
+
+
+_pools: Dict[Optional[int], SamplingPool] = {}
+_pools_lock = threading.Lock()
+
+
+def get_sampling_pool(category_id: Optional[int]) -> SamplingPool:
+    version = quiz_index_version()
+    pool = _pools.get(category_id)
+    if pool is not None and pool.is_fresh(version):
+        return pool
+    with _pools_lock:
+        pool = _pools.get(category_id)
+        if pool is None or not pool.is_fresh(version):
+            pool = _pools[category_id] = SamplingPool(category_id, version)
+    return pool
+
+
+def clear_sampling_pools() -> None:
+    with _pools_lock:
+        _pools.clear()
+
+
+def _sample_in_db(size, category_id, qtypes, rng, exclude) -> List[Dict[str, Any]]:
+    # Rows carry a uniform random sort key, so a window of consecutive keys
+    # from a random starting point is already a random mix of lessons: one
+    # index range scan of a few rows, however large the table is. The window
+    # is over-fetched and sampled again so the same neighbours don't always
+    # appear together.
+    qs = QuizItem.objects.all()
+    if category_id is not None:
+        qs = qs.filter(category_id=category_id)
+    if len(qtypes) == 1:
+        qs = qs.filter(qtype=qtypes[0])
+    elif qtypes:
+        qs = qs.filter(qtype__in=qtypes)
+    if exclude:
+        qs = qs.exclude(id__in=exclude)
+
+    window = size * 3
+    pivot = rng.random()
+    rows = list(qs.filter(rand__gte=pivot).order_by("rand").values(*ITEM_FIELDS)[:window])
+    if len(rows) < window:  # wrap around past 1.0
+        rows += list(qs.filter(rand__lt=pivot).order_by("rand").values(*ITEM_FIELDS)[:window - len(rows)])
+    return rng.sample(rows, k=min(size, len(rows)))
+
+
+def _recent_key(user) -> str:
+    return RECENT_CACHE_KEY.format(user_id=user.pk)
+
+
+def recent_item_ids(user) -> Set[int]:
+    sessions = cache.get(_recent_key(user)) or []
+    return {item_id for session in sessions for item_id in session}
+
+
+def remember_session(user, item_ids: List[int]) -> None:
+    key = _recent_key(user)
+    sessions = cache.get(key) or []
+    cache.set(key, [list(item_ids)] + sessions[:RECENT_SESSIONS - 1], RECENT_TTL)
+
+
+def sample_quiz_items(
+    size: int,
+    category_id: Optional[int] = None,
+    qtypes: Optional[Iterable[str]] = None,
+    rng=None,
+    exclude: Optional[Set[int]] = None,
+) -> List[Dict[str, Any]]:
+    """
+    Random sample of indexed quiz items as QuizItem value dicts. Pass a seeded
+    random.Random as rng for a reproducible pick (for a given index version),
+    and exclude to avoid QuizItem ids the user has just seen.
+    """
+    if size <= 0:
+        return []
+    rng = rng or random
+    qtypes = list(qtypes or ())
+    exclude = exclude or set()
+
+    pool = get_sampling_pool(category_id)
+    if pool.oversized:
+        return _sample_in_db(size, category_id, qtypes, rng, exclude)
+
+    ids = pool.sample(size, qtypes, rng, exclude)
+    if not ids:
+        return []
+    rows = {r["id"]: r for r in QuizItem.objects.filter(id__in=ids).values(*ITEM_FIELDS)}
+    return [rows[i] for i in ids if i in rows]  # skip rows removed since the pool loaded
@@ -0,0 +1,105 @@
+# english/quiz_sessions.py
+#
+# Signed, stateless random-quiz sessions. quiz/random/ hands the client a token
+# listing the sampled items together with keyed hashes of their normalized
+# answers, so the submit path can grade without reading Lesson.content. The
+# token is signed (the item list can't be altered) and bound to the user; each
+# session id can be redeemed once. Hashes are HMACs keyed by SECRET_KEY, the
+# session id and the item position, so they can't be brute-forced offline even
+# for two-option questions. Items with typo tolerance carry no hashes (near
+# misses need the plain answers) and are graded from the compiled plan.
+#
+# Replay protection uses the Django cache; with a per-process backend
+# (locmem) it only holds within one worker. The claim is taken before grading
+# and released again if the submit doesn't commit.
+import secrets
+from typing import Any, Dict, List, Optional
+
+from django.core import signing
+from django.core.cache import cache
+from django.utils.crypto import salted_hmac
+
+from .grading import _tokens_to_text, norm_text
+
+SESSION_SALT = "english.quiz-session"
+SESSION_MAX_AGE = 60 * 60 * 6
+USED_CACHE_KEY = "english:quiz-session-used:{sid}"
+
+
+class QuizSessionError(Exception):
+    pass
+
+
+def _answer_hash(sid: str, position: int, value: str) -> str:
+    return salted_hmac(f"english.quiz-answer:{sid}:{position}", value).hexdigest()[:20]
+
+
+def _key_values(key: Dict[str, Any]) -> List[str]:
+    t = key.get("t")
+    if t == "mcq":
+        return [] if key.get("i") is None else [str(key["i"])]
+    if t == "tf":
+        return ["1" if key.get("b") else "0"]
+    if t in ("fill", "build"):
+        return list(key.get("a") or [])
+    return []
+
+
+def _candidate_value(t: str, selected: Any) -> Optional[str]:
+    if not isinstance(selected, dict):
+        return None  # malformed answer: graded as wrong
+    if t == "mcq":
+        try:
+            return str(int(selected.get("index")))
+        except Exception:
+            return None
+    if t == "tf":
+        return "1" if selected.get("value") else "0"
+    if t == "fill":
+        return norm_text(selected.get("text") or "")
+    if t == "build":
+        return norm_text(_tokens_to_text(selected)) or None
+    return None
+
+
+def issue_quiz_session(user, rows: List[Dict[str, Any]]) -> str:
+    """rows: sampled QuizItem values (lesson_id, item_index, answer_key), in question order."""
+    sid = secrets.token_urlsafe(12)
+    items = []
+    for pos, row in enumerate(rows, start=1):
+        key = row.get("answer_key") or {}
+        if not key or key.get("f"):
+            hashes = None
+        else:
+            hashes = [_answer_hash(sid, pos, v) for v in _key_values(key)]
+        items.append([row["lesson_id"], row["item_index"], key.get("t", ""), hashes])
+    return signing.dumps({"u": user.pk, "s": sid, "q": items}, salt=SESSION_SALT, compress=True)
+
+
+def open_quiz_session(token: Any, user) -> Dict[str, Any]:
+    try:
+        data = signing.loads(str(token), salt=SESSION_SALT, max_age=SESSION_MAX_AGE)
+    except signing.SignatureExpired:
+        raise QuizSessionError("Quiz session expired")
+    except signing.BadSignature:
+        raise QuizSessionError("Invalid quiz session")
+    if not isinstance(data, dict) or data.get("u") != user.pk:
+        raise QuizSessionError("Invalid quiz session")
+    return data
+
+
+def claim_quiz_session(data: Dict[str, Any]) -> bool:
+    """False if this session was already submitted."""
+    return cache.add(USED_CACHE_KEY.format(sid=data["s"]), 1, SESSION_MAX_AGE)
+
+
+def release_quiz_session(data: Dict[str, Any]) -> None:
+    """Undo claim_quiz_session() when the submit fails before it is saved."""
+    cache.delete(USED_CACHE_KEY.format(sid=data["s"]))
+
+
+def grade_session_item(sid: str, position: int, t: str, hashes: List[str], selected: Any) -> bool:
+    value = _candidate_value(t, selected)
+    if value is None:
+        return False
+    return _answer_hash(sid, position, value) in hashes
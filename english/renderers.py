@@ -0,0 +1,87 @@
+# english/renderers.py
+#
+# DRF renderers and parsers, wired in REST_FRAMEWORK. JSON goes through
+# orjson when it is installed (same output as DRF's JSONRenderer, several
+# times faster) and stdlib json otherwise. MessagePack (application/msgpack)
+# is offered when the msgpack package is installed; clients opt in with
+# Accept / Content-Type. A view can still pin its own renderer_classes /
+# parser_classes as usual.
+import json
+
+from rest_framework import renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # optional
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # optional
+    msgpack = None
+
+# What DRF's encoder turns into JSON types (dates, Decimal, UUID, lazy
+# strings, querysets, ...), reused so both paths produce the same output.
+_default = JSONEncoder().default
+
+if orjson is not None:
+    # Datetimes go through _default, as they would with DRF's encoder (e.g.
+    # they end in "Z", not "+00:00"). Subclasses of str/int/dict/list
+    # (ReturnDict, ReturnList, ...) are encoded as their base type, which is
+    # also what the stdlib encoder does, so they never reach _default.
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class FastJSONRenderer(renderers.JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type, renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)  # browsable API, ?indent
+        ret = orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+        # Like DRF, escape the two characters that are valid JSON but not JavaScript.
+        return ret.replace(b"\xe2\x80\xa8", b"\\u2028").replace(b"\xe2\x80\xa9", b"\\u2029")
+
+
+class FastJSONParser(JSONParser):
+    def parse(self, stream, media_type=None, parser_context=None):
+        if orjson is None:
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError("JSON parse error - %s" % exc)
+
+
+class MessagePackRenderer(renderers.BaseRenderer):
+    media_type = "application/msgpack"
+    format = "msgpack"
+    charset = None
+    render_style = "binary"
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    media_type = "application/msgpack"
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False, strict_map_key=False)
+        except (ValueError, TypeError) as exc:  # ExtraData, FormatError, StackError, unhashable map keys, ...
+            raise ParseError("MessagePack parse error - %s" % exc)
+
+
+def wants_msgpack(request) -> bool:
+    """For views that return pre-rendered JSON bytes and must re-encode for msgpack clients."""
+    return getattr(request, "accepted_renderer", None) is not None and request.accepted_renderer.format == "msgpack"
+
+
+def json_loads(data: bytes):
+    return orjson.loads(data) if orjson is not None else json.loads(data)
@@ -0,0 +1,87 @@
+# english/response_cache.py
+#
+# Per-user response cache for the me/ endpoints. Entries are keyed by a
+# per-user version counter kept in the Django cache; every write that changes
+# what those endpoints return bumps the counter once its transaction commits,
+# so later reads miss and rebuild instead of serving stale data. Old entries
+# are never deleted, they just stop being addressed and expire.
+#
+# With a per-process backend (locmem) a bump is only seen by the worker that
+# made it; other workers can serve a stale entry for up to RESPONSE_TTL. Use
+# the file-based backend or a cache server when running several workers.
+import functools
+import threading
+import time
+from typing import Dict
+
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.response import Response
+
+USER_VERSION_KEY = "english:user-version:{user_id}"
+RESPONSE_KEY = "english:me:{name}:{user_id}:{version}"
+RESPONSE_TTL = 300  # also bounds how long a cached streak can lag behind midnight
+
+_stats = {"hits": 0, "misses": 0}
+_stats_lock = threading.Lock()
+
+
+def _count(outcome: str) -> None:
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def response_cache_info() -> Dict[str, int]:
+    """Hit/miss counts for this process."""
+    with _stats_lock:
+        return dict(_stats)
+
+
+def user_cache_version(user_id: int) -> int:
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    version = cache.get(key)
+    if version is None:
+        # Seed from the clock rather than 0, so a counter that was evicted
+        # can't come back at a version whose entries are still cached.
+        version = time.time_ns() // 1000
+        if not cache.add(key, version, None):
+            version = cache.get(key, version)
+    return version
+
+
+def bump_user_cache_version(user_id: int) -> None:
+    key = USER_VERSION_KEY.format(user_id=user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, time.time_ns() // 1000, None)
+
+
+def invalidate_user_responses(user) -> None:
+    """Drop the user's cached me/ responses once the current transaction commits."""
+    user_id = user.pk
+    transaction.on_commit(lambda: bump_user_cache_version(user_id))
+
+
+def cached_user_response(name: str, timeout: int = RESPONSE_TTL):
+    """Cache a GET handler's response data per user; marks responses with X-Cache."""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            user_id = request.user.pk
+            key = RESPONSE_KEY.format(name=name, user_id=user_id, version=user_cache_version(user_id))
+            data = cache.get(key)
+            if data is not None:
+                _count("hits")
+                response = Response(data)
+                response["X-Cache"] = "HIT"
+                return response
+
+            _count("misses")
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout)
+            response["X-Cache"] = "MISS"
+            return response
+        return wrapper
+    return decorator
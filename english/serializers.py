@@ -2,10 +2,12 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
-from django.db.models import Avg
+from django.db.models import Count, FilteredRelation, Q, Sum
+from django.db.models.functions import Coalesce
 from rest_framework import serializers
 
-from .models import Category, Lesson, LessonProgress
+from .grading import get_quiz_plan
+from .models import Category, Lesson
 
 import random
 
@@ -63,16 +65,32 @@ class CategorySerializer(serializers.ModelSerializer):
         fields = ["id", "slug", "title", "description", "emoji", "completion_percentage"]
 
     def get_completion_percentage(self, obj):
-        request = self.context.get("request")
-        user = getattr(request, "user", None)
-        if not user or not user.is_authenticated:
-            return 0
-        agg = (
-            LessonProgress.objects
-            .filter(user=user, lesson__category=obj)
-            .aggregate(avg=Avg("percent"))
-        )
-        return int(round(agg["avg"] or 0))
+        # Views pass categories through with_completion(); otherwise it costs a query.
+        if not hasattr(obj, "lesson_total"):
+            request = self.context.get("request")
+            user = getattr(request, "user", None)
+            if not user or not user.is_authenticated:
+                return 0
+            obj = with_completion(Category.objects.filter(pk=obj.pk), user).get()
+        return int(round(obj.percent_total / obj.lesson_total)) if obj.lesson_total else 0
+
+
+# Columns each serializer reads; views load exactly these with .only().
+CATEGORY_FIELDS = ("id", "slug", "title", "description", "emoji")
+
+
+def with_completion(qs, user):
+    """
+    Annotate categories with what completion_percentage needs for this user,
+    in the same query: the lesson count and the sum of the user's percents.
+    The average is over ALL lessons in the category, unstarted ones count as 0.
+    """
+    return qs.annotate(
+        user_progress=FilteredRelation("lessons__lessonprogress", condition=Q(lessons__lessonprogress__user=user)),
+    ).annotate(
+        lesson_total=Count("lessons"),
+        percent_total=Coalesce(Sum("user_progress__percent"), 0),
+    )
 
 
 class LessonListSerializer(serializers.ModelSerializer):
@@ -81,6 +99,11 @@ class LessonListSerializer(serializers.ModelSerializer):
         fields = ["id", "title", "difficulty", "category", "word_count"]
 
 
+LESSON_LIST_FIELDS = tuple(LessonListSerializer.Meta.fields)
+# body_md, flashcards and questions are all built from content.
+LESSON_DETAIL_FIELDS = LESSON_LIST_FIELDS + ("content",)
+
+
 class LessonDetailSerializer(serializers.ModelSerializer):
     body_md = serializers.SerializerMethodField()
     flashcards = serializers.SerializerMethodField()
@@ -121,72 +144,37 @@ class LessonDetailSerializer(serializers.ModelSerializer):
         return cards
 
     def get_questions(self, obj: Lesson):
-        items = ((obj.content or {}).get("quiz") or {}).get("items") or []
-        out, qid = [], 1
-        for it in items:
-            t = (it.get("type") or "").lower()
-
-            if t == "choose":
-                t = "mcq"
-
-            if t == "fill_blank":
-                tokens = it.get("tokens") or []
-                if tokens:  # treat tiled fills as build questions
-                    shuf = tokens[:]
-                    random.shuffle(shuf)
-                    out.append({
-                        "id": qid,
-                        "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
-                        "qtype": "build",
-                        "payload": {"tokens": shuf},
-                    })
-                elif it.get("options"):
-                    out.append({
-                        "id": qid,
-                        "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
-                        "qtype": "mcq",
-                        "payload": {"options": it.get("options") or []},
-                    })
+        out = []
+        for qid, it in enumerate(get_quiz_plan(obj), start=1):
+            qtype = it.lesson_qtype
+
+            if qtype == "fill_blank":
+                if it.tokens:  # treat tiled fills as build questions
+                    qtype = "build"
+                elif it.options:
+                    qtype = "mcq"
                 else:
-                    out.append({
-                        "id": qid,
-                        "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
-                        "qtype": "fill",
-                        "payload": {"blanks": 1},
-                    })
-
-            elif t in ("translate_ro_en", "translate_en_ro", "word_order"):
-                expected = (it.get("answer_en") or it.get("answer_ro") or it.get("answer") or "")
-                tokens = it.get("tokens") or expected.split()
-                shuf = tokens[:]
-                random.shuffle(shuf)
-                prompt = it.get("prompt_en") or it.get("prompt_ro") or ""
-                out.append({
-                    "id": qid,
-                    "prompt": prompt,
-                    "qtype": "build",
-                    "payload": {"tokens": shuf},
-                })
-
-            elif t in ("dialogue_reply", "mcq"):
-                out.append({
-                    "id": qid,
-                    "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
-                    "qtype": "mcq",
-                    "payload": {"options": it.get("options") or []},
-                })
-
-            elif t in ("tf", "true_false"):
-                out.append({
-                    "id": qid,
-                    "prompt": it.get("prompt_en") or it.get("prompt_ro") or "",
-                    "qtype": "tf",
-                    "payload": {},
-                })
+                    qtype = "fill"
+
+            if qtype == "build":
+                shuf = list(it.tokens)
+                if self.context.get("shuffle", True):
+                    random.shuffle(shuf)
+                payload = {"tokens": shuf}
+            elif qtype == "mcq":
+                payload = {"options": list(it.options)}
+            elif qtype == "fill":
+                payload = {"blanks": 1}
+            elif qtype == "tf":
+                payload = {}
             else:
-                qid += 1
                 continue
 
-            qid += 1
+            out.append({
+                "id": qid,
+                "prompt": it.prompt,
+                "qtype": qtype,
+                "payload": payload,
+            })
 
         return out
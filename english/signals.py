@@ -0,0 +1,38 @@
+# english/signals.py
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .catalog_cache import bump_catalog_generation, clear_local_catalog_cache
+from .models import Category, LeaderboardScore, Lesson
+from .quiz_index import bump_quiz_index_version, sync_lesson_quiz_items
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_saved(sender, instance, raw=False, **kwargs):
+    if raw:  # fixture loading
+        return
+    sync_lesson_quiz_items(instance)
+
+
+@receiver(post_delete, sender=Lesson)
+def lesson_deleted(sender, instance, **kwargs):
+    transaction.on_commit(bump_quiz_index_version)
+
+
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Lesson)
+@receiver(post_delete, sender=Lesson)
+def catalog_changed(sender, **kwargs):
+    # Drop this worker's copies now; retire everyone's once the write commits.
+    clear_local_catalog_cache()
+    transaction.on_commit(bump_catalog_generation)
+
+
+@receiver(pre_delete, sender=get_user_model())
+def user_deleted(sender, instance, **kwargs):
+    # The cascade deletes the score rows with a plain DELETE; take the user
+    # off the leaderboard bands first.
+    LeaderboardScore.objects.remove_user(instance.pk)
@@ -0,0 +1,138 @@
+# english/stats.py
+from datetime import date, timedelta
+from typing import Dict, Iterable, List
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Case, Count, F, Max, Q, Sum, Value, When
+from django.db.models.functions import Floor
+from django.utils import timezone
+
+from .activity import local_day, parse_timezone, streak_ending
+from .models import DailyActivity, LessonProgress, QuizAttempt, UserStats, XpEvent
+from .xp import lifetime_xp_by_user
+
+STATS_FIELDS = (
+    "xp", "total_questions", "correct_answers", "completed_lessons",
+    "level", "streak", "last_active_day", "last_active",
+)
+
+
+def level_for(xp: int) -> int:
+    return 1 + xp // 100
+
+
+def completed_delta(user, percents: Dict[int, int], keep_max: bool = True) -> int:
+    """
+    Change in the user's completed-lesson count that writing `percents` with
+    LessonProgress.objects.upsert() will cause. Call inside the write's
+    transaction, before the upsert: it locks the user's UserStats row, so
+    concurrent writes for the same user take turns and each one sees the
+    progress the other committed.
+    """
+    done = {lesson_id for lesson_id, pct in percents.items() if pct >= 100}
+    check = set(percents) if not keep_max else done
+    if not check:
+        return 0
+    # Before the user's first write there is no row to lock; that write
+    # rebuilds the row from the source tables instead (update_user_stats).
+    list(UserStats.objects.select_for_update().filter(pk=user.pk).values_list("pk", flat=True))
+    # A locking read, so it sees rows committed since the transaction began.
+    before = set(
+        LessonProgress.objects.select_for_update()
+        .filter(user=user, lesson_id__in=check, percent__gte=100)
+        .values_list("lesson_id", flat=True)
+    )
+    if keep_max:
+        return len(done - before)
+    return len(done - before) - len(before - done)
+
+
+def update_user_stats(user, day: date, xp: int = 0, questions: int = 0, correct: int = 0, completed: int = 0) -> None:
+    # MySQL evaluates SET assignments left to right against already-updated
+    # columns, other backends against the old row: level and streak come
+    # first so they read the old xp / last_active_day everywhere.
+    updated = UserStats.objects.filter(pk=user.pk).update(
+        level=1 + Floor((F("xp") + xp) / 100),
+        streak=Case(
+            When(last_active_day=day, then=F("streak")),
+            When(last_active_day=day - timedelta(days=1), then=F("streak") + 1),
+            default=Value(1),
+        ),
+        xp=F("xp") + xp,
+        total_questions=F("total_questions") + questions,
+        correct_answers=F("correct_answers") + correct,
+        completed_lessons=F("completed_lessons") + completed,
+        last_active_day=day,
+        last_active=timezone.now(),
+    )
+    if not updated:
+        # First write for this user: build the row from what is already saved,
+        # which includes this write.
+        recompute_user_stats([user.pk])
+
+
+def recompute_user_stats(user_ids: Iterable[int]) -> int:
+    """Rebuild UserStats rows for these users from the source tables. Returns the row count."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return 0
+    rows: Dict[int, Dict] = {user_id: {"xp": 0, "total_questions": 0, "correct_answers": 0,
+                                       "completed_lessons": 0, "last_active": None} for user_id in user_ids}
+
+    def latest(user_id, when):
+        if when and (rows[user_id]["last_active"] is None or when > rows[user_id]["last_active"]):
+            rows[user_id]["last_active"] = when
+
+    for user_id, xp in lifetime_xp_by_user(user_ids).items():  # rollups + event tail
+        rows[user_id]["xp"] = xp
+    for user_id, last in (XpEvent.objects.filter(user_id__in=user_ids).values("user_id")
+                          .annotate(last=Max("created_at")).values_list("user_id", "last")):
+        latest(user_id, last)
+    for r in (QuizAttempt.objects.filter(user_id__in=user_ids).values("user_id")
+              .annotate(q=Sum("total_questions"), c=Sum("correct_answers"), last=Max("created_at"))):
+        rows[r["user_id"]].update(total_questions=r["q"] or 0, correct_answers=r["c"] or 0)
+        latest(r["user_id"], r["last"])
+    for r in (LessonProgress.objects.filter(user_id__in=user_ids).values("user_id")
+              .annotate(done=Count("id", filter=Q(percent__gte=100)), last=Max("updated_at"))):
+        rows[r["user_id"]]["completed_lessons"] = r["done"]
+        latest(r["user_id"], r["last"])
+    last_days = dict(
+        DailyActivity.objects.filter(user_id__in=user_ids).values("user_id")
+        .annotate(last=Max("day")).values_list("user_id", "last")
+    )
+
+    objs: List[UserStats] = []
+    for user_id, r in rows.items():
+        last_day = last_days.get(user_id)
+        objs.append(UserStats(
+            user_id=user_id,
+            level=level_for(r["xp"]),
+            streak=streak_ending(user_id, last_day) if last_day else 0,
+            last_active_day=last_day,
+            **r,
+        ))
+    # MySQL's ON DUPLICATE KEY UPDATE takes no conflict target.
+    target = ["user"] if connections[UserStats.objects.db].features.supports_update_conflicts_with_target else None
+    UserStats.objects.bulk_create(objs, update_conflicts=True, unique_fields=target, update_fields=list(STATS_FIELDS))
+    return len(objs)
+
+
+def get_user_stats(user) -> Dict:
+    """
+    The user's UserStats values plus their timezone, in one primary-key read
+    (the row is built on first access).
+    """
+    fields = STATS_FIELDS + ("user__english_profile__timezone",)
+    row = UserStats.objects.filter(pk=user.pk).values(*fields).first()
+    if row is None:
+        recompute_user_stats([user.pk])
+        row = UserStats.objects.filter(pk=user.pk).values(*fields).first()
+    name = row.pop("user__english_profile__timezone")
+    row["timezone"] = (name and parse_timezone(name)) or parse_timezone(settings.TIME_ZONE)
+    return row
+
+
+def current_streak_from_stats(row: Dict) -> int:
+    """The stored streak if it reaches today (in the user's timezone), else 0."""
+    return row["streak"] if row["last_active_day"] == local_day(row["timezone"]) else 0
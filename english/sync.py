@@ -0,0 +1,119 @@
+# english/sync.py
+#
+# Delta sync of a user's progress, quiz attempts and XP events. The cursor
+# holds the last row the client has seen in each table: (updated_at, id) for
+# LessonProgress, which is updated in place, and the id for the append-only
+# QuizAttempt / XpEvent, so every read is an index range on the user's rows.
+#
+# Rows stamped in the last SETTLE are held back until the next sync: a
+# slower transaction can still commit a row that sorts before them, and the
+# cursor would already be past it. That needs a bound on how long a write
+# transaction runs, so every write of these tables goes through sync_write(),
+# which rolls back rather than commit after MAX_WRITE. A row's id is taken up
+# to MAX_WRITE after its created_at, and a transaction holding a smaller id
+# can commit up to MAX_WRITE after that; SETTLE covers both, plus a second
+# for the commit itself and clock skew between app servers.
+#
+# XP events older than compact_xp_events' cut-off are folded into monthly
+# rollups and no longer appear here; "stats" carries the current totals.
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Tuple
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import LessonProgress, QuizAttempt, XpEvent
+from .pagination import CursorError, decode_cursor, encode_cursor
+from .stats import current_streak_from_stats, get_user_stats
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 500
+MAX_WRITE = timedelta(seconds=2)
+SETTLE = 2 * MAX_WRITE + timedelta(seconds=1)
+
+
+class WriteTimeout(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = "The write took too long and was rolled back; retry it."
+    default_code = "write_timeout"
+
+
+@contextmanager
+def sync_write():
+    """
+    transaction.atomic() for writes of rows sync_changes() returns. It must
+    be the outermost block (durable), so leaving it commits; past MAX_WRITE
+    it raises WriteTimeout and rolls back instead. Also works as a decorator.
+    """
+    start = time.monotonic()
+    with transaction.atomic(durable=True):
+        yield
+        if time.monotonic() - start > MAX_WRITE.total_seconds():
+            raise WriteTimeout()
+
+
+def parse_sync_cursor(cursor: str) -> Tuple[Any, ...]:
+    """(progress updated_at or None, progress id, attempt id, xp event id)."""
+    if not cursor:
+        return (None, 0, 0, 0)
+    stamp, progress_id, attempt_id, xp_id = decode_cursor(cursor, (str, int, int, int))
+    try:
+        when = parse_datetime(stamp) if stamp else None
+    except ValueError:
+        when = None
+    if stamp and when is None:
+        raise CursorError("invalid cursor")
+    return when, progress_id, attempt_id, xp_id
+
+
+def _progress(user, after: datetime, after_id: int, until: datetime, limit: int) -> List[Dict[str, Any]]:
+    qs = LessonProgress.objects.filter(user=user, updated_at__lte=until)
+    if after is not None:
+        qs = qs.filter(Q(updated_at__gt=after) | Q(updated_at=after, id__gt=after_id))
+    return list(qs.order_by("updated_at", "id").values("id", "lesson_id", "percent", "updated_at")[:limit + 1])
+
+
+def _appended(model, fields, user, after_id: int, until: datetime, limit: int) -> List[Dict[str, Any]]:
+    qs = model.objects.filter(user=user, id__gt=after_id, created_at__lte=until)
+    return list(qs.order_by("id").values("id", *fields)[:limit + 1])
+
+
+def sync_changes(user, cursor: str, limit: int = DEFAULT_LIMIT) -> Dict[str, Any]:
+    """Up to limit rows of each kind after cursor, and the cursor to send next."""
+    after, progress_id, attempt_id, xp_id = parse_sync_cursor(cursor)
+    until = timezone.now() - SETTLE
+    progress = _progress(user, after, progress_id, until, limit)
+    attempts = _appended(QuizAttempt, ("lesson_id", "total_questions", "correct_answers", "created_at"),
+                         user, attempt_id, until, limit)
+    xp_events = _appended(XpEvent, ("amount", "reason", "created_at"), user, xp_id, until, limit)
+    has_more = any(len(rows) > limit for rows in (progress, attempts, xp_events))
+    progress, attempts, xp_events = progress[:limit], attempts[:limit], xp_events[:limit]
+
+    if progress:
+        after, progress_id = progress[-1]["updated_at"], progress[-1]["id"]
+    if attempts:
+        attempt_id = attempts[-1]["id"]
+    if xp_events:
+        xp_id = xp_events[-1]["id"]
+    out = {
+        "progress": [{k: row[k] for k in ("lesson_id", "percent", "updated_at")} for row in progress],
+        "attempts": attempts,
+        "xp_events": xp_events,
+        "next": encode_cursor((after.isoformat() if after else "", progress_id, attempt_id, xp_id)),
+        "has_more": has_more,
+    }
+    if progress or attempts or xp_events:
+        stats = get_user_stats(user)
+        out["stats"] = {
+            "xp": stats["xp"],
+            "level": stats["level"],
+            "streak": current_streak_from_stats(stats),
+            "completed_lessons": stats["completed_lessons"],
+        }
+    return out
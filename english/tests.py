@@ -1,3 +1,1327 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import re
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from decimal import Decimal
+from unittest import mock, skipIf
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.http import StreamingHttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework.utils.serializer_helpers import ReturnDict, ReturnList
+
+from .models import (
+    BAND_LEVELS, Category, DailyActivity, LeaderboardBand, LeaderboardScore, Lesson, LessonProgress, QuizAttempt,
+    QuizItem, UserStats, XpEvent, XpMonthlyRollup, bands_above,
+)
+from .compression import ENCODINGS, CompressionMiddleware, negotiate
+from .catalog_cache import bump_catalog_generation, catalog_cache_info, clear_local_catalog_cache
+from .leaderboard import GLOBAL_PERIOD, award_xp, rank_of
+from .lesson_render import RENDER_VERSION, rendered_version
+from .quiz_index import clear_sampling_pools
+from .renderers import FastJSONRenderer, msgpack
+from .response_cache import response_cache_info
+from .stats import completed_delta
+from .sync import sync_write
+from .grading import PLAN_FIELDS, _grade_answer, _normalize_type, clear_quiz_plans, compile_quiz_items, get_quiz_plan
+from .textnorm import ROMANIAN, TextNormalizer
+from .serializers import CATEGORY_FIELDS, LESSON_DETAIL_FIELDS, LESSON_LIST_FIELDS, LessonDetailSerializer
+from .xp import lifetime_xp
+
+User = get_user_model()
+
+
+def _tf_lesson(category, n):
+    return Lesson.objects.create(
+        category=category,
+        title=f"Lesson {n}",
+        content={"quiz": {"items": [
+            {"type": "tf", "prompt_en": "Yes?", "correct_bool": True},
+            {"type": "tf", "prompt_en": "No?", "correct_bool": False},
+        ]}},
+    )
+
+
+class QuizPlanTests(TestCase):
+    ITEMS = [
+        {"type": "choose", "options": ["a", "b", "c"], "correct": "b"},
+        {"type": "mcq", "options": ["a", "b"], "correct_index": 0},
+        {"type": "dialogue_reply", "options": ["Hi", "Bye"], "correct": "missing"},
+        {"type": "tf", "correct_bool": False},
+        {"type": "true_false", "answer_bool": True},
+        {"type": "tf", "correct": 1},
+        {"type": "fill_blank", "answer": "Kitchen", "accept": ["the kitchen"]},
+        {"type": "fill", "answers": ["bucătărie", "Bucatarie!"]},
+        {"type": "translate_ro_en", "answer_en": "The bed is in the bedroom."},
+        {"type": "translate_en_ro", "answer_ro": "Patul e în dormitor", "accept": ["Patul este în dormitor."]},
+        {"type": "word_order", "answer": "We sit here.", "answer_variants": ["Here we sit"]},
+        {"type": "build", "expected": "", "solution": "On the table"},
+        {"type": "matching", "answer": "x"},
+        {},
+    ]
+    SELECTIONS = [
+        {}, {"index": 0}, {"index": "1"}, {"index": 2}, {"index": None}, {"value": True}, {"value": False},
+        {"value": 0}, {"text": "kitchen"}, {"text": "  The   KITCHEN "}, {"text": "bucatarie"}, {"text": ""},
+        {"text": "the bed is in the bedroom"}, {"tokens": ["The", "bed", "is", "in", "the", "bedroom."]},
+        {"tokens": ["Patul", "este", "in", "dormitor"]}, {"tokens": ["here", "we", "sit!"]},
+        {"tokens": [], "text": "we sit here"}, {"text": "on the table"}, {"text": "x"},
+    ]
+
+    def setUp(self):
+        clear_quiz_plans()
+
+    def test_plan_grades_like_the_item_grader(self):
+        from .management.commands.seed_lesson1 import L1
+        from .management.commands.seed_lesson2 import L2
+        from .management.commands.seed_lesson3 import L3
+
+        items = self.ITEMS + [it for c in (L1, L2, L3) for it in c["quiz"]["items"]]
+        self.assertEqual({_normalize_type(it.get("type")) for it in items}, {"mcq", "tf", "fill", "build", "matching", ""})
+        plan = compile_quiz_items(items)
+        for it, compiled in zip(items, plan):
+            for selected in self.SELECTIONS:
+                with self.subTest(item=it, selected=selected):
+                    self.assertEqual(compiled.grade(selected), _grade_answer(it, selected))
+
+    def test_plan_follows_content_changes(self):
+        lesson = Lesson(pk=1, content={"quiz": {"items": [{"type": "fill", "answer": "kitchen"}]}})
+        plan = get_quiz_plan(lesson)
+        self.assertIs(get_quiz_plan(lesson), plan)
+        self.assertTrue(plan[0].grade({"text": "kitchen"}))
+
+        lesson.content = {"quiz": {"items": [{"type": "fill", "answer": "bedroom"}]}}
+        plan = get_quiz_plan(lesson)
+        self.assertFalse(plan[0].grade({"text": "kitchen"}))
+        self.assertTrue(plan[0].grade({"text": "bedroom"}))
+
+        lesson.content["quiz"]["typo_tolerance"] = 1
+        self.assertTrue(get_quiz_plan(lesson)[0].grade({"text": "bedrom"}))
+
+
+class TextNormalizerTests(TestCase):
+    SAMPLES = [
+        "Bucătărie", "ȘCOALĂ și ţară", "Ş Ţ Ă Â Î", "naïve café", "é", "ﬁ ligature", "Straße",
+        "Hi!", "Hi! ", "  What's up?  ", "a,b;c.d", "¿Qué?", "don’t — stop…", "(on) the [table]",
+        "a\tb\nc\r\nd", "a b c", "  \t ", "", "x  ", "  x", "...", "a - b", "snake_case 42",
+        "Patul e în dormitor.", "THE BED IS IN THE BEDROOM!!!", "🏠 home", "ÎNCĂ o dată, vă rog",
+    ]
+
+    def test_matches_legacy_normalization(self):
+        from .management.commands.bench_text_norm import _answer_corpus, legacy_norm_text
+
+        normalizer = TextNormalizer("test", folds=ROMANIAN.folds, cache_size=0)
+        for s in self.SAMPLES + _answer_corpus():
+            with self.subTest(s=s):
+                self.assertEqual(ROMANIAN(s), legacy_norm_text(s))
+                self.assertEqual(normalizer(s), legacy_norm_text(s))
+        for value in (None, 0, 12, True):
+            self.assertEqual(ROMANIAN(value), legacy_norm_text(value))
+
+    def test_trailing_punctuation_leaves_a_space(self):
+        self.assertEqual(ROMANIAN("Hi!"), "hi ")
+        self.assertEqual(ROMANIAN("  Hi  there  "), "hi there")
+
+
+@override_settings(RANDOM_QUIZ_LEGACY_ATTEMPTS=True)
+class RandomQuizAttemptQueriesTests(TestCase):
+    # savepoint, lessons in_bulk, attempts bulk_create, stats lock,
+    # completed check, progress upsert, xp insert, user timezone, daily
+    # activity upsert, stats update, leaderboard lock, leaderboard upsert,
+    # band upsert, release savepoint
+    EXPECTED_QUERIES = 14
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        UserStats.objects.create(user=cls.user)
+        award_xp(cls.user, 1)  # a window's first award reads its new rows back once more
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cat, n) for n in range(10)]
+
+    def setUp(self):
+        clear_local_catalog_cache()  # measure the cold path
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _submit(self, lessons):
+        answers = []
+        for qid, lesson in enumerate(lessons, start=1):
+            answers.append({
+                "qid": qid, "lesson_id": lesson.id, "item_index": 1,
+                "selected": {"value": True},
+            })
+        return self.client.post("/api/v1/quiz/random/attempts/", {"answers": answers}, format="json")
+
+    def test_query_count_is_independent_of_lesson_count(self):
+        for lessons in (self.lessons[:1], self.lessons):
+            with self.assertNumQueries(self.EXPECTED_QUERIES):
+                resp = self._submit(lessons)
+            self.assertEqual(resp.status_code, 200)
+            self.assertEqual(resp.data["score_pct"], 100)
+
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 11)
+        self.assertEqual(LessonProgress.objects.filter(user=self.user, percent=100).count(), 10)
+
+    def test_progress_keeps_the_max(self):
+        lesson = self.lessons[0]
+        LessonProgress.objects.create(user=self.user, lesson=lesson, percent=100)
+        resp = self.client.post("/api/v1/quiz/random/attempts/", {"answers": [
+            {"qid": 1, "lesson_id": lesson.id, "item_index": 1, "selected": {"value": False}},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(LessonProgress.objects.get(user=self.user, lesson=lesson).percent, 100)
+
+    def test_unknown_lesson_is_404(self):
+        resp = self.client.post("/api/v1/quiz/random/attempts/", {"answers": [
+            {"qid": 1, "lesson_id": self.lessons[0].id, "item_index": 1, "selected": {"value": True}},
+            {"qid": 2, "lesson_id": 999999, "item_index": 1, "selected": {"value": True}},
+        ]}, format="json")
+        self.assertEqual(resp.status_code, 404)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+
+class ProgressUpsertTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = _tf_lesson(cat, 1)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _percent(self):
+        return LessonProgress.objects.get(user=self.user, lesson=self.lesson).percent
+
+    def test_quiz_attempt_keeps_the_max(self):
+        url = "/api/v1/quiz-attempts/"
+        answers = [{"question_id": 1, "selected": {"value": True}}, {"question_id": 2, "selected": {"value": False}}]
+        self.client.post(url, {"lesson_id": self.lesson.id, "answers": answers}, format="json")
+        self.assertEqual(self._percent(), 100)
+        self.client.post(url, {"lesson_id": self.lesson.id, "answers": answers[:1]}, format="json")
+        self.assertEqual(self._percent(), 100)
+
+    def test_progress_view_sets_the_percent(self):
+        for pct in (80, 30):
+            resp = self.client.post("/api/v1/progress/", {"lesson_id": self.lesson.id, "percent": pct}, format="json")
+            self.assertEqual(resp.data, {"ok": True, "percent": pct})
+            self.assertEqual(self._percent(), pct)
+        self.assertEqual(LessonProgress.objects.filter(user=self.user).count(), 1)
+
+    def test_progress_view_unknown_lesson(self):
+        resp = self.client.post("/api/v1/progress/", {"lesson_id": 999999, "percent": 10}, format="json")
+        self.assertEqual(resp.status_code, 404)
+
+
+class RandomQuizIndexTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = Lesson.objects.create(category=cls.cat, title="Mixed", content={"quiz": {"items": [
+            {"type": "choose", "prompt_en": "Pick", "options": ["a", "b"], "correct": "a"},
+            {"type": "tf", "prompt_en": "True?", "correct_bool": True},
+            {"type": "word_order", "prompt_en": "Order", "answer_en": "We sit here."},
+        ]}})
+        for n in range(4):
+            _tf_lesson(cls.cat, n)
+
+    def setUp(self):
+        cache.clear()
+        clear_sampling_pools()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _get(self, **params):
+        return self.client.get("/api/v1/quiz/random/", params)
+
+    def test_index_follows_lesson_saves(self):
+        self.assertEqual(QuizItem.objects.filter(lesson=self.lesson).count(), 3)
+        self.lesson.content = {"quiz": {"items": [{"type": "tf", "correct_bool": False}]}}
+        self.lesson.save()
+        self.assertEqual(list(QuizItem.objects.filter(lesson=self.lesson).values_list("qtype", flat=True)), ["tf"])
+
+    def test_saves_keep_item_ids(self):
+        ids = list(QuizItem.objects.filter(lesson=self.lesson).order_by("item_index").values_list("id", flat=True))
+        lesson = Lesson.objects.get(pk=self.lesson.pk)
+        with CaptureQueriesContext(connection) as ctx:
+            lesson.save()  # unchanged: no index work at all
+        self.assertFalse([q for q in ctx.captured_queries if "english_quizitem" in q["sql"]])
+        lesson.title = "Renamed"
+        with CaptureQueriesContext(connection) as ctx:
+            lesson.save()  # items unchanged: read, no writes
+        self.assertEqual([q["sql"].split()[0] for q in ctx.captured_queries if "english_quizitem" in q["sql"]],
+                         ["SELECT"])
+
+        lesson.content["quiz"]["items"][1]["correct_bool"] = False
+        del lesson.content["quiz"]["items"][2]
+        lesson.save()
+        rows = list(QuizItem.objects.filter(lesson=self.lesson).order_by("item_index").values_list("id", "answer_key"))
+        self.assertEqual([pk for pk, _ in rows], ids[:2])
+        self.assertFalse(rows[1][1]["b"])
+
+    def test_size_is_bounded(self):
+        self.assertEqual(self._get(size=0).status_code, 400)
+        self.assertEqual(self._get(size=-3).status_code, 400)
+        with mock.patch("english.views_quiz.MAX_RANDOM_QUIZ_SIZE", 3):
+            self.assertEqual(len(self._get(size=1_000_000).data["items"]), 3)
+
+    def test_sample_filters_by_type_without_loading_lessons(self):
+        with self.assertNumQueries(2):  # pool load + item rows, no Lesson reads
+            resp = self._get(size=5, qtype="build", category_id=self.cat.id)
+        with self.assertNumQueries(1):  # warm pool
+            self._get(size=5, qtype="build", category_id=self.cat.id)
+        items = resp.data["items"]
+        self.assertEqual(len(items), 1)
+        self.assertEqual(items[0]["qtype"], "build")
+        self.assertEqual(items[0]["item_index"], 3)
+        self.assertEqual(sorted(items[0]["payload"]["tokens"]), sorted(["We", "sit", "here."]))
+
+    def test_seed_is_reproducible(self):
+        first = self._get(size=4, seed="abc").data["items"]
+        second = self._get(size=4, seed="abc").data["items"]
+        self.assertEqual(first, second)
+
+    def test_recent_sessions_are_not_repeated(self):
+        seen = set()
+        for _ in range(2):  # 11 items in the pool, 5 per session
+            for it in self._get(size=5).data["items"]:
+                key = (it["lesson_id"], it["item_index"])
+                self.assertNotIn(key, seen)
+                seen.add(key)
+        self.assertEqual(len(self._get(size=5).data["items"]), 5)  # topped up from recent items
+
+    def _submit(self, session, answers):
+        return self.client.post("/api/v1/quiz/random/attempts/", {"session": session, "answers": answers}, format="json")
+
+    def test_session_grading_skips_lesson_content(self):
+        resp = self._get(size=2, category_id=self.cat.id, qtype="mcq,build")
+        selected = {"mcq": {"index": 0}, "build": {"tokens": ["We", "sit", "here."]}}
+        answers = [{"qid": it["id"], "selected": selected[it["qtype"]]} for it in resp.data["items"]]
+        UserStats.objects.create(user=self.user)
+        award_xp(self.user, 1)
+        with self.assertNumQueries(14):  # lesson ids only, no Lesson.content
+            out = self._submit(resp.data["session"], answers)
+        self.assertEqual(out.data["score_pct"], 100)
+
+        resp = self._get(size=2, category_id=self.cat.id, qtype="mcq,build")
+        first = resp.data["items"][0]
+        out = self._submit(resp.data["session"], [{"qid": first["id"], "selected": selected[first["qtype"]]}])
+        self.assertEqual(out.data["score_pct"], 50)  # unanswered questions are wrong
+
+    def test_session_is_required(self):
+        answers = [{"qid": 1, "lesson_id": self.lesson.id, "item_index": 2, "selected": {"value": True}}]
+        resp = self.client.post("/api/v1/quiz/random/attempts/", {"answers": answers}, format="json")
+        self.assertEqual(resp.status_code, 400)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+    def test_session_rejects_forgery_and_replay(self):
+        session = self._get(size=2).data["session"]
+        answers = [{"qid": 1, "selected": {"value": True}}]
+        self.assertEqual(self._submit(session[:-2] + "xx", answers).status_code, 400)
+        self.assertEqual(self._submit(session, answers).status_code, 200)
+        self.assertEqual(self._submit(session, answers).status_code, 409)
+
+        other = User.objects.create_user(username="other", password="x")
+        self.client.force_authenticate(other)
+        self.assertEqual(self._submit(self._get(size=2).data["session"], answers).status_code, 200)
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self._submit(self._get(size=2).data["session"][::-1], answers).status_code, 400)
+
+    def test_failed_submit_can_be_retried(self):
+        session = self._get(size=2).data["session"]
+        answers = [{"qid": 1, "selected": "zz"}]  # malformed: graded as wrong, not a 500; qid 2 unanswered
+        with mock.patch("english.views_quiz._record_random_quiz", side_effect=RuntimeError("db down")):
+            with self.assertRaises(RuntimeError):
+                self._submit(session, answers)
+        self.assertFalse(QuizAttempt.objects.exists())
+
+        resp = self._submit(session, answers)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["score_pct"], 0)
+        self.assertEqual(self._submit(session, answers).status_code, 409)
+
+
+class TypoToleranceTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = Lesson.objects.create(category=cat, title="Rooms", content={"quiz": {
+            "typo_tolerance": "auto",
+            "items": [
+                {"type": "fill", "answer": "kitchen"},
+                {"type": "fill", "answer": "on"},
+                {"type": "translate_ro_en", "answer_en": "The bed is in the bedroom.", "typo_tolerance": False},
+            ],
+        }})
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _grade(self, *texts):
+        answers = [{"question_id": i, "selected": {"text": t}} for i, t in enumerate(texts, start=1)]
+        resp = self.client.post("/api/v1/quiz-attempts/", {"lesson_id": self.lesson.id, "answers": answers}, format="json")
+        return [(r["is_correct"], r["near_miss"]) for r in resp.data["results"]]
+
+    def test_near_misses(self):
+        self.assertEqual(
+            self._grade("kitchn", "in", "The bed is in the bedrom."),
+            [(True, True), (False, False), (False, False)],
+        )
+
+    def test_exact_answers_are_not_near_misses(self):
+        self.assertEqual(
+            self._grade(" Kitchen", "ON", "the bed is in the bedroom."),
+            [(True, False), (True, False), (True, False)],
+        )
+
+    def test_too_many_edits(self):
+        self.assertEqual(self._grade("kitten")[0], (False, False))
+
+
+class QuizAttemptBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cat, n) for n in range(5)]
+
+    def setUp(self):
+        clear_local_catalog_cache()  # measure the cold path
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _batch(self, attempts):
+        return self.client.post("/api/v1/quiz-attempts/batch/", {"attempts": attempts}, format="json")
+
+    def _attempt(self, lesson, n):
+        answers = [{"question_id": 1, "selected": {"value": True}}, {"question_id": 2, "selected": {"value": False}}]
+        return {"client_id": f"c{n}", "lesson_id": lesson.id, "answers": answers}
+
+    def test_mixed_batch(self):
+        resp = self._batch([
+            self._attempt(self.lessons[0], 1),
+            {"client_id": "missing", "lesson_id": 999999, "answers": []},
+            {"client_id": "bad"},
+        ])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["accepted"], 1)
+        self.assertEqual(resp.data["xp_delta"], 20)
+        ok, missing, bad = resp.data["attempts"]
+        self.assertEqual((ok["client_id"], ok["score_pct"]), ("c1", 100))
+        self.assertEqual(missing["error"], "Lesson not found")
+        self.assertIn("error", bad)
+        self.assertEqual(LessonProgress.objects.get(user=self.user, lesson=self.lessons[0]).percent, 100)
+
+    def test_malformed_answer_fails_only_its_attempt(self):
+        bad = self._attempt(self.lessons[1], 2)
+        bad["answers"][0]["selected"] = "x"
+        odd = {"client_id": "odd", "lesson_id": self.lessons[2].id, "answers": ["x"]}
+        resp = self._batch([self._attempt(self.lessons[0], 1), bad, odd])
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["accepted"], 1)
+        ok, bad, odd = resp.data["attempts"]
+        self.assertEqual(ok["score_pct"], 100)
+        self.assertIn("error", bad)
+        self.assertIn("error", odd)
+        self.assertEqual(list(QuizAttempt.objects.values_list("lesson_id", flat=True)), [self.lessons[0].id])
+
+        resp = self.client.post("/api/v1/quiz-attempts/", {"lesson_id": self.lessons[0].id, "answers": [
+            {"question_id": 1, "selected": "x"}, {"question_id": 2, "selected": {"value": False}},
+        ]}, format="json")
+        self.assertEqual(resp.data["score_pct"], 50)  # the malformed answer counts as wrong
+
+        resp = self.client.post("/api/v1/quiz-attempts/", {"lesson_id": self.lessons[0].id, "answers": [
+            {"question_id": 2, "selected": "x"},
+        ]}, format="json")
+        self.assertEqual(resp.data["score_pct"], 0)  # not read as an empty (false) answer
+
+    def test_query_count_is_independent_of_batch_size(self):
+        # savepoint, lessons, attempts, xp events, stats lock, completed check,
+        # progress upsert, user timezone, daily activity upsert, stats update,
+        # leaderboard lock, leaderboard upsert, band upsert, release
+        UserStats.objects.create(user=self.user)
+        award_xp(self.user, 1)
+        small = [self._attempt(self.lessons[0], 0)]
+        large = [self._attempt(lesson, n) for n in range(10) for lesson in self.lessons]
+        for attempts in (small, large):
+            with self.assertNumQueries(14):
+                self._batch(attempts)
+        self.assertEqual(QuizAttempt.objects.filter(user=self.user).count(), 51)
+
+
+class DailyActivityTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = _tf_lesson(cat, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _quiz(self):
+        answers = [{"question_id": 1, "selected": {"value": True}}]
+        self.client.post("/api/v1/quiz-attempts/", {"lesson_id": self.lesson.id, "answers": answers}, format="json")
+
+    def test_writes_roll_up_into_today(self):
+        self._quiz()
+        self._quiz()
+        self.client.post("/api/v1/progress/", {"lesson_id": self.lesson.id, "percent": 50}, format="json")
+        row = DailyActivity.objects.get(user=self.user)
+        self.assertEqual((row.attempts, row.xp), (2, 40))
+        self.assertEqual(self.client.get("/api/v1/me/summary/").data["streak"], 1)
+
+    def test_streak_uses_the_users_timezone(self):
+        # 23:30 UTC on 1 March is already 2 March in Bucharest.
+        now = datetime(2026, 3, 1, 23, 30, tzinfo=dt_timezone.utc)
+        self.assertEqual(self.client.patch("/api/v1/me/", {"timezone": "Nowhere/Else"}, format="json").status_code, 400)
+        self.client.patch("/api/v1/me/", {"timezone": "Europe/Bucharest"}, format="json")
+        for n in range(1, 4):
+            DailyActivity.objects.create(user=self.user, day=now.date() - timedelta(days=n))
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            self._quiz()
+            resp = self.client.get("/api/v1/me/activity/", {"days": 3})
+        self.assertEqual(DailyActivity.objects.get(user=self.user, attempts=1).day.isoformat(), "2026-03-02")
+        self.assertEqual(resp.data["streak"], 1)  # 1 March itself was never active
+        self.assertEqual([d["attempts"] for d in resp.data["days"]], [0, 0, 1])
+
+    def test_backfill_matches_live_rollup(self):
+        self._quiz()
+        self.client.post("/api/v1/progress/", {"lesson_id": self.lesson.id, "percent": 50}, format="json")
+        XpEvent.objects.create(user=self.user, amount=5, reason="bonus")
+        live = list(DailyActivity.objects.values_list("day", "attempts", "xp"))
+        call_command("backfill_daily_activity", stdout=StringIO())
+        self.assertEqual(list(DailyActivity.objects.values_list("day", "attempts", "xp")), [(live[0][0], 1, 25)])
+
+
+class UserStatsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cat, n) for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _quiz(self, lesson, value=True):
+        answers = [{"question_id": 1, "selected": {"value": value}}, {"question_id": 2, "selected": {"value": False}}]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/v1/quiz-attempts/", {"lesson_id": lesson.id, "answers": answers}, format="json")
+
+    def _summary(self):
+        return self.client.get("/api/v1/me/summary/").data
+
+    @override_settings(RANDOM_QUIZ_LEGACY_ATTEMPTS=True)
+    def test_summary_matches_recompute(self):
+        self._quiz(self.lessons[0])
+        self._quiz(self.lessons[1], value=False)
+        self._quiz(self.lessons[1])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/v1/progress/", {"lesson_id": self.lessons[0].id, "percent": 40}, format="json")
+            self.client.post("/api/v1/progress/", {"lesson_id": self.lessons[2].id, "percent": 100}, format="json")
+            self.client.post("/api/v1/quiz/random/attempts/", {"answers": [
+                {"qid": 1, "lesson_id": self.lessons[2].id, "item_index": 1, "selected": {"value": True}},
+            ]}, format="json")
+
+        with self.assertNumQueries(1):
+            live = self._summary()
+        self.assertEqual(
+            (live["xp"], live["completedLessons"], live["accuracy"], live["streak"], live["level"]),
+            (60, 2, 86, 1, 1),
+        )
+        UserStats.objects.all().delete()
+        call_command("recompute_user_stats", stdout=StringIO())
+        cache.clear()
+        self.assertEqual(self._summary(), live)
+
+    def test_streak_carries_over_days(self):
+        start = datetime(2026, 3, 1, 12, 0, tzinfo=dt_timezone.utc)
+        for n in (0, 1, 3):
+            with mock.patch("django.utils.timezone.now", return_value=start + timedelta(days=n)):
+                self._quiz(self.lessons[0])
+                streak = self._summary()["streak"]
+            self.assertEqual(streak, {0: 1, 1: 2, 3: 1}[n])
+        cache.clear()  # a cached summary may outlive midnight by up to RESPONSE_TTL
+        with mock.patch("django.utils.timezone.now", return_value=start + timedelta(days=4)):
+            self.assertEqual(self._summary()["streak"], 0)
+
+    def test_completed_delta_locks_before_reading(self):
+        # sqlite has no FOR UPDATE; check the querysets ask for it.
+        with mock.patch("django.db.models.QuerySet.select_for_update", autospec=True,
+                        side_effect=lambda qs, *args, **kwargs: qs) as lock:
+            self.assertEqual(completed_delta(self.user, {self.lessons[0].id: 100}), 1)
+        self.assertEqual([c.args[0].model for c in lock.call_args_list], [UserStats, LessonProgress])
+
+
+class MeResponseCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = _tf_lesson(cat, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_writes_expire_cached_summary(self):
+        before = response_cache_info()
+        first = self.client.get("/api/v1/me/summary/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/api/v1/me/summary/")
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "HIT"))
+        self.assertEqual(second.data, first.data)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/v1/progress/", {"lesson_id": self.lesson.id, "percent": 100}, format="json")
+        third = self.client.get("/api/v1/me/summary/")
+        self.assertEqual((third["X-Cache"], third.data["completedLessons"]), ("MISS", 1))
+
+        after = response_cache_info()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 2))
+
+
+class XpCompactionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.other = User.objects.create_user(username="other", password="x")
+        old = datetime(2025, 1, 15, 12, 0, tzinfo=dt_timezone.utc)
+        for n, amount in enumerate((10, 20, 30, 5)):
+            XpEvent.objects.create(user=cls.user if n < 3 else cls.other, amount=amount)
+        XpEvent.objects.filter(amount__in=(10, 20, 5)).update(created_at=old)
+        XpEvent.objects.filter(amount=30).update(created_at=old.replace(month=2))
+        XpEvent.objects.create(user=cls.user, amount=7)  # recent tail
+
+    def test_compaction_keeps_lifetime_xp(self):
+        self.assertEqual(lifetime_xp(self.user), 67)
+        call_command("compact_xp_events", "--chunk-size", "2", stdout=StringIO())
+        self.assertEqual(list(XpEvent.objects.values_list("amount", flat=True)), [7])
+        self.assertEqual(
+            sorted(XpMonthlyRollup.objects.values_list("user__username", "month", "amount", "events")),
+            [("learner", date(2025, 1, 1), 30, 2), ("learner", date(2025, 2, 1), 30, 1), ("other", date(2025, 1, 1), 5, 1)],
+        )
+        with self.assertNumQueries(2):  # rollup rows + event tail
+            self.assertEqual(lifetime_xp(self.user), 67)
+        call_command("recompute_user_stats", stdout=StringIO())
+        self.assertEqual(UserStats.objects.get(user=self.user).xp, 67)
+
+
+class LeaderboardTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(username=f"u{n}", password="x") for n in range(6)]
+        for user, xp in zip(cls.users, (50, 80, 80, 20, 10, 0)):
+            award_xp(user, xp)
+
+    def setUp(self):
+        self.client = APIClient()
+
+    def _board(self, user, **params):
+        self.client.force_authenticate(user)
+        return self.client.get("/api/v1/leaderboard/", params).data
+
+    def test_top_and_neighbours(self):
+        data = self._board(self.users[0], limit=3, neighbours=1)
+        self.assertEqual([(e["rank"], e["username"]) for e in data["top"]], [(1, "u1"), (2, "u2"), (3, "u0")])
+        self.assertEqual(data["me"], {"rank": 3, "score": 50})
+        self.assertEqual([(e["rank"], e["username"]) for e in data["around"]], [(2, "u2"), (3, "u0"), (4, "u3")])
+        self.assertIsNone(self._board(self.users[5])["me"])
+
+    def test_windows_reset_and_rebuild(self):
+        next_week = timezone.now() + timedelta(days=7)
+        award_xp(self.users[4], 5, when=next_week)
+        with mock.patch("django.utils.timezone.now", return_value=next_week):
+            self.assertEqual([e["username"] for e in self._board(self.users[4], board="weekly")["top"]], ["u4"])
+        self.assertEqual(self._board(self.users[4], board="global")["me"], {"rank": 5, "score": 15})
+
+        LeaderboardScore.objects.all().delete()
+        for user, xp in zip(self.users, (50, 80, 80, 20, 10)):
+            XpEvent.objects.create(user=user, amount=xp)
+        call_command("rebuild_leaderboards", stdout=StringIO())
+        self.assertEqual(self._board(self.users[0], board="monthly", limit=3)["me"], {"rank": 3, "score": 50})
+
+
+    def test_rank_reads_bounded_bands(self):
+        users = User.objects.bulk_create([User(username=f"b{n}", password="!") for n in range(40)])
+        scores = [1, 15, 16, 17, 80, 255, 256, 257, 4095, 4096, 70_000, 2 ** 40, 2 ** 62] * 3
+        for user, xp in zip(users, scores):
+            award_xp(user, xp)
+        users[0].delete()
+        expected = sorted(LeaderboardScore.objects.filter(board="global").values_list("score", "user_id"),
+                          key=lambda r: (-r[0], r[1]))
+        for rank, (score, user_id) in enumerate(expected, start=1):
+            self.assertEqual(rank_of("global", GLOBAL_PERIOD, user_id), {"rank": rank, "score": score})
+
+        bands = set(LeaderboardBand.objects.exclude(users=0).values_list("board", "period", "level", "band", "users"))
+        LeaderboardBand.objects.rebuild("global", GLOBAL_PERIOD)
+        self.assertEqual(bands, set(LeaderboardBand.objects.values_list("board", "period", "level", "band", "users")))
+
+        week = date(2026, 1, 5)
+        User.objects.bulk_create([User(username=f"w{n}", password="!") for n in range(600)])
+        LeaderboardScore.objects.bulk_create([
+            LeaderboardScore(board="weekly", period=week, user_id=user.pk, score=7 * n)
+            for n, user in enumerate(User.objects.order_by("pk"))
+        ])
+        LeaderboardBand.objects.rebuild("weekly", week)
+        read = sum(
+            LeaderboardBand.objects.filter(board="weekly", period=week, level=level, band__gt=low,
+                                           **({} if high is None else {"band__lt": high})).count()
+            for level, low, high in bands_above(0)
+        )
+        self.assertLessEqual(read, 15 * BAND_LEVELS)  # not one per user ahead
+        last = User.objects.count()
+        with self.assertNumQueries(3):
+            self.assertEqual(rank_of("weekly", week, self.users[0].pk)["rank"], last)
+
+    def test_tie_count_is_index_only(self):
+        index = LeaderboardScore._meta.indexes[0].name
+        with CaptureQueriesContext(connection) as ctx:
+            self.assertEqual(rank_of("global", GLOBAL_PERIOD, self.users[2].pk), {"rank": 2, "score": 80})
+        counts = [q["sql"] for q in ctx.captured_queries if "COUNT(" in q["sql"]]
+        self.assertEqual(len(counts), 1)
+        with connection.cursor() as cursor:
+            cursor.execute(("EXPLAIN QUERY PLAN " if connection.vendor == "sqlite" else "EXPLAIN ") + counts[0])
+            plan = " ".join(str(v) for row in cursor.fetchall() for v in row)
+        self.assertIn(index, plan)
+        self.assertIn("COVERING INDEX" if connection.vendor == "sqlite" else "Using index", plan)
+
+
+class CategoryCompletionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        other = User.objects.create_user(username="other", password="x")
+        cls.cats = [Category.objects.create(slug=f"c{n}", title=f"C{n}") for n in range(5)]
+        for cat in cls.cats:
+            lessons = [_tf_lesson(cat, n) for n in range(4)]
+            LessonProgress.objects.create(user=cls.user, lesson=lessons[0], percent=100)
+            LessonProgress.objects.create(user=cls.user, lesson=lessons[1], percent=50)
+            LessonProgress.objects.create(user=other, lesson=lessons[2], percent=100)
+        Category.objects.create(slug="empty", title="Empty")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_categories_in_constant_queries(self):
+        with self.assertNumQueries(3):  # ETag validators (catalog version, progress version) + the list
+            data = self.client.get("/api/v1/categories/").data
+        self.assertEqual(len(data), 6)
+        # (100 + 50 + 0 + 0) / 4 lessons; other users' progress doesn't count
+        self.assertEqual({c["slug"]: c["completion_percentage"] for c in data}, {
+            **{cat.slug: 38 for cat in self.cats}, "empty": 0,
+        })
+        with self.assertNumQueries(3):
+            self.assertEqual(self.client.get("/api/v1/categories/c0/").data["completion_percentage"], 38)
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = _tf_lesson(cls.cat, 1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _revalidate(self, url):
+        first = self.client.get(url)
+        self.assertEqual(first.status_code, 200)
+        return first, self.client.get(url, HTTP_IF_NONE_MATCH=first["ETag"])
+
+    def test_unchanged_resources_are_304(self):
+        for url in ("/api/v1/categories/", "/api/v1/categories/house/",
+                    "/api/v1/categories/house/lessons/", f"/api/v1/lessons/{self.lesson.id}/"):
+            first, again = self._revalidate(url)
+            self.assertEqual(again.status_code, 304, url)
+            self.assertEqual(again.content, b"")
+        first = self.client.get(f"/api/v1/lessons/{self.lesson.id}/")
+        since = self.client.get(f"/api/v1/lessons/{self.lesson.id}/", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(since.status_code, 304)
+
+    def test_deletion_revalidates(self):
+        other = _tf_lesson(self.cat, 2)
+        urls = ("/api/v1/categories/", "/api/v1/categories/house/", "/api/v1/categories/house/lessons/")
+        first = {url: self.client.get(url) for url in urls}
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        for url, resp in first.items():
+            self.assertNotIn("Last-Modified", resp, url)  # newest updated_at survives the delete
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=resp["ETag"]).status_code, 200, url)
+            since = self.client.get(url, HTTP_IF_MODIFIED_SINCE="Fri, 01 Jan 2100 00:00:00 GMT")
+            self.assertEqual(since.status_code, 200, url)
+
+    def test_lesson_304_skips_content(self):
+        first = self.client.get(f"/api/v1/lessons/{self.lesson.id}/")
+        with self.assertNumQueries(0):  # versions come from the catalog cache
+            again = self.client.get(f"/api/v1/lessons/{self.lesson.id}/", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(again.status_code, 304)
+
+    def test_content_and_progress_changes_revalidate(self):
+        url = f"/api/v1/lessons/{self.lesson.id}/"
+        etag = self.client.get(url)["ETag"]
+        self.lesson.save()  # same content, same hash
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.lesson.title = "Renamed"
+        self.lesson.save()
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        etag = self.client.get("/api/v1/categories/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/api/v1/progress/", {"lesson_id": self.lesson.id, "percent": 100}, format="json")
+        resp = self.client.get("/api/v1/categories/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual((resp.status_code, resp.data[0]["completion_percentage"]), (200, 100))
+
+    def test_rerender_revalidates(self):
+        url = f"/api/v1/lessons/{self.lesson.id}/"
+        etag = self.client.get(url)["ETag"]
+        stamp = Lesson.objects.values_list("updated_at", flat=True).get(pk=self.lesson.pk)
+        call_command("render_lessons", stdout=StringIO())  # same output: nothing moves
+        self.assertEqual(Lesson.objects.values_list("updated_at", flat=True).get(pk=self.lesson.pk), stamp)
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        rendered, slots = self.lesson.rendered_detail, self.lesson.rendered_slots
+        with mock.patch("english.management.commands.render_lessons.render_lesson_detail",
+                        return_value=(bytes(rendered).replace(b'"title"', b'"name"'), slots)), \
+                mock.patch("english.lesson_render.RENDER_VERSION", RENDER_VERSION + 1):
+            call_command("render_lessons", stdout=StringIO())
+            self.assertGreater(Lesson.objects.values_list("updated_at", flat=True).get(pk=self.lesson.pk), stamp)
+            resp = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(resp.status_code, 200)
+        self.assertIn(b'"name"', resp.content)
+
+
+class PrerenderedLessonTests(TestCase):
+    def test_matches_serializer(self):
+        from .management.commands.seed_lesson1 import L1
+        from .management.commands.seed_lesson3 import L3
+
+        cat = Category.objects.create(slug="house", title="House")
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="learner", password="x"))
+        for content in (L1, L3):
+            lesson = Lesson.objects.create(category=cat, title=content["title"], difficulty="A1", content=content)
+            with self.assertNumQueries(1):  # one lesson row for the ETag and the body; no Lesson.content
+                resp = client.get(f"/api/v1/lessons/{lesson.id}/")
+            spliced = json.loads(resp.content)
+            expected = json.loads(json.dumps(LessonDetailSerializer(lesson).data))
+            self.assertEqual(spliced["id"], lesson.id)
+            builds = 0
+            for got, want in zip(spliced["questions"], expected["questions"]):
+                if got["qtype"] == "build":
+                    builds += 1
+                    self.assertEqual(sorted(got["payload"]["tokens"]), sorted(want["payload"]["tokens"]))
+                    got["payload"] = want["payload"]
+            self.assertGreater(builds, 0)
+            self.assertEqual(spliced, expected)
+
+
+    def test_bytes_match_drf_renderer(self):
+        cat = Category.objects.create(slug="house", title="House")
+        lesson = Lesson.objects.create(category=cat, title="Lines\u2028and\u2029paragraphs", content={"quiz": {"items": [
+            {"type": "tf", "prompt_en": "Split\u2028here?", "correct_bool": True},
+            {"type": "choose", "prompt_en": "Pick", "options": ["a\u2029b", "ș"], "correct": "ș"},
+        ]}})
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="learner", password="x"))
+        resp = client.get(f"/api/v1/lessons/{lesson.id}/")
+        self.assertEqual(resp.content, JSONRenderer().render(LessonDetailSerializer(lesson).data))
+
+
+class CatalogCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cls.cat, n) for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        clear_local_catalog_cache()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_reads_through_and_invalidates_on_save(self):
+        url = "/api/v1/categories/house/lessons/"
+        with self.assertNumQueries(2):  # category versions + lesson list
+            self.client.get(url)
+        before = catalog_cache_info()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).json()[0]["title"], "Lesson 0")
+        self.assertEqual(catalog_cache_info()["hits"], before["hits"] + 2)  # validators and body
+        self.assertGreater(catalog_cache_info()["hit_ratio"], 0)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].title = "Renamed"
+            self.lessons[0].save()
+        self.assertEqual(self.client.get(url).json()[0]["title"], "Renamed")
+
+        answers = [{"question_id": 1, "selected": {"value": True}}]
+        attempt = {"lesson_id": self.lessons[1].id, "answers": answers}
+        self.assertEqual(self.client.post("/api/v1/quiz-attempts/", attempt, format="json").status_code, 200)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[1].delete()
+        self.assertEqual(self.client.post("/api/v1/quiz-attempts/", attempt, format="json").status_code, 404)
+        self.assertEqual(len(self.client.get(url).json()), 2)
+
+    @override_settings(CATALOG_CACHE_SHARED=True)
+    def test_shared_entries_fill_other_workers(self):
+        url = f"/api/v1/lessons/{self.lessons[0].id}/"
+        self.client.get(url)
+        clear_local_catalog_cache()  # as if served by another worker
+        before = catalog_cache_info()["shared_hits"]
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertEqual(catalog_cache_info()["shared_hits"], before + 2)  # lesson row, rendered body
+
+
+class KeysetPaginationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        # Repeated titles exercise the id tiebreak.
+        cls.cats = [Category.objects.create(slug=f"c{n}", title=f"T{n // 2}") for n in range(7)]
+        cls.lessons = [_tf_lesson(cls.cats[0], n) for n in range(7)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _walk(self, url, limit):
+        items, cursor, pages = [], "", 0
+        while True:
+            resp = self.client.get(url, {"limit": limit, "cursor": cursor})
+            self.assertEqual(resp.status_code, 200)
+            items += resp.json()["results"]
+            pages += 1
+            cursor = resp.json()["next"]
+            if cursor is None:
+                return items, pages
+
+    def test_pages_match_the_array(self):
+        for url in ("/api/v1/categories/", "/api/v1/categories/c0/lessons/"):
+            everything = self.client.get(url).json()
+            self.assertIsInstance(everything, list)  # no limit / cursor: unchanged shape
+            items, pages = self._walk(url, 3)
+            self.assertEqual(items, everything, url)
+            self.assertEqual(pages, 3)
+
+    def test_deep_pages_cost_the_same(self):
+        first = self.client.get("/api/v1/categories/c0/lessons/", {"limit": 2})
+        counts = []
+        for cursor in ("", first.data["next"]):
+            with CaptureQueriesContext(connection) as ctx:
+                self.client.get("/api/v1/categories/c0/lessons/", {"limit": 2, "cursor": cursor})
+            counts.append(len(ctx))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_bad_cursor(self):
+        for params in ({"cursor": "nope"}, {"cursor": "WyJ4Il0"}, {"limit": "x"}):
+            self.assertEqual(self.client.get("/api/v1/categories/c0/lessons/", params).status_code, 400)
+        self.assertEqual(self.client.get("/api/v1/categories/", {"cursor": "WzFd"}).status_code, 400)
+
+
+class CompressionTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        from .management.commands.seed_lesson1 import L1
+
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lesson = Lesson.objects.create(category=cls.cat, title=L1["title"], difficulty="A1", content=L1)
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_negotiate(self):
+        self.assertEqual(negotiate("gzip, deflate"), "gzip")
+        self.assertEqual(negotiate("*"), ENCODINGS[0])
+        self.assertIsNone(negotiate("gzip;q=0, identity"))
+        self.assertIsNone(negotiate(""))
+
+    def test_lesson_body_is_compressed_once(self):
+        url = f"/api/v1/lessons/{self.lesson.id}/"
+        plain = self.client.get(url).json()
+        with mock.patch("english.lesson_render.random.randrange", return_value=0):
+            first = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            self.assertEqual(first["Content-Encoding"], "gzip")
+            self.assertIn("Accept-Encoding", first["Vary"])
+            body = json.loads(gzip.decompress(first.content))
+            self.assertEqual(body["title"], plain["title"])
+            self.assertEqual(len(body["questions"]), len(plain["questions"]))
+            with mock.patch("english.compression.compress") as compress:
+                again = self.client.get(url, HTTP_ACCEPT_ENCODING="gzip")
+            compress.assert_not_called()
+        self.assertEqual(again.content, first.content)
+
+    def test_min_size_and_dynamic_responses(self):
+        for n in range(20):
+            Category.objects.create(slug=f"c{n}", title=f"Category {n}", description="Words for things around the house")
+        resp = self.client.get("/api/v1/categories/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(len(json.loads(gzip.decompress(resp.content))), 21)
+        with override_settings(COMPRESS_MIN_SIZE=10 ** 6):
+            resp = self.client.get("/api/v1/categories/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(resp.has_header("Content-Encoding"))
+
+    def test_streaming(self):
+        chunks = [json.dumps({"n": n}).encode() + b"\n" for n in range(200)]
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(
+            iter(chunks), content_type="application/x-ndjson; charset=utf-8"))
+        request = RequestFactory().get("/", HTTP_ACCEPT_ENCODING="gzip")
+        self.assertFalse(middleware(request).has_header("Content-Encoding"))  # not a compressible type
+
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(iter(chunks), content_type="text/plain"))
+        resp = middleware(request)
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        self.assertEqual(gzip.decompress(b"".join(resp.streaming_content)), b"".join(chunks))
+
+
+class RendererTests(TestCase):
+    def test_fast_json_matches_drf(self):
+        data = {
+            "when": datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc), "day": date(2026, 1, 2),
+            "price": Decimal("1.50"), "text": "casă \u2028 ok", "nested": [{1: "int key"}, (1, 2)], "none": None,
+        }
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_builtin_subclasses_encode_as_their_base_type(self):
+        class Level(str):
+            pass
+
+        data = ReturnDict({"level": Level("A1"), "items": ReturnList([{"n": True}], serializer=None)}, serializer=None)
+        self.assertEqual(FastJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_parse_errors_are_400(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="learner", password="x"))
+        resp = client.post("/api/v1/progress/", b"{not json", content_type="application/json")
+        self.assertEqual(resp.status_code, 400)
+        if msgpack is not None:
+            for body in (b"\xc1", msgpack.packb({(1, 2): 1})):  # reserved byte, unhashable key
+                resp = client.post("/api/v1/progress/", body, content_type="application/msgpack")
+                self.assertEqual(resp.status_code, 400)
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack_lesson_detail(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user(username="learner", password="x"))
+        lesson = _tf_lesson(Category.objects.create(slug="house", title="House"), 1)
+        as_json = client.get(f"/api/v1/lessons/{lesson.id}/").json()
+        resp = client.get(f"/api/v1/lessons/{lesson.id}/", HTTP_ACCEPT="application/msgpack")
+        self.assertEqual(resp["Content-Type"], "application/msgpack")
+        self.assertEqual(msgpack.unpackb(resp.content), as_json)
+
+
+class LessonsBulkTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cat, n) for n in range(20)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_one_query_in_request_order(self):
+        ids = [lesson.id for lesson in reversed(self.lessons)] + [999999]
+        with self.assertNumQueries(1):
+            resp = self.client.get("/api/v1/lessons/", {"ids": ",".join(map(str, ids))})
+        data = resp.json()
+        self.assertEqual([item["id"] for item in data], ids)
+        self.assertEqual(data[-1], {"id": 999999, "error": "Lesson not found"})
+        single = self.client.get(f"/api/v1/lessons/{self.lessons[0].id}/").json()
+        self.assertEqual(data[-2], single)
+
+        posted = self.client.post("/api/v1/lessons/", {"ids": ids[:3] + ids[:1]}, format="json").json()
+        self.assertEqual([item["id"] for item in posted], ids[:3])  # duplicates collapse
+
+    def test_not_rendered_yet(self):
+        lesson = self.lessons[0]
+        Lesson.objects.filter(pk=lesson.pk).update(rendered_detail=None)
+        data = self.client.get("/api/v1/lessons/", {"ids": str(lesson.id)}).json()
+        self.assertEqual(data, [json.loads(json.dumps(LessonDetailSerializer(lesson).data))])
+
+    def test_bad_requests(self):
+        for params in ({}, {"ids": "1,x"}, {"ids": ",".join(str(n) for n in range(1, 52))}):
+            self.assertEqual(self.client.get("/api/v1/lessons/", params).status_code, 400, params)
+        self.assertEqual(self.client.post("/api/v1/lessons/", {"ids": "1"}, format="json").status_code, 400)
+
+    def test_ids_out_of_range(self):
+        for ids in ("99999999999999999999999", "0", "-1", "1,²"):
+            resp = self.client.get("/api/v1/lessons/", {"ids": ids})
+            self.assertEqual((resp.status_code, resp.data), (400, {"detail": "ids must be integers"}), ids)
+        resp = self.client.post("/api/v1/lessons/", {"ids": [2 ** 70]}, format="json")
+        self.assertEqual(resp.status_code, 400)
+
+
+class ContentPackTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cls.cat, n) for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        override = override_settings(CONTENT_PACK_DIR=tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _pack(self, **headers):
+        resp = self.client.get("/api/v1/categories/house/pack/", **headers)
+        self.assertEqual(resp.status_code, 200)
+        return resp
+
+    def test_pack_is_built_once_and_streamed(self):
+        resp = self._pack(HTTP_ACCEPT_ENCODING="gzip")
+        self.assertEqual(resp["Content-Encoding"], "gzip")
+        pack = json.loads(gzip.decompress(b"".join(resp.streaming_content)))
+        self.assertEqual([lesson["id"] for lesson in pack["lessons"]], [lesson.id for lesson in self.lessons])
+        self.assertEqual(pack["manifest"], {str(l.id): rendered_version(l.content_hash) for l in self.lessons})
+        self.assertEqual(pack["lessons"][0]["questions"][0]["qtype"], "tf")
+
+        with mock.patch("english.content_packs._lesson_payloads") as payloads:
+            plain = self._pack()
+            self.assertEqual(json.loads(b"".join(plain.streaming_content)), pack)
+            again = self.client.get("/api/v1/categories/house/pack/", HTTP_IF_NONE_MATCH=resp["ETag"],
+                                    HTTP_ACCEPT_ENCODING="gzip")
+        payloads.assert_not_called()
+        self.assertEqual(again.status_code, 304)
+
+    def test_delta(self):
+        old = self.client.get("/api/v1/categories/house/pack/manifest/").json()
+        removed = self.lessons[1].id
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].title = "Renamed"
+            self.lessons[0].save()
+            self.lessons[1].delete()
+            added = _tf_lesson(self.cat, 9)
+        resp = self.client.post("/api/v1/categories/house/pack/", {"manifest": old["manifest"]}, format="json")
+        delta = resp.json()
+        self.assertNotEqual(delta["version"], old["version"])
+        self.assertEqual([lesson["id"] for lesson in delta["changed"]], [self.lessons[0].id, added.id])
+        self.assertEqual(delta["changed"][0]["title"], "Renamed")
+        self.assertEqual(delta["removed"], [removed])
+
+        bad = self.client.post("/api/v1/categories/house/pack/", {"manifest": {"x": 1}}, format="json")
+        self.assertEqual(bad.status_code, 400)
+
+    def test_delta_manifest_keys(self):
+        url = "/api/v1/categories/house/pack/"
+        for key in ("¹", "0", "-3", "99999999999999999999999"):
+            resp = self.client.post(url, {"manifest": {key: "h"}}, format="json")
+            self.assertEqual(resp.status_code, 400, key)
+        manifest = self.client.get(url + "manifest/").json()["manifest"]
+        padded = {"00" + k: h for k, h in manifest.items()}
+        self.assertEqual(self.client.post(url, {"manifest": padded}, format="json").json()["changed"], [])
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_delta_msgpack_int_keys(self):
+        url = "/api/v1/categories/house/pack/"
+        manifest = self.client.get(url + "manifest/").json()["manifest"]
+        ok = self.client.post(url, msgpack.packb({"manifest": {int(k): h for k, h in manifest.items()}}),
+                              content_type="application/msgpack")
+        self.assertEqual(ok.status_code, 200)
+        self.assertEqual((ok.json()["changed"], ok.json()["removed"]), ([], []))
+        bad = self.client.post(url, msgpack.packb({"manifest": {(1, 2): "h"}}), content_type="application/msgpack")
+        self.assertEqual(bad.status_code, 400)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("build_content_packs", stdout=out)
+        self.assertIn("built", out.getvalue())
+        with self.captureOnCommitCallbacks(execute=True):
+            self.lessons[0].save(update_fields=["title"])  # same content, same version
+            Category.objects.create(slug="kitchen", title="Kitchen")
+        out = StringIO()
+        call_command("build_content_packs", "--prune", stdout=out)
+        self.assertIn("house: ", out.getvalue())
+        self.assertIn("exists", out.getvalue())
+        self.assertIn("pruned 0", out.getvalue())
+
+
+@mock.patch("english.sync.SETTLE", timedelta(0))
+class SyncTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        UserStats.objects.create(user=cls.user)
+        cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cat, n) for n in range(2)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _attempt(self, lesson):
+        answers = [{"question_id": 1, "selected": {"value": True}}]
+        self.client.post("/api/v1/quiz-attempts/", {"lesson_id": lesson.id, "answers": answers}, format="json")
+
+    def _sync(self, since="", **params):
+        resp = self.client.get("/api/v1/sync/", {"since": since, **params})
+        self.assertEqual(resp.status_code, 200)
+        return resp.data
+
+    def test_only_changes_after_the_cursor(self):
+        self._attempt(self.lessons[0])
+        first = self._sync()
+        self.assertEqual([(p["lesson_id"], p["percent"]) for p in first["progress"]], [(self.lessons[0].id, 100)])
+        self.assertEqual(len(first["attempts"]), 1)
+        self.assertEqual([e["amount"] for e in first["xp_events"]], [20])
+        self.assertEqual(first["stats"]["xp"], 20)
+
+        with self.assertNumQueries(3):  # one range read per table, no stats when nothing changed
+            idle = self._sync(first["next"])
+        self.assertEqual((idle["progress"], idle["attempts"], idle["xp_events"]), ([], [], []))
+        self.assertNotIn("stats", idle)
+
+        self._attempt(self.lessons[1])
+        self._attempt(self.lessons[0])  # progress row updated in place
+        later = self._sync(idle["next"])
+        self.assertEqual([p["lesson_id"] for p in later["progress"]], [self.lessons[1].id, self.lessons[0].id])
+        self.assertEqual(len(later["attempts"]), 2)
+        self.assertEqual(later["stats"]["xp"], 60)
+
+    def test_pages(self):
+        for n in range(5):
+            XpEvent.objects.create(user=self.user, amount=n + 1)
+        seen, cursor, more = [], "", True
+        while more:
+            page = self._sync(cursor, limit=2)
+            seen += [e["amount"] for e in page["xp_events"]]
+            cursor, more = page["next"], page["has_more"]
+        self.assertEqual(seen, [1, 2, 3, 4, 5])
+
+    def test_recent_writes_wait_and_bad_cursors(self):
+        XpEvent.objects.create(user=self.user, amount=5)
+        with mock.patch("english.sync.SETTLE", timedelta(minutes=1)):
+            self.assertEqual(self._sync()["xp_events"], [])
+        self.assertEqual(len(self._sync()["xp_events"]), 1)
+        for since in ("nope", "WyJ4IiwxLDEsMV0"):  # ["x",1,1,1]
+            self.assertEqual(self.client.get("/api/v1/sync/", {"since": since}).status_code, 400)
+
+    def test_slow_writes_roll_back(self):
+        with mock.patch("english.sync.MAX_WRITE", timedelta(seconds=-1)):
+            self._attempt(self.lessons[0])
+            resp = self.client.post("/api/v1/progress/", {"lesson_id": self.lessons[1].id, "percent": 50}, format="json")
+        self.assertEqual(resp.status_code, 503)
+        self.assertFalse(QuizAttempt.objects.exists() or XpEvent.objects.exists() or LessonProgress.objects.exists())
+
+        # Inside a longer transaction the commit, and so the bound, is out of its hands.
+        with transaction.atomic(), self.assertRaises(RuntimeError):
+            with sync_write():
+                pass
+
+
+def _columns(model, fields):
+    return {model._meta.get_field(f).column for f in fields}
+
+
+class ProjectionTests(TestCase):
+    """Views only SELECT the columns their serializers (and ETag validators) read."""
+    VALIDATOR_COLUMNS = {"content_hash", "updated_at"}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username="learner", password="x")
+        cls.cat = Category.objects.create(slug="house", title="House")
+        cls.lessons = [_tf_lesson(cls.cat, n) for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertFetchesOnly(self, request, allowed):
+        """
+        Run request() and fail if any SELECT list names a column outside
+        allowed ({model: field names}) for that model's table.
+        """
+        with CaptureQueriesContext(connection) as ctx:
+            resp = request()
+        self.assertLess(resp.status_code, 400)
+        for model, fields in allowed.items():
+            pattern = re.compile(r'[`"]%s[`"]\.[`"](\w+)[`"]' % model._meta.db_table)
+            fetched = set()
+            for q in ctx.captured_queries:
+                if q["sql"].lstrip().upper().startswith("SELECT"):
+                    fetched.update(pattern.findall(q["sql"].split(" FROM ", 1)[0]))
+            extra = fetched - _columns(model, fields) - self.VALIDATOR_COLUMNS
+            self.assertFalse(extra, f"{model.__name__} columns fetched but not serialized: {sorted(extra)}")
+        return resp
+
+    def test_catalog_views(self):
+        self.assertFetchesOnly(lambda: self.client.get("/api/v1/categories/"),
+                               {Category: CATEGORY_FIELDS, Lesson: ["id"]})
+        self.assertFetchesOnly(lambda: self.client.get("/api/v1/categories/house/"),
+                               {Category: CATEGORY_FIELDS, Lesson: ["id"]})
+        self.assertFetchesOnly(lambda: self.client.get("/api/v1/categories/house/lessons/"),
+                               {Category: ["id"], Lesson: LESSON_LIST_FIELDS})
+
+    def test_lesson_detail_fallback(self):
+        lesson = self.lessons[0]
+        self.assertFetchesOnly(lambda: self.client.get(f"/api/v1/lessons/{lesson.id}/"),
+                               {Lesson: ["id", "rendered_detail", "rendered_slots"]})
+        Lesson.objects.filter(pk=lesson.pk).update(rendered_detail=None)
+        bump_catalog_generation()
+        resp = self.assertFetchesOnly(lambda: self.client.get(f"/api/v1/lessons/{lesson.id}/"),
+                                      {Lesson: LESSON_DETAIL_FIELDS + ("rendered_detail", "rendered_slots")})
+        self.assertEqual(resp.data, LessonDetailSerializer(lesson).data)
+
+    @override_settings(RANDOM_QUIZ_LEGACY_ATTEMPTS=True)
+    def test_quiz_views_load_plan_fields(self):
+        lesson = self.lessons[0]
+        answers = [{"question_id": 1, "selected": {"value": True}}]
+        self.assertFetchesOnly(lambda: self.client.post(
+            "/api/v1/quiz-attempts/", {"lesson_id": lesson.id, "answers": answers}, format="json",
+        ), {Lesson: PLAN_FIELDS})
+        self.assertFetchesOnly(lambda: self.client.post(
+            "/api/v1/quiz-attempts/batch/", {"attempts": [{"lesson_id": lesson.id, "answers": answers}]}, format="json",
+        ), {Lesson: PLAN_FIELDS})
+        entries = [{"lesson_id": lesson.id, "qid": 1, "item_index": 1, "selected": {"value": True}}]
+        self.assertFetchesOnly(lambda: self.client.post(
+            "/api/v1/quiz/random/attempts/", {"answers": entries}, format="json",
+        ), {Lesson: PLAN_FIELDS})
+
+    def test_admin_changelist_joins_category(self):
+        self.client.force_login(User.objects.create_superuser(username="admin", password="x"))
+        with CaptureQueriesContext(connection) as few:
+            self.assertEqual(self.client.get("/admin/english/lesson/").status_code, 200)
+        for n in range(3, 10):
+            _tf_lesson(self.cat, n)
+        with CaptureQueriesContext(connection) as many:
+            self.assertEqual(self.client.get("/admin/english/lesson/").status_code, 200)
+        self.assertEqual(len(many), len(few))
@@ -0,0 +1,134 @@
+# english/textnorm.py
+#
+# Answer-text normalization built on precomputed str.translate tables.
+# TextNormalizer.normalize() returns exactly what the original regex/replace
+# based norm_text() returned:
+#
+#   NFD -> drop combining marks -> language folds -> lower() -> strip()
+#   -> punctuation to " " -> collapse whitespace runs to " "
+#
+# Note that strip() runs *before* punctuation is replaced, so "Hi!" becomes
+# "hi " (trailing space). Stored answers and candidates go through the same
+# function, so this is harmless, but it must be preserved.
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Any, Dict, Optional
+
+_WS_RE = re.compile(r"\s+")
+_PUNCT_RE = re.compile(r"[^\w\s]")  # remove punctuation except letters/digits/space
+
+# Code points below this are cached in the lazy tables; anything above is
+# computed on the fly so hostile input can't grow the tables without bound.
+_TABLE_CACHE_LIMIT = 0x3000
+
+
+class _LazyTable(dict):
+    """str.translate() mapping filled on first lookup of each code point."""
+
+    __slots__ = ("_fn",)
+
+    def __init__(self, fn, eager_limit: int = 0x250):
+        super().__init__()
+        self._fn = fn
+        for cp in range(eager_limit):
+            self[cp] = fn(cp)
+
+    def __missing__(self, cp):
+        value = self._fn(cp)
+        if cp < _TABLE_CACHE_LIMIT:
+            self[cp] = value
+        return value
+
+
+def _punct_value(cp: int):
+    ch = chr(cp)
+    if _WS_RE.match(ch) or _PUNCT_RE.match(ch):
+        return 0x20
+    return cp
+
+
+# Stage 2 (after lower/strip): punctuation and whitespace -> " ".
+_PUNCT_TABLE = _LazyTable(_punct_value)
+_ASCII_PUNCT_TABLE = bytes(_punct_value(cp) for cp in range(128)) + bytes(range(128, 256))
+
+
+def _collapse_spaces(s: str) -> str:
+    if "  " not in s:
+        return s
+    parts = s.split(" ")
+    body = " ".join(p for p in parts if p)
+    if not body:
+        return " "
+    if s[0] == " ":
+        body = " " + body
+    if s[-1] == " ":
+        body = body + " "
+    return body
+
+
+class TextNormalizer:
+    """A normalization profile: diacritic stripping plus per-language folds."""
+
+    def __init__(self, name: str, folds: Optional[Dict[str, str]] = None, cache_size: int = 4096):
+        self.name = name
+        self.folds = dict(folds or {})
+        # The pure-ASCII fast path skips the marks table, so it is only
+        # safe when no fold rewrites an ASCII character.
+        self._ascii_fast = not any(k.isascii() for k in self.folds)
+        self._marks_table = _LazyTable(self._marks_value)
+        self.normalize = lru_cache(maxsize=cache_size)(self._normalize)
+
+    def _marks_value(self, cp: int):
+        ch = chr(cp)
+        if unicodedata.combining(ch):
+            return None
+        fold = self.folds.get(ch)
+        return cp if fold is None else fold
+
+    def strip_diacritics(self, s: Any) -> str:
+        if not isinstance(s, str):
+            s = str(s or "")
+        if self._ascii_fast and s.isascii():
+            return s
+        return unicodedata.normalize("NFD", s).translate(self._marks_table)
+
+    def _normalize(self, s: str) -> str:
+        if self._ascii_fast and s.isascii():
+            s = s.lower().strip()
+            return _collapse_spaces(s.encode("ascii").translate(_ASCII_PUNCT_TABLE).decode("ascii"))
+        s = unicodedata.normalize("NFD", s).translate(self._marks_table)
+        s = s.lower().strip()
+        return _collapse_spaces(s.translate(_PUNCT_TABLE))
+
+    def __call__(self, s: Any) -> str:
+        if not isinstance(s, str):
+            s = str(s or "")
+        return self.normalize(s)
+
+    def cache_info(self):
+        return self.normalize.cache_info()
+
+    def cache_clear(self) -> None:
+        self.normalize.cache_clear()
+
+
+# Romanian letters the original implementation folded explicitly. NFD already
+# decomposes all of them, so these only matter for input that bypasses NFD;
+# they are kept so the profile documents what it folds.
+ROMANIAN = TextNormalizer("ro", folds={
+    "ș": "s", "Ş": "S", "Ș": "S",
+    "ț": "t", "Ţ": "T", "Ț": "T",
+    "ă": "a", "Ă": "A",
+    "â": "a", "Â": "A",
+    "î": "i", "Î": "I",
+})
+
+PROFILES: Dict[str, TextNormalizer] = {
+    "ro": ROMANIAN,
+}
+DEFAULT_PROFILE = "ro"
+
+
+def get_normalizer(profile: Optional[str] = None) -> TextNormalizer:
+    return PROFILES.get(profile or DEFAULT_PROFILE) or PROFILES[DEFAULT_PROFILE]
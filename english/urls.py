@@ -2,10 +2,15 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
 
-from .views import HealthView, RegisterView, LoginView, MeView, MeSummaryView
-from .views_catalog import CategoriesView, CategoryDetailView, CategoryLessonsView, LessonDetailView
+from .views import HealthView, RegisterView, LoginView, MeView, MeSummaryView, MeActivityView
+from .views_catalog import (
+    CategoriesView, CategoryDetailView, CategoryLessonsView, CategoryPackManifestView, CategoryPackView,
+    LessonDetailView, LessonsBulkView,
+)
+from .views_leaderboard import LeaderboardView
 from .views_progress import ProgressUpsertView
-from .views_quiz import QuizAttemptView, RandomQuizView, RandomQuizAttemptView
+from .views_sync import SyncView
+from .views_quiz import QuizAttemptView, QuizAttemptBatchView, RandomQuizView, RandomQuizAttemptView
 
 urlpatterns = [
     path("health/", HealthView.as_view()),
@@ -15,16 +20,24 @@ urlpatterns = [
 
     path("me/", MeView.as_view()),
     path("me/summary/", MeSummaryView.as_view()),
+    path("me/activity/", MeActivityView.as_view()),
 
     # Catalog
-    path("categories/", CategoriesView.as_view()),                         # returns ARRAY
+    path("categories/", CategoriesView.as_view()),                         # returns ARRAY (page with ?limit/?cursor)
     path("categories/<slug:slug>/", CategoryDetailView.as_view()),
-    path("categories/<slug:slug>/lessons/", CategoryLessonsView.as_view()),# returns ARRAY
+    path("categories/<slug:slug>/lessons/", CategoryLessonsView.as_view()),# returns ARRAY (page with ?limit/?cursor)
+    path("categories/<slug:slug>/pack/", CategoryPackView.as_view()),      # offline pack; POST manifest for a delta
+    path("categories/<slug:slug>/pack/manifest/", CategoryPackManifestView.as_view()),
+    path("lessons/", LessonsBulkView.as_view()),                           # returns ARRAY (?ids=1,2,3 or POST ids)
     path("lessons/<int:pk>/", LessonDetailView.as_view()),
 
     # Progress + Quiz
     path("progress/", ProgressUpsertView.as_view()),
     path("quiz-attempts/", QuizAttemptView.as_view()),
+    path("quiz-attempts/batch/", QuizAttemptBatchView.as_view()),
     path("quiz/random/", RandomQuizView.as_view()),
     path("quiz/random/attempts/", RandomQuizAttemptView.as_view()),
+
+    path("leaderboard/", LeaderboardView.as_view()),
+    path("sync/", SyncView.as_view()),
 ]
@@ -1,18 +1,16 @@
 # english/views.py
-from datetime import timedelta
-
-from django.apps import apps
 from django.contrib.auth import authenticate
-from django.db.models import Sum
-from django.db.models.functions import Coalesce
-from django.utils import timezone
 from rest_framework import status
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 
+from .activity import current_streak, parse_timezone, recent_activity, user_timezone
+from .models import Profile
+from .response_cache import cached_user_response, invalidate_user_responses
 from .serializers import RegisterSerializer, UserSerializer
+from .stats import current_streak_from_stats, get_user_stats
 
 
 class HealthView(APIView):
@@ -53,67 +51,56 @@ class LoginView(APIView):
 
 class MeView(APIView):
     permission_classes = [IsAuthenticated]
+    @cached_user_response("me")
     def get(self, request):
         return Response(UserSerializer(request.user).data)
 
+    def patch(self, request):
+        """
+        Input: { timezone: "Europe/Bucharest" }
+        Days for streaks and activity are counted in this timezone from now on.
+        """
+        name = request.data.get("timezone")
+        if not name or parse_timezone(name) is None:
+            return Response({"detail": "timezone must be an IANA name"}, status=status.HTTP_400_BAD_REQUEST)
+        Profile.objects.update_or_create(user=request.user, defaults={"timezone": str(name)})
+        invalidate_user_responses(request.user)
+        return Response({**UserSerializer(request.user).data, "timezone": str(name)})
+
+
+class MeActivityView(APIView):
+    permission_classes = [IsAuthenticated]
+    def get(self, request):
+        try:
+            days = int(request.query_params.get("days", 7))
+            if days < 1 or days > 366:
+                raise ValueError
+        except ValueError:
+            return Response({"detail": "days must be an integer between 1 and 366"}, status=status.HTTP_400_BAD_REQUEST)
+        tz = user_timezone(request.user)
+        return Response({
+            "timezone": str(tz),
+            "streak": current_streak(request.user, tz),
+            "days": recent_activity(request.user, tz, days),
+        })
+
 
 class MeSummaryView(APIView):
     permission_classes = [IsAuthenticated]
+    @cached_user_response("summary")
     def get(self, request):
         user = request.user
-
-        LessonProgress = apps.get_model("english", "LessonProgress", require_ready=False)
-        QuizAttempt = apps.get_model("english", "QuizAttempt", require_ready=False)
-        XpEvent = apps.get_model("english", "XpEvent", require_ready=False)
-
-        completed_lessons = 0
-        accuracy = 0
-        xp = 0
-        streak = 0
-
-        if LessonProgress:
-            completed_lessons = LessonProgress.objects.filter(user=user, percent__gte=100).count()
-
-        total_q = correct_q = 0
-        if QuizAttempt:
-            agg = QuizAttempt.objects.filter(user=user).aggregate(
-                total_q=Coalesce(Sum("total_questions"), 0),
-                correct_q=Coalesce(Sum("correct_answers"), 0),
-            )
-            total_q = agg.get("total_q") or 0
-            correct_q = agg.get("correct_q") or 0
-            accuracy = int(round(100 * correct_q / total_q)) if total_q else 0
-
-        if XpEvent:
-            xp = XpEvent.objects.filter(user=user).aggregate(total=Coalesce(Sum("amount"), 0)).get("total") or 0
-        else:
-            xp = correct_q * 10
-
-        level = 1 + xp // 100
-
-        if LessonProgress or QuizAttempt:
-            days = set()
-            if LessonProgress:
-                for d in LessonProgress.objects.filter(user=user).values_list("updated_at", flat=True):
-                    if d:
-                        days.add(d.date())
-            if QuizAttempt:
-                for d in QuizAttempt.objects.filter(user=user).values_list("created_at", flat=True):
-                    if d:
-                        days.add(d.date())
-            today = timezone.localdate()
-            cur = today
-            while cur in days:
-                streak += 1
-                cur -= timedelta(days=1)
+        stats = get_user_stats(user)  # single primary-key read
+        total_q = stats["total_questions"]
+        accuracy = int(round(100 * stats["correct_answers"] / total_q)) if total_q else 0
 
         return Response({
             "username": user.username,
             "display_name": getattr(user, "first_name", "") or user.username,
             "avatar_url": "",
-            "xp": xp,
-            "level": level,
-            "streak": streak,
-            "completedLessons": completed_lessons,
+            "xp": stats["xp"],
+            "level": stats["level"],
+            "streak": current_streak_from_stats(stats),
+            "completedLessons": stats["completed_lessons"],
             "accuracy": accuracy,
         })
@@ -1,38 +1,289 @@
 # english/views_catalog.py
+import gzip
+
+from django.db import connections
+from django.db.models import Q
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import patch_vary_headers
 from django.shortcuts import get_object_or_404
+from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .catalog_cache import catalog_versions, category_lessons, category_versions, lesson_detail_row, lesson_detail_rows
+from .conditional import conditional_get, progress_version, weak_etag
+from .compression import accepts_encoding, precompressed_response
+from .content_packs import build_pack, pack_delta, pack_manifest
+from .lesson_render import rendered_version, shuffle_variant, splice_lesson_detail
 from .models import Category, Lesson
-from .serializers import CategorySerializer, LessonListSerializer, LessonDetailSerializer
+from .pagination import CursorError, page, page_params, wants_page
+from .renderers import FastJSONRenderer, MessagePackRenderer, json_loads, wants_msgpack
+from .serializers import (
+    CATEGORY_FIELDS, LESSON_DETAIL_FIELDS, LESSON_LIST_FIELDS,
+    CategorySerializer, LessonDetailSerializer, LessonListSerializer, with_completion,
+)
+
+
+def _variant_parts(request):
+    # Paged / unpaged and JSON / MessagePack bodies of a resource need different ETags.
+    parts = ("msgpack",) if wants_msgpack(request) else ()
+    if wants_page(request):
+        parts += ("page", request.query_params.get("cursor"), request.query_params.get("limit"))
+    return parts
+
+
+def _static_renderer(request):
+    # Cached catalog bodies are stored as JSON, or MessagePack for clients that ask.
+    return MessagePackRenderer() if wants_msgpack(request) else FastJSONRenderer()
+
+
+# The list and per-category endpoints send no Last-Modified: their newest
+# updated_at doesn't move when a row is deleted or moved to another category,
+# so If-Modified-Since would answer 304 for a stale body. The ETags count rows.
+def _categories_validators(request):
+    v = catalog_versions()
+    progress = progress_version(request.user)
+    etag = weak_etag("categories", request.user.pk, v["n"], v["changed"], v["lesson_n"], v["lessons_changed"], progress,
+                     *_variant_parts(request))
+    return etag, None
+
+
+def _category_validators(request, slug):
+    v = category_versions(slug)
+    if v is None:
+        return None
+    progress = progress_version(request.user)
+    etag = weak_etag("category", request.user.pk, v["id"], v["content_hash"], v["lesson_n"], v["lessons_changed"], progress,
+                     *_variant_parts(request))
+    return etag, None
+
+
+def _category_lessons_validators(request, slug):
+    v = category_versions(slug)
+    if v is None:
+        return None
+    etag = weak_etag("category-lessons", v["id"], v["lesson_n"], v["lessons_changed"], *_variant_parts(request))
+    return etag, None
+
+
+def _lesson_validators(request, pk):
+    v = lesson_detail_row(pk)
+    if v is None:
+        return None
+    return weak_etag("lesson", pk, rendered_version(v["content_hash"]), *_variant_parts(request)), v["updated_at"]
 
 
 class CategoriesView(APIView):
     permission_classes = [IsAuthenticated]
+    @conditional_get(_categories_validators)
     def get(self, request):
-        qs = Category.objects.all().order_by("title")
-        data = CategorySerializer(qs, many=True, context={"request": request}).data
-        return Response(data)  # <-- array
+        """Array of all categories, or with limit / cursor a page of them by (title, id)."""
+        qs = with_completion(Category.objects.only(*CATEGORY_FIELDS), request.user).order_by("title", "id")
+        if not wants_page(request):
+            return Response(CategorySerializer(qs, many=True, context={"request": request}).data)  # <-- array
+        try:
+            limit, after = page_params(request, (str, int))
+        except CursorError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if after:
+            title, pk = after
+            qs = qs.filter(Q(title__gt=title) | Q(title=title, id__gt=pk))
+        return Response(page(
+            list(qs[:limit + 1]), limit, lambda c: (c.title, c.id),
+            lambda rows: CategorySerializer(rows, many=True, context={"request": request}).data,
+        ))
 
 
 class CategoryDetailView(APIView):
     permission_classes = [IsAuthenticated]
+    @conditional_get(_category_validators)
     def get(self, request, slug):
-        cat = get_object_or_404(Category, slug=slug)
+        cat = get_object_or_404(with_completion(Category.objects.only(*CATEGORY_FIELDS), request.user), slug=slug)
         return Response(CategorySerializer(cat, context={"request": request}).data)
 
 
 class CategoryLessonsView(APIView):
     permission_classes = [IsAuthenticated]
+    @conditional_get(_category_lessons_validators)
     def get(self, request, slug):
-        cat = get_object_or_404(Category, slug=slug)
-        lessons = Lesson.objects.filter(category=cat).order_by("id")
-        return Response(LessonListSerializer(lessons, many=True).data)  # <-- array
+        """Array of the category's lessons, or with limit / cursor a page of them by id."""
+        if not wants_page(request):
+            renderer = _static_renderer(request)
+
+            def render():
+                v = category_lessons(slug)
+                return None if v is None else renderer.render(v["lessons"])
+            response = precompressed_response(
+                request, "category-lessons-body", f"{slug}:{renderer.format}", render, renderer.media_type,
+            )
+            if response is None:
+                raise Http404("No Category matches the given query.")
+            return response  # <-- array
+        try:
+            limit, after = page_params(request, (int,))
+        except CursorError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        v = category_versions(slug)
+        if v is None:
+            raise Http404("No Category matches the given query.")
+        qs = Lesson.objects.filter(category_id=v["id"]).only(*LESSON_LIST_FIELDS).order_by("id")
+        if after:
+            qs = qs.filter(id__gt=after[0])
+        return Response(page(
+            list(qs[:limit + 1]), limit, lambda lesson: (lesson.id,),
+            lambda rows: LessonListSerializer(rows, many=True).data,
+        ))
 
 
 class LessonDetailView(APIView):
     permission_classes = [IsAuthenticated]
+    @conditional_get(_lesson_validators)
     def get(self, request, pk):
-        lesson = get_object_or_404(Lesson, pk=pk)
-        return Response(LessonDetailSerializer(lesson).data)
+        row = lesson_detail_row(pk)
+        if row is None:
+            raise Http404("No Lesson matches the given query.")
+        rendered, slots = row["rendered_detail"], row["rendered_slots"]
+        if rendered is None:  # saved before pre-rendering existed; `manage.py render_lessons`
+            lesson = get_object_or_404(Lesson.objects.only(*LESSON_DETAIL_FIELDS), pk=pk)
+            return Response(LessonDetailSerializer(lesson).data)
+        variant, rng = shuffle_variant(pk, slots)
+        renderer = _static_renderer(request)
+
+        def render():
+            body = splice_lesson_detail(pk, rendered, slots, rng)
+            return body if renderer.format == "json" else renderer.render(json_loads(body))
+        return precompressed_response(
+            request, "lesson-body", f"{pk}:{variant}:{renderer.format}", render, renderer.media_type,
+        )
+
+
+MAX_BULK_LESSONS = 50
+
+
+def _lesson_id(value) -> int:
+    """A lesson primary key from client input; ValueError if it can't be one."""
+    pk = int(value)
+    _, highest = connections[Lesson.objects.db].ops.integer_field_range(Lesson._meta.pk.get_internal_type())
+    if pk < 1 or (highest is not None and pk > highest):
+        raise ValueError(f"lesson id out of range: {pk}")
+    return pk
+
+
+class LessonsBulkView(APIView):
+    """
+    GET lessons/?ids=1,2,3 or POST {"ids": [1, 2, 3]}: lesson details in the
+    requested order, {"id": n, "error": "Lesson not found"} for missing ones.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        raw = request.query_params.get("ids", "")
+        return self._lessons(request, [part for part in raw.split(",") if part.strip()])
+
+    def post(self, request):
+        ids = request.data.get("ids") if isinstance(request.data, dict) else None
+        return self._lessons(request, ids if isinstance(ids, list) else [])
+
+    def _lessons(self, request, raw_ids):
+        try:
+            ids = list(dict.fromkeys(_lesson_id(i) for i in raw_ids))
+        except (TypeError, ValueError):
+            return Response({"detail": "ids must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({"detail": "ids required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > MAX_BULK_LESSONS:
+            return Response(
+                {"detail": f"at most {MAX_BULK_LESSONS} ids per request"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        rows = lesson_detail_rows(ids)
+        stale = [pk for pk, row in rows.items() if row["rendered_detail"] is None]
+        fallback = Lesson.objects.only(*LESSON_DETAIL_FIELDS).in_bulk(stale) if stale else {}
+        renderer = FastJSONRenderer()
+        parts = []
+        for pk in ids:
+            row = rows.get(pk)
+            if row is None:
+                parts.append(renderer.render({"id": pk, "error": "Lesson not found"}))
+            elif row["rendered_detail"] is None:
+                parts.append(renderer.render(LessonDetailSerializer(fallback[pk]).data))
+            else:
+                parts.append(splice_lesson_detail(pk, row["rendered_detail"], row["rendered_slots"]))
+        body = b"[" + b",".join(parts) + b"]"
+        if wants_msgpack(request):
+            return Response(json_loads(body))
+        return HttpResponse(body, content_type="application/json")
+
+
+MAX_CLIENT_MANIFEST = 10_000
+PACK_CHUNK = 64 * 1024
+
+
+def _pack_validators(request, slug):
+    manifest = pack_manifest(slug)
+    if manifest is None:
+        return None
+    return weak_etag("pack", manifest["version"], *_variant_parts(request)), None
+
+
+def _read_gzip(path):
+    with gzip.open(path, "rb") as f:
+        yield from iter(lambda: f.read(PACK_CHUNK), b"")
+
+
+class CategoryPackView(APIView):
+    """
+    GET: the category's offline pack, streamed from disk (gzip, or inflated
+    for clients that don't accept it).
+    POST { manifest: {lesson id: hash} } from an older pack: the changed
+    lessons, the ids removed since, and the current manifest.
+    """
+    permission_classes = [IsAuthenticated]
+
+    @conditional_get(_pack_validators)
+    def get(self, request, slug):
+        manifest = pack_manifest(slug)
+        if manifest is None:
+            raise Http404("No Category matches the given query.")
+        path = build_pack(manifest)
+        if accepts_encoding(request.META.get("HTTP_ACCEPT_ENCODING", ""), "gzip"):
+            response = FileResponse(open(path, "rb"), content_type="application/json")
+            response["Content-Encoding"] = "gzip"
+        else:
+            response = StreamingHttpResponse(_read_gzip(path), content_type="application/json")
+        patch_vary_headers(response, ("Accept-Encoding",))
+        return response
+
+    def post(self, request, slug):
+        client = request.data.get("manifest") if isinstance(request.data, dict) else None
+        try:
+            if (not isinstance(client, dict) or len(client) > MAX_CLIENT_MANIFEST
+                    or not all(isinstance(v, str) for v in client.values())):
+                raise ValueError("bad manifest")
+            # Keys arrive as strings from JSON and may be ints from MessagePack.
+            client = {str(_lesson_id(k)): v for k, v in client.items()}
+        except (TypeError, ValueError):
+            return Response(
+                {"detail": f"manifest must map lesson ids to hashes (at most {MAX_CLIENT_MANIFEST})"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        manifest = pack_manifest(slug)
+        if manifest is None:
+            raise Http404("No Category matches the given query.")
+        body = pack_delta(manifest, client)
+        if wants_msgpack(request):
+            return Response(json_loads(body))
+        return HttpResponse(body, content_type="application/json")
+
+
+class CategoryPackManifestView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    @conditional_get(_pack_validators)
+    def get(self, request, slug):
+        manifest = pack_manifest(slug)
+        if manifest is None:
+            raise Http404("No Category matches the given query.")
+        return Response({"version": manifest["version"], "manifest": manifest["lessons"]})
@@ -0,0 +1,34 @@
+# english/views_leaderboard.py
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .leaderboard import BOARDS, MAX_NEIGHBOURS, MAX_TOP, board_period, neighbours, rank_of, top
+
+
+class LeaderboardView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Query: board=global|weekly|monthly, limit (top N), neighbours (each side of me)
+        """
+        board = request.query_params.get("board", "global")
+        if board not in BOARDS:
+            return Response({"detail": f"board must be one of {', '.join(BOARDS)}"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            limit = min(max(int(request.query_params.get("limit", 10)), 1), MAX_TOP)
+            around = min(max(int(request.query_params.get("neighbours", 2)), 0), MAX_NEIGHBOURS)
+        except ValueError:
+            return Response({"detail": "limit and neighbours must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+
+        period = board_period(board)
+        me = rank_of(board, period, request.user.pk)
+        return Response({
+            "board": board,
+            "period": period.isoformat(),
+            "top": top(board, period, limit),
+            "me": me,
+            "around": neighbours(board, period, request.user, me, around) if me else [],
+        })
@@ -1,16 +1,20 @@
 # english/views_progress.py
-from django.shortcuts import get_object_or_404
+from django.http import Http404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .activity import record_activity
 from .models import Lesson, LessonProgress
+from .stats import completed_delta
+from .sync import sync_write
 
 
 class ProgressUpsertView(APIView):
     permission_classes = [IsAuthenticated]
 
+    @sync_write()
     def post(self, request):
         """
         Input: { lesson_id: int, percent: int }
@@ -27,8 +31,10 @@ class ProgressUpsertView(APIView):
         except Exception:
             return Response({"detail": "percent must be an integer between 0 and 100"}, status=status.HTTP_400_BAD_REQUEST)
 
-        lesson = get_object_or_404(Lesson, pk=lesson_id)
-        lp, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
-        lp.percent = percent
-        lp.save()
-        return Response({"ok": True, "percent": lp.percent})
+        if not Lesson.objects.filter(pk=lesson_id).exists():
+            raise Http404("No Lesson matches the given query.")
+        percents = {int(lesson_id): percent}
+        completed = completed_delta(request.user, percents, keep_max=False)
+        LessonProgress.objects.upsert(request.user, percents, keep_max=False)
+        record_activity(request.user, completed=completed)
+        return Response({"ok": True, "percent": percent})
@@ -1,140 +1,56 @@
 # english/views_quiz.py
 import random
-import re
-import unicodedata
 from typing import Any, Dict, List, Tuple
 
-from django.db import transaction
-from django.shortcuts import get_object_or_404
+from django.conf import settings
+from django.http import Http404
 from rest_framework import status
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
+from .activity import record_activity
+from .catalog_cache import quiz_lessons
+from .grading import get_quiz_plan
+from .stats import completed_delta
+from .sync import sync_write
 from .models import Lesson, QuizAttempt, XpEvent, LessonProgress
+from .quiz_index import recent_item_ids, remember_session, sample_quiz_items
+from .quiz_sessions import (
+    QuizSessionError, claim_quiz_session, grade_session_item, issue_quiz_session, open_quiz_session, release_quiz_session,
+)
 
-_WS_RE = re.compile(r"\s+")
-_PUNCT_RE = re.compile(r"[^\w\s]")  # remove punctuation except letters/digits/space
-
-
-def strip_diacritics(s: str) -> str:
-    if not isinstance(s, str):
-        s = str(s or "")
-    nfd = unicodedata.normalize("NFD", s)
-    no_marks = "".join(ch for ch in nfd if not unicodedata.combining(ch))
-    return (
-        no_marks
-        .replace("ș", "s").replace("Ş", "S").replace("Ș", "S")
-        .replace("ț", "t").replace("Ţ", "T").replace("Ț", "T")
-        .replace("ă", "a").replace("Ă", "A")
-        .replace("â", "a").replace("Â", "A")
-        .replace("î", "i").replace("Î", "I")
-    )
-
-
-def norm_text(s: str) -> str:
-    s = strip_diacritics(s or "")
-    s = s.lower().strip()
-    s = _PUNCT_RE.sub(" ", s)
-    s = _WS_RE.sub(" ", s)
-    return s
-
-
-def _normalize_type(t: str) -> str:
-    t = (t or "").lower()
-    if t in ("choose", "dialogue_reply", "mcq"):
-        return "mcq"
-    if t in ("tf", "true_false"):
-        return "tf"
-    if t in ("fill_blank", "fill"):
-        return "fill"
-    if t in ("translate_ro_en", "translate_en_ro", "word_order", "build"):
-        return "build"
-    return t
-
-
-def _extract_quiz_items(lesson: Lesson) -> List[Dict[str, Any]]:
-    content = lesson.content or {}
-    quiz = content.get("quiz") or {}
-    return quiz.get("items") or []
-
-
-def _expected_texts(item: Dict[str, Any]) -> List[str]:
-    vals: List[str] = []
-    for k in ("answer_en", "answer_ro", "answer", "expected", "solution"):
-        v = item.get(k)
-        if isinstance(v, str) and v:
-            vals.append(v)
-    for k in ("answers", "accept", "accept_en", "answer_variants"):
-        v = item.get(k)
-        if isinstance(v, list):
-            vals.extend([x for x in v if isinstance(x, str) and x])
-    out, seen = [], set()
-    for s in vals:
-        ns = norm_text(s)
-        if ns and ns not in seen:
-            seen.add(ns)
-            out.append(ns)
-    return out
-
-
-def _tokens_to_text(selected: Dict[str, Any]) -> str:
-    toks = selected.get("tokens")
-    if isinstance(toks, list) and toks:
-        return " ".join(str(t) for t in toks)
-    return selected.get("text") or ""
-
-
-def _grade_answer(item: Dict[str, Any], selected: Any) -> bool:
-    t = _normalize_type(item.get("type"))
-
-    if t == "mcq":
-        correct_idx = (
-            item.get("correct_index")
-            if item.get("correct_index") is not None
-            else None
-        )
-        if correct_idx is None:
-            options = item.get("options") or []
-            correct_text = item.get("correct")
-            if correct_text is not None and correct_text in options:
-                correct_idx = options.index(correct_text)
+
+MAX_BATCH_ATTEMPTS = 500
+MAX_RANDOM_QUIZ_SIZE = 50
+
+
+def _grade_lesson_answers(plan, answers: List[Any]) -> Tuple[List[Dict[str, Any]], int]:
+    ans_by_id: Dict[int, Dict[str, Any]] = {}
+    for a in answers:
         try:
-            return int(selected.get("index")) == int(correct_idx)
+            ans_by_id[int(a.get("question_id"))] = a
         except Exception:
-            return False
-
-    if t == "tf":
-        correct = item.get("correct_bool")
-        if correct is None:
-            correct = item.get("answer_bool")
-        if correct is None:
-            correct = item.get("correct")
-        return bool(selected.get("value")) is bool(correct)
-
-    if t == "fill":
-        ans = item.get("answer")
-        answers = item.get("answers") or ([] if ans is None else [ans])
-        accept = item.get("accept") or []
-        expected_norms = [norm_text(a) for a in (answers + accept) if a]
-        cand = norm_text(selected.get("text") or "")
-        return cand in expected_norms
-
-    if t == "build":
-        cand_raw = _tokens_to_text(selected)
-        cand_norm = norm_text(cand_raw)
-        if not cand_norm:
-            return False
-        expected_norms = _expected_texts(item)
-        return cand_norm in expected_norms
-
-    return False
+            continue
+
+    results: List[Dict[str, Any]] = []
+    correct = 0
+    for idx, it in enumerate(plan, start=1):
+        sel = (ans_by_id.get(idx) or {}).get("selected") or {}
+        if isinstance(sel, dict):
+            ok, near = it.check(sel)
+        else:
+            ok, near = False, False  # malformed answer: graded as wrong
+        results.append({"question_id": idx, "is_correct": ok, "near_miss": near})
+        if ok:
+            correct += 1
+    return results, correct
 
 
 class QuizAttemptView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
+    @sync_write()
     def post(self, request):
         lesson_id = request.data.get("lesson_id")
         answers = request.data.get("answers") or []
@@ -142,28 +58,18 @@ class QuizAttemptView(APIView):
         if lesson_id is None or not isinstance(answers, list):
             return Response({"detail": "lesson_id and answers[] are required"}, status=status.HTTP_400_BAD_REQUEST)
 
-        lesson = get_object_or_404(Lesson, pk=lesson_id)
-        items = _extract_quiz_items(lesson)
-        if not items:
+        try:
+            lesson = quiz_lessons([int(lesson_id)]).get(int(lesson_id))
+        except (TypeError, ValueError):
+            lesson = None
+        if lesson is None:
+            raise Http404("No Lesson matches the given query.")
+        plan = get_quiz_plan(lesson)
+        if not plan:
             return Response({"detail": "Lesson has no quiz items"}, status=status.HTTP_400_BAD_REQUEST)
 
-        ans_by_id: Dict[int, Dict[str, Any]] = {}
-        for a in answers:
-            try:
-                ans_by_id[int(a.get("question_id"))] = a
-            except Exception:
-                continue
-
-        results: List[Dict[str, Any]] = []
-        correct = 0
-        total = len(items)
-
-        for idx, it in enumerate(items, start=1):
-            sel = (ans_by_id.get(idx) or {}).get("selected") or {}
-            ok = _grade_answer(it, sel)
-            results.append({"question_id": idx, "is_correct": bool(ok)})
-            if ok:
-                correct += 1
+        results, correct = _grade_lesson_answers(plan, answers)
+        total = len(plan)
 
         score_pct = int(round(100 * correct / total)) if total else 0
         xp_delta = correct * 10
@@ -177,86 +83,199 @@ class QuizAttemptView(APIView):
         if xp_delta:
             XpEvent.objects.create(user=request.user, amount=xp_delta, reason=f"Lesson {lesson.id} quiz")
 
-        lp, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
-        lp.percent = max(lp.percent or 0, score_pct)
-        lp.save()
+        completed = completed_delta(request.user, {lesson.id: score_pct})
+        LessonProgress.objects.upsert(request.user, {lesson.id: score_pct})
+        record_activity(request.user, attempts=1, xp=xp_delta, questions=total, correct=correct, completed=completed)
 
         return Response({"score_pct": score_pct, "xp_delta": xp_delta, "results": results})
 
 
-class RandomQuizView(APIView):
+class QuizAttemptBatchView(APIView):
     permission_classes = [IsAuthenticated]
 
-    def get(self, request):
-        size = int(request.query_params.get("size", 10))
-        category_id = request.query_params.get("category_id")
+    @sync_write()
+    def post(self, request):
+        """
+        Input: { attempts: [{ client_id?, lesson_id, answers[] }, ...] }
+        Offline replay: each attempt is graded like QuizAttemptView; invalid
+        ones get an "error" entry instead of failing the batch, and all valid
+        ones are written together.
+        """
+        attempts = request.data.get("attempts")
+        if not isinstance(attempts, list) or not attempts:
+            return Response({"detail": "attempts[] required"}, status=status.HTTP_400_BAD_REQUEST)
+        if len(attempts) > MAX_BATCH_ATTEMPTS:
+            return Response(
+                {"detail": f"at most {MAX_BATCH_ATTEMPTS} attempts per batch"},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        lesson_ids = set()
+        for a in attempts:
+            try:
+                lesson_ids.add(int(a.get("lesson_id")))
+            except Exception:
+                continue
+        lessons = quiz_lessons(lesson_ids)
 
-        qs = Lesson.objects.all()
-        if category_id:
-            qs = qs.filter(category_id=category_id)
+        out: List[Dict[str, Any]] = []
+        quiz_attempts: List[QuizAttempt] = []
+        xp_events: List[XpEvent] = []
+        percents: Dict[int, int] = {}
+        xp_total = questions_total = correct_total = 0
 
-        pool: List[Tuple[int, int, Dict[str, Any]]] = []
-        for lesson in qs.order_by("-created_at")[:100]:
-            items = _extract_quiz_items(lesson)
-            for idx, it in enumerate(items, start=1):
-                pool.append((lesson.id, idx, it))
+        for a in attempts:
+            entry: Dict[str, Any] = {"client_id": a.get("client_id") if isinstance(a, dict) else None}
+            out.append(entry)
+            try:
+                lesson_id = int(a.get("lesson_id"))
+            except Exception:
+                entry["error"] = "lesson_id and answers[] are required"
+                continue
+            answers = a.get("answers") or []
+            entry["lesson_id"] = lesson_id
+            if not isinstance(answers, list):
+                entry["error"] = "lesson_id and answers[] are required"
+                continue
+            if not all(isinstance(ans, dict) and isinstance(ans.get("selected") or {}, dict) for ans in answers):
+                entry["error"] = "answers[] must be {question_id, selected} objects"
+                continue
+            lesson = lessons.get(lesson_id)
+            if lesson is None:
+                entry["error"] = "Lesson not found"
+                continue
+            plan = get_quiz_plan(lesson)
+            if not plan:
+                entry["error"] = "Lesson has no quiz items"
+                continue
+
+            results, correct = _grade_lesson_answers(plan, answers)
+            total = len(plan)
+            score_pct = int(round(100 * correct / total)) if total else 0
+            xp_delta = correct * 10
+
+            quiz_attempts.append(QuizAttempt(
+                user=request.user,
+                lesson=lesson,
+                total_questions=total,
+                correct_answers=correct,
+            ))
+            if xp_delta:
+                xp_events.append(XpEvent(user=request.user, amount=xp_delta, reason=f"Lesson {lesson.id} quiz"))
+                xp_total += xp_delta
+            percents[lesson.id] = max(percents.get(lesson.id, 0), score_pct)
+            questions_total += total
+            correct_total += correct
+            entry.update({"score_pct": score_pct, "xp_delta": xp_delta, "results": results})
+
+        QuizAttempt.objects.bulk_create(quiz_attempts)
+        XpEvent.objects.bulk_create(xp_events)
+        completed = completed_delta(request.user, percents)
+        LessonProgress.objects.upsert(request.user, percents)
+        if quiz_attempts:
+            record_activity(
+                request.user, attempts=len(quiz_attempts), xp=xp_total,
+                questions=questions_total, correct=correct_total, completed=completed,
+            )
+
+        return Response({"accepted": len(quiz_attempts), "xp_delta": xp_total, "attempts": out})
 
-        if not pool:
-            return Response({"items": []})
 
-        sample = random.sample(pool, k=min(size, len(pool)))
+class RandomQuizView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        try:
+            size = int(request.query_params.get("size", 10))
+            category_id = request.query_params.get("category_id")
+            category_id = int(category_id) if category_id else None
+        except ValueError:
+            return Response({"detail": "size and category_id must be integers"}, status=status.HTTP_400_BAD_REQUEST)
+        if size < 1:
+            return Response({"detail": "size must be positive"}, status=status.HTTP_400_BAD_REQUEST)
+        size = min(size, MAX_RANDOM_QUIZ_SIZE)
+        qtypes = list(dict.fromkeys(t for t in (request.query_params.get("qtype") or "").split(",") if t))
+
+        # A seed makes the pick reproducible, so it skips the recent-session
+        # exclusion (which depends on history) and isn't recorded in it.
+        seed = request.query_params.get("seed")
+        rng = random.Random(seed) if seed else random.Random()
+        exclude = set() if seed else recent_item_ids(request.user)
+
+        sample = sample_quiz_items(size, category_id=category_id, qtypes=qtypes, rng=rng, exclude=exclude)
+        if not sample:
+            return Response({"items": []})
+        if not seed:
+            remember_session(request.user, [row["id"] for row in sample])
+        session = issue_quiz_session(request.user, sample)
 
         out = []
-        qid = 1
-        for lesson_id, item_index, it in sample:
-            t = _normalize_type(it.get("type"))
-            prompt = it.get("prompt_en") or it.get("prompt_ro") or ""
-
-            if t == "mcq":
-                payload = {"options": it.get("options") or []}
-                qtype = "mcq"
-            elif t == "tf":
-                payload = {}
-                qtype = "tf"
-            elif t == "build":
-                expected = (
-                    it.get("answer_en")
-                    or it.get("answer_ro")
-                    or it.get("answer")
-                    or it.get("expected")
-                    or ""
-                )
-                tokens = it.get("tokens") or expected.split()
-                shuf = tokens[:]
-                random.shuffle(shuf)
+        for qid, row in enumerate(sample, start=1):
+            payload = row["payload"]
+            if row["qtype"] == "build":
+                shuf = list(payload.get("tokens") or [])
+                rng.shuffle(shuf)
                 payload = {"tokens": shuf}
-                qtype = "build"
-            else:
-                payload = {"blanks": 1}
-                qtype = "fill"
 
             out.append({
                 "id": qid,
-                "lesson_id": lesson_id,
-                "item_index": item_index,
-                "prompt": prompt,
-                "qtype": qtype,
+                "lesson_id": row["lesson_id"],
+                "item_index": row["item_index"],
+                "prompt": row["prompt"],
+                "qtype": row["qtype"],
                 "payload": payload,
             })
-            qid += 1
 
-        return Response({"items": out})
+        return Response({"items": out, "session": session})
+
+
+def _record_random_quiz(user, counts: Dict[int, List[int]], correct: int) -> int:
+    """counts: {lesson_id: [total, correct]}. Returns the XP awarded."""
+    attempts: List[QuizAttempt] = []
+    percents: Dict[int, int] = {}
+    for lesson_id, (t_this, c_this) in counts.items():
+        if t_this:
+            attempts.append(QuizAttempt(
+                user=user,
+                lesson_id=lesson_id,
+                total_questions=t_this,
+                correct_answers=c_this,
+            ))
+            percents[lesson_id] = int(round(100 * c_this / t_this))
+
+    QuizAttempt.objects.bulk_create(attempts)
+    completed = completed_delta(user, percents)
+    LessonProgress.objects.upsert(user, percents)
+
+    xp_delta = correct * 10
+    if xp_delta:
+        XpEvent.objects.create(user=user, amount=xp_delta, reason="Random quiz")
+    if attempts:
+        record_activity(
+            user, attempts=len(attempts), xp=xp_delta,
+            questions=sum(a.total_questions for a in attempts), correct=sum(a.correct_answers for a in attempts),
+            completed=completed,
+        )
+    return xp_delta
 
 
 class RandomQuizAttemptView(APIView):
     permission_classes = [IsAuthenticated]
 
-    @transaction.atomic
     def post(self, request):
         entries = request.data.get("answers") or []
         if not isinstance(entries, list) or not entries:
             return Response({"detail": "answers[] required"}, status=status.HTTP_400_BAD_REQUEST)
 
+        token = request.data.get("session")
+        if token:
+            return self._post_session(request, token, entries)
+        if not getattr(settings, "RANDOM_QUIZ_LEGACY_ATTEMPTS", False):
+            return Response({"detail": "session required"}, status=status.HTTP_400_BAD_REQUEST)
+        return self._post_legacy(request, entries)
+
+    @sync_write()
+    def _post_legacy(self, request, entries):
         by_lesson: Dict[int, List[Dict[str, Any]]] = {}
         for e in entries:
             try:
@@ -265,45 +284,103 @@ class RandomQuizAttemptView(APIView):
             except Exception:
                 continue
 
+        lessons = quiz_lessons(by_lesson)
+        if len(lessons) != len(by_lesson):
+            raise Http404("No Lesson matches the given query.")
+
         total = 0
         correct = 0
         results: List[Dict[str, Any]] = []
+        counts: Dict[int, List[int]] = {}
 
         for lesson_id, group in by_lesson.items():
-            lesson = get_object_or_404(Lesson, pk=lesson_id)
-            items = _extract_quiz_items(lesson)
-
-            t_this = 0
-            c_this = 0
+            plan = get_quiz_plan(lessons[lesson_id])
+            tally = counts[lesson_id] = [0, 0]
             for e in group:
                 qid = int(e.get("qid"))
                 idx = int(e.get("item_index"))  # 1-based
                 selected = e.get("selected") or {}
-                it = items[idx - 1] if 1 <= idx <= len(items) else None
-                ok = _grade_answer(it, selected) if it else False
-                results.append({"qid": qid, "is_correct": bool(ok)})
-                t_this += 1
+                it = plan[idx - 1] if 1 <= idx <= len(plan) else None
+                if it and isinstance(selected, dict):
+                    ok, near = it.check(selected)
+                else:
+                    ok, near = False, False  # unknown item or malformed answer
+                results.append({"qid": qid, "is_correct": ok, "near_miss": near})
+                tally[0] += 1
                 if ok:
-                    c_this += 1
-
-            total += t_this
-            correct += c_this
-
-            if t_this:
-                QuizAttempt.objects.create(
-                    user=request.user,
-                    lesson=lesson,
-                    total_questions=t_this,
-                    correct_answers=c_this,
-                )
-                pct = int(round(100 * c_this / t_this))
-                lp, _ = LessonProgress.objects.get_or_create(user=request.user, lesson=lesson)
-                lp.percent = max(lp.percent or 0, pct)
-                lp.save()
+                    tally[1] += 1
+            total += tally[0]
+            correct += tally[1]
 
-        xp_delta = correct * 10
-        if xp_delta:
-            XpEvent.objects.create(user=request.user, amount=xp_delta, reason="Random quiz")
+        xp_delta = _record_random_quiz(request.user, counts, correct)
+        score_pct = int(round(100 * correct / total)) if total else 0
+        return Response({"score_pct": score_pct, "xp_delta": xp_delta, "results": results})
 
+    def _post_session(self, request, token, entries):
+        """
+        Input: { session: str, answers: [{ qid, selected }] }
+        The question list comes from the signed session, not the client;
+        unanswered questions count as wrong.
+        """
+        try:
+            session = open_quiz_session(token, request.user)
+        except QuizSessionError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        if not claim_quiz_session(session):
+            return Response({"detail": "Quiz session already submitted"}, status=status.HTTP_409_CONFLICT)
+        # The claim lives in the cache, outside the transaction: give it back
+        # if nothing gets committed, so the client can retry.
+        try:
+            with sync_write():
+                return self._grade_session(request, session, entries)
+        except BaseException:
+            release_quiz_session(session)
+            raise
+
+    def _grade_session(self, request, session, entries):
+        selected_by_qid: Dict[int, Any] = {}
+        for e in entries:
+            try:
+                selected_by_qid[int(e.get("qid"))] = e.get("selected") or {}
+            except Exception:
+                continue
+
+        items = session["q"]
+        lesson_ids = {lesson_id for lesson_id, _, _, _ in items}
+        # Only lessons with typo-tolerant items need their content loaded.
+        need_plans = {lesson_id for lesson_id, _, _, hashes in items if hashes is None}
+        if need_plans:
+            lessons = quiz_lessons(need_plans)
+            existing = set(Lesson.objects.filter(id__in=lesson_ids - need_plans).values_list("id", flat=True))
+            existing.update(lessons)
+        else:
+            lessons = {}
+            existing = set(Lesson.objects.filter(id__in=lesson_ids).values_list("id", flat=True))
+
+        correct = 0
+        results: List[Dict[str, Any]] = []
+        counts: Dict[int, List[int]] = {}
+        for qid, (lesson_id, idx, t, hashes) in enumerate(items, start=1):
+            selected = selected_by_qid.get(qid)
+            ok = near = False
+            if not isinstance(selected, dict):
+                pass  # unanswered or malformed: graded as wrong
+            elif hashes is not None:
+                ok = grade_session_item(session["s"], qid, t, hashes, selected)
+            else:
+                lesson = lessons.get(lesson_id)
+                plan = get_quiz_plan(lesson) if lesson else ()
+                it = plan[idx - 1] if 1 <= idx <= len(plan) else None
+                ok, near = it.check(selected) if it else (False, False)
+            results.append({"qid": qid, "is_correct": ok, "near_miss": near})
+            if ok:
+                correct += 1
+            if lesson_id in existing:  # lessons deleted since the quiz was issued aren't recorded
+                tally = counts.setdefault(lesson_id, [0, 0])
+                tally[0] += 1
+                tally[1] += int(ok)
+
+        xp_delta = _record_random_quiz(request.user, counts, correct)
+        total = len(items)
         score_pct = int(round(100 * correct / total)) if total else 0
         return Response({"score_pct": score_pct, "xp_delta": xp_delta, "results": results})
@@ -0,0 +1,27 @@
+# english/views_sync.py
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from .pagination import CursorError
+from .sync import DEFAULT_LIMIT, MAX_LIMIT, sync_changes
+
+
+class SyncView(APIView):
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        """
+        Query: since (the previous response's "next"; omit for a full sync), limit (rows per kind)
+        Keep calling with "next" while has_more is true.
+        """
+        try:
+            limit = min(max(int(request.query_params.get("limit", DEFAULT_LIMIT)), 1), MAX_LIMIT)
+        except ValueError:
+            return Response({"detail": "limit must be an integer"}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            data = sync_changes(request.user, request.query_params.get("since", ""), limit)
+        except CursorError as e:
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
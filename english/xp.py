@@ -0,0 +1,58 @@
+# english/xp.py
+#
+# XpEvent is an append-only ledger. Old events are periodically folded into
+# XpMonthlyRollup rows (compact_xp_events), so a user's lifetime XP is their
+# few rollup rows plus the short tail of events since the last compaction.
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Dict, Iterable, Tuple
+from zoneinfo import ZoneInfo
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Sum
+
+from .models import XpEvent, XpMonthlyRollup
+
+COMPACT_CHUNK = 5000
+
+
+def month_start(when: datetime) -> date:
+    return when.astimezone(ZoneInfo(settings.TIME_ZONE)).date().replace(day=1)
+
+
+def lifetime_xp_by_user(user_ids: Iterable[int]) -> Dict[int, int]:
+    user_ids = list(user_ids)
+    totals: Dict[int, int] = defaultdict(int)
+    for qs, field in ((XpMonthlyRollup.objects, "amount"), (XpEvent.objects, "amount")):
+        for user_id, amount in (qs.filter(user_id__in=user_ids).values("user_id")
+                                .annotate(total=Sum(field)).values_list("user_id", "total")):
+            totals[user_id] += amount or 0
+    return {user_id: totals[user_id] for user_id in user_ids}
+
+
+def lifetime_xp(user) -> int:
+    return lifetime_xp_by_user([user.pk])[user.pk]
+
+
+def compact_chunk(before: datetime, chunk_size: int = COMPACT_CHUNK) -> Tuple[int, int]:
+    """
+    Fold up to chunk_size of the oldest events created before `before` into
+    rollup rows, in one short transaction. Returns (events folded, rollup rows touched).
+    """
+    with transaction.atomic():
+        rows = list(
+            XpEvent.objects.filter(created_at__lt=before)
+            .order_by("id")
+            .values_list("id", "user_id", "created_at", "amount")[:chunk_size]
+        )
+        if not rows:
+            return 0, 0
+        amounts: Dict[Tuple[int, date], list] = defaultdict(lambda: [0, 0])
+        for _, user_id, created_at, amount in rows:
+            acc = amounts[(user_id, month_start(created_at))]
+            acc[0] += amount
+            acc[1] += 1
+        XpMonthlyRollup.objects.add({key: tuple(acc) for key, acc in amounts.items()})
+        XpEvent.objects.filter(id__in=[r[0] for r in rows]).delete()
+    return len(rows), len(amounts)